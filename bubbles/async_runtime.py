@@ -0,0 +1,159 @@
+"""An asyncio runtime for Bubbles, enabled with `bubbles --async`.
+
+The Slack connection runs on `AsyncApp` and `AsyncSocketModeHandler`, so waiting
+for Slack doesn't occupy a thread. The listeners in `bubbles.main` are reused as
+they are: they only sort the events and hand them to the dispatcher, whose
+worker threads run the (synchronous) plugins with a regular `WebClient`.
+
+I/O-heavy code can be written as coroutines instead. Wrap a coroutine command in
+`async_plugin` and it runs on the event loop without holding a worker thread; in
+the synchronous runtime and in interactive mode it simply runs on its own loop.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import os
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The loop of the async runtime, while it is running
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Get the event loop of the async runtime, if Bubbles is running on it."""
+    if _loop is not None and _loop.is_running():
+        return _loop
+    return None
+
+
+def run_coroutine(coro: Coroutine[Any, Any, T]) -> T:
+    """Run the coroutine from synchronous code and wait for the result.
+
+    This must not be called from the event loop itself; use `await` there.
+    """
+    if loop := get_loop():
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    return asyncio.run(coro)
+
+
+def _log_failure(future: Future) -> None:
+    if not future.cancelled() and (error := future.exception()):
+        log.error("Async command failed", exc_info=error)
+
+
+def async_plugin(func: Callable[[Any], Awaitable[None]]) -> Callable[[Any], None]:
+    """Turn a coroutine command into a function that the plugin manager can call.
+
+    On the async runtime the command is scheduled on the event loop and the
+    worker thread is released right away.
+    """
+
+    @functools.wraps(func)
+    def run(payload: Any) -> None:
+        if loop := get_loop():
+            future = asyncio.run_coroutine_threadsafe(func(payload), loop)
+            future.add_done_callback(_log_failure)
+        else:
+            asyncio.run(func(payload))
+
+    return run
+
+
+async def call_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call a blocking function (e.g. `payload.say`) from a coroutine without blocking the loop."""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def _noop_ack(*args: Any, **kwargs: Any) -> None:
+    # The async listener has already acknowledged the request
+    pass
+
+
+class SyncListenerAdapter:
+    """Registers the synchronous Bolt listeners of `bubbles.main` on an `AsyncApp`.
+
+    It offers the `event` and `action` decorators of a Bolt app. The wrapped
+    listener gets the synchronous `client` and `say` and runs on a worker thread,
+    so the blocking calls it makes (writing to the channel mirror, saving the
+    directory snapshot, answering when we're overloaded) never stall the loop.
+    """
+
+    def __init__(self, async_app: Any, sync_client: Any) -> None:
+        self.async_app = async_app
+        self.sync_client = sync_client
+
+    def event(self, event: str) -> Callable[[Callable], Callable]:
+        return lambda func: self.async_app.event(event)(self._wrap(func))
+
+    def action(self, constraints: Any) -> Callable[[Callable], Callable]:
+        return lambda func: self.async_app.action(constraints)(self._wrap(func))
+
+    def _wrap(self, func: Callable) -> Callable:
+        from slack_bolt.context.say import Say
+
+        wanted = inspect.signature(func).parameters
+
+        async def listener(
+            ack: Callable, body: Dict, payload: Any, context: Any, event: Any, request: Any
+        ) -> None:
+            await ack()
+            available = {
+                "ack": _noop_ack,
+                "body": body,
+                "payload": payload,
+                "context": context,
+                "event": event,
+                "request": request,
+                "client": self.sync_client,
+                "say": Say(client=self.sync_client, channel=context.channel_id),
+            }
+            await call_sync(func, **{name: available[name] for name in wanted})
+
+        listener.__name__ = func.__name__
+        return listener
+
+
+def _build_async_app() -> Any:
+    from slack_bolt.async_app import AsyncApp
+
+    return AsyncApp(
+        signing_secret=os.environ.get("slack_signing_secret"),
+        token=os.environ.get("slack_oauth_token"),
+    )
+
+
+async def _serve(register_event_handlers: Callable[[Any], None], sync_client: Any) -> None:
+    global _loop
+    from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+
+    from bubbles.config import WARM_UP_RENDERING
+
+    _loop = asyncio.get_running_loop()
+    async_app = _build_async_app()
+    register_event_handlers(SyncListenerAdapter(async_app, sync_client))
+
+    handler = AsyncSocketModeHandler(async_app, os.environ.get("slack_websocket_token"))
+    await handler.connect_async()
+    log.info("Connected to Slack on the async runtime.")
+
+    if WARM_UP_RENDERING:
+        from bubbles.rendering import warm_up_in_background
+
+        warm_up_in_background()
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        _loop = None
+        await handler.close_async()
+
+
+def run(register_event_handlers: Callable[[Any], None], sync_client: Any) -> None:
+    """Connect to Slack with the async runtime and process events until stopped."""
+    asyncio.run(_serve(register_event_handlers, sync_client))
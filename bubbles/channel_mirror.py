@@ -0,0 +1,399 @@
+"""A local copy of the history of the channels that we read over and over.
+
+`!history` and friends, the welcome pings and the transcription check reminder
+all go through days or weeks of the welcome and QA channels every time they run. `ChannelMirror`
+keeps the messages of those channels, with their reactions and edits, in an
+SQLite database. It is kept current with the `message`, `reaction_added` and
+`reaction_removed` events, and on startup it catches up on whatever happened
+while we were offline.
+
+`iter_history` takes the same arguments as `bubbles.slack_history.iter_channel_history`
+and returns the messages in the same shape as Slack does. Whatever the mirror
+doesn't cover -- a channel that isn't mirrored, a mirror that is still catching
+up, or messages older than the backfill -- is read from Slack instead.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from bubbles.slack_history import Timestamp, iter_channel_history
+
+log = logging.getLogger(__name__)
+
+# How far back the history is downloaded the first time a channel is mirrored
+DEFAULT_BACKFILL = timedelta(days=90)
+# Edits and reactions that we missed while offline can only be picked up by reading
+# the history again, so the catch-up covers at least this much
+DEFAULT_RESYNC_WINDOW = timedelta(days=14)
+
+# How many messages are read from the database at once
+CHUNK_SIZE = 500
+
+# These subtypes describe changes to other messages, they aren't messages themselves
+EDIT_SUBTYPES = {"message_changed", "message_replied"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    channel TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    user TEXT,
+    subtype TEXT,
+    thread_ts TEXT,
+    edited_ts TEXT,
+    text TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (channel, ts)
+);
+CREATE INDEX IF NOT EXISTS messages_user ON messages (user, channel, ts);
+CREATE TABLE IF NOT EXISTS reactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    name TEXT NOT NULL,
+    user TEXT NOT NULL,
+    UNIQUE (channel, ts, name, user)
+);
+CREATE INDEX IF NOT EXISTS reactions_user ON reactions (user);
+CREATE TABLE IF NOT EXISTS channels (
+    channel TEXT PRIMARY KEY,
+    covered_from TEXT NOT NULL
+);
+"""
+
+
+def normalize_ts(value: Timestamp) -> str:
+    """Bring a timestamp into the format of Slack's `ts`, so that they sort as text."""
+    if not isinstance(value, (int, float, str)):
+        value = value.timestamp()
+    return f"{float(value):.6f}"
+
+
+def _is_reply(message: Dict) -> bool:
+    """Replies only show up in the history of the channel if they were broadcast."""
+    thread_ts = message.get("thread_ts")
+    return (
+        thread_ts is not None
+        and thread_ts != message.get("ts")
+        and message.get("subtype") != "thread_broadcast"
+    )
+
+
+class ChannelMirror:
+    """An SQLite mirror of the history of some channels.
+
+    :param path: The database file; ":memory:" keeps the mirror in memory only.
+    :param channels: The IDs of the channels to mirror.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        path: Union[Path, str],
+        channels: Iterable[str],
+        backfill: timedelta = DEFAULT_BACKFILL,
+        resync_window: timedelta = DEFAULT_RESYNC_WINDOW,
+    ) -> None:
+        self.client = client
+        self.channels = frozenset(channels)
+        self.backfill = backfill
+        self.resync_window = resync_window
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        # The channel ID -> the ts from which on the mirror is complete
+        self._covered_from: Dict[str, str] = {}
+        self.stats = {"events": 0, "local_reads": 0, "slack_reads": 0}
+
+    def start(self) -> None:
+        """Catch up with the history of all channels in the background."""
+        if self._sync_thread is not None or not self.channels:
+            return
+
+        self._sync_thread = threading.Thread(
+            target=self.sync_all, name="channel-mirror-sync", daemon=True
+        )
+        self._sync_thread.start()
+
+    def sync_all(self) -> None:
+        for channel in sorted(self.channels):
+            try:
+                self.sync(channel)
+            except Exception as e:
+                # The channel is read from Slack until the next restart
+                log.error(f"Failed to sync the mirror of channel {channel}: {e}")
+
+    def sync(self, channel: str) -> None:
+        """Download everything that happened in the channel since we last saw it.
+
+        Messages in the downloaded window that Slack no longer knows about have
+        been deleted in the meantime and are removed from the mirror as well.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT covered_from FROM channels WHERE channel = ?", (channel,)
+            ).fetchone()
+            newest = self._db.execute(
+                "SELECT MAX(ts) FROM messages WHERE channel = ?", (channel,)
+            ).fetchone()[0]
+
+        if row is None:
+            covered_from = normalize_ts(now - self.backfill.total_seconds())
+            oldest = covered_from
+        else:
+            covered_from = row[0]
+            oldest = min(
+                newest or covered_from, normalize_ts(now - self.resync_window.total_seconds())
+            )
+            oldest = max(oldest, covered_from)
+
+        seen = set()
+        batch: List[Dict] = []
+        for message in iter_channel_history(self.client, channel, oldest=oldest):
+            seen.add(message["ts"])
+            batch.append(message)
+            if len(batch) == CHUNK_SIZE:
+                self._store_all(channel, batch)
+                batch = []
+        self._store_all(channel, batch)
+
+        with self._lock, self._db:
+            stored = self._db.execute(
+                "SELECT ts FROM messages WHERE channel = ? AND ts > ? AND ts <= ?",
+                (channel, oldest, normalize_ts(now)),
+            ).fetchall()
+            for (ts,) in stored:
+                if ts not in seen:
+                    self._delete(channel, ts)
+            self._db.execute(
+                "INSERT OR REPLACE INTO channels (channel, covered_from) VALUES (?, ?)",
+                (channel, covered_from),
+            )
+            self._covered_from[channel] = covered_from
+
+        log.info(f"Synced {len(seen)} messages of channel {channel} into the mirror.")
+
+    def is_synced(self, channel: str) -> bool:
+        return channel in self._covered_from
+
+    def handle_event(self, event: Dict) -> None:
+        """Apply a `message`, `reaction_added` or `reaction_removed` event."""
+        event_type = event.get("type")
+        if event_type == "message":
+            channel = event.get("channel")
+        elif event_type in ("reaction_added", "reaction_removed"):
+            channel = (event.get("item") or {}).get("channel")
+        else:
+            return
+        if channel not in self.channels:
+            return
+
+        self.stats["events"] += 1
+        with self._lock, self._db:
+            if event_type == "reaction_added":
+                self._db.execute(
+                    "INSERT OR IGNORE INTO reactions (channel, ts, name, user)"
+                    " VALUES (?, ?, ?, ?)",
+                    (channel, event["item"]["ts"], event["reaction"], event["user"]),
+                )
+            elif event_type == "reaction_removed":
+                self._db.execute(
+                    "DELETE FROM reactions WHERE channel = ? AND ts = ? AND name = ? AND user = ?",
+                    (channel, event["item"]["ts"], event["reaction"], event["user"]),
+                )
+            elif event.get("subtype") == "message_deleted":
+                self._delete(channel, event["deleted_ts"])
+            elif event.get("subtype") in EDIT_SUBTYPES:
+                # Keep the reactions unless the edited message comes with its own
+                self._store(channel, event["message"], replace_reactions=False)
+            else:
+                self._store(channel, event)
+
+    def _store_all(self, channel: str, messages: List[Dict]) -> None:
+        with self._lock, self._db:
+            for message in messages:
+                self._store(channel, message)
+
+    def _store(self, channel: str, message: Dict, replace_reactions: bool = True) -> None:
+        if _is_reply(message):
+            return
+
+        data = {
+            key: value
+            for key, value in message.items()
+            if key not in ("reactions", "channel", "event_ts", "channel_type")
+        }
+        self._db.execute(
+            "INSERT OR REPLACE INTO messages"
+            " (channel, ts, user, subtype, thread_ts, edited_ts, text, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                channel,
+                message["ts"],
+                message.get("user"),
+                message.get("subtype"),
+                message.get("thread_ts"),
+                (message.get("edited") or {}).get("ts"),
+                message.get("text"),
+                json.dumps(data),
+            ),
+        )
+        if not replace_reactions and "reactions" not in message:
+            return
+
+        self._db.execute(
+            "DELETE FROM reactions WHERE channel = ? AND ts = ?", (channel, message["ts"])
+        )
+        self._db.executemany(
+            "INSERT OR IGNORE INTO reactions (channel, ts, name, user) VALUES (?, ?, ?, ?)",
+            [
+                (channel, message["ts"], reaction["name"], user)
+                for reaction in message.get("reactions", [])
+                for user in reaction.get("users", [])
+            ],
+        )
+
+    def _delete(self, channel: str, ts: str) -> None:
+        self._db.execute("DELETE FROM messages WHERE channel = ? AND ts = ?", (channel, ts))
+        self._db.execute("DELETE FROM reactions WHERE channel = ? AND ts = ?", (channel, ts))
+
+    def iter_history(
+        self,
+        channel: str,
+        oldest: Optional[Timestamp] = None,
+        latest: Optional[Timestamp] = None,
+        limit: Optional[int] = None,
+        inclusive: bool = False,
+    ) -> Iterator[Dict]:
+        """Yield the messages of the channel, newest first.
+
+        The arguments are the same as for `iter_channel_history`.
+        """
+        if channel not in self._covered_from:
+            self.stats["slack_reads"] += 1
+            yield from iter_channel_history(self.client, channel, oldest, latest, limit, inclusive)
+            return
+
+        if limit is not None and limit <= 0:
+            return
+        covered_from = self._covered_from[channel]
+        oldest_ts = normalize_ts(oldest) if oldest is not None else None
+        latest_ts = normalize_ts(latest) if latest is not None else None
+        older = "ts >= ?" if inclusive else "ts > ?"
+        newer = "ts <= ?" if inclusive else "ts < ?"
+
+        self.stats["local_reads"] += 1
+        remaining = limit
+        cursor = latest_ts
+        first = True
+        # Whether the message exactly at `covered_from` came from the mirror
+        boundary_seen = False
+        while True:
+            conditions = ["channel = ?"]
+            params: List[Any] = [channel]
+            if cursor is not None:
+                # Only the first chunk includes `latest` itself
+                conditions.append(newer if first else "ts < ?")
+                params.append(cursor)
+            if oldest_ts is not None:
+                conditions.append(older)
+                params.append(oldest_ts)
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+
+            chunk = self._read_chunk(conditions, params, size)
+            for message in chunk:
+                boundary_seen |= normalize_ts(message["ts"]) == covered_from
+                yield message
+            if remaining is not None:
+                remaining -= len(chunk)
+                if remaining == 0:
+                    return
+            if len(chunk) < size:
+                break
+            cursor = chunk[-1]["ts"]
+            first = False
+
+        if oldest_ts is not None and oldest_ts >= covered_from:
+            return
+        # The rest is older than the mirror, so it has to come from Slack
+        if latest_ts is not None and latest_ts < covered_from:
+            # None of the requested messages are in the mirror
+            yield from iter_channel_history(
+                self.client, channel, oldest, latest, remaining, inclusive
+            )
+            return
+        # With `inclusive`, Slack returns the message at `covered_from` again
+        duplicate = inclusive and boundary_seen
+        fallback = iter_channel_history(
+            self.client,
+            channel,
+            oldest,
+            covered_from,
+            remaining + 1 if remaining is not None and duplicate else remaining,
+            inclusive,
+        )
+        for message in fallback:
+            if duplicate and normalize_ts(message["ts"]) == covered_from:
+                continue
+            if remaining is not None:
+                if remaining == 0:
+                    return
+                remaining -= 1
+            yield message
+
+    def _read_chunk(self, conditions: List[str], params: List[Any], size: int) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT ts, data FROM messages WHERE {' AND '.join(conditions)}"
+                " ORDER BY ts DESC LIMIT ?",
+                (*params, size),
+            ).fetchall()
+            if not rows:
+                return []
+            reactions = self._db.execute(
+                "SELECT ts, name, user FROM reactions"
+                f" WHERE channel = ? AND ts IN ({', '.join('?' * len(rows))}) ORDER BY id",
+                (params[0], *(ts for ts, _ in rows)),
+            ).fetchall()
+
+        grouped: Dict[str, Dict[str, List[str]]] = {}
+        for ts, name, user in reactions:
+            grouped.setdefault(ts, {}).setdefault(name, []).append(user)
+
+        messages = []
+        for ts, data in rows:
+            message = json.loads(data)
+            if ts in grouped:
+                message["reactions"] = [
+                    {"name": name, "users": users, "count": len(users)}
+                    for name, users in grouped[ts].items()
+                ]
+            messages.append(message)
+        return messages
+
+    def format_stats(self) -> str:
+        """Summarize the state of the mirror for humans."""
+        with self._lock:
+            counts = dict(
+                self._db.execute(
+                    "SELECT channel, COUNT(*) FROM messages GROUP BY channel"
+                ).fetchall()
+            )
+        lines = [
+            f"*Events applied:* {self.stats['events']}",
+            f"*Reads from the mirror:* {self.stats['local_reads']}",
+            f"*Reads from Slack:* {self.stats['slack_reads']}",
+        ]
+        for channel in sorted(self.channels):
+            status = "synced" if self.is_synced(channel) else "not synced"
+            lines.append(f"<#{channel}>: {counts.get(channel, 0)} messages, {status}")
+        return "\n".join(lines)
@@ -6,6 +6,8 @@ from pathlib import Path
 
 from utonium import Payload, Plugin
 
+from bubbles.progress import ProgressReporter
+
 
 def backup_db(payload: Payload) -> None:
     """!backup - creates and uploads a full backup of our postgres db."""
@@ -17,7 +19,8 @@ def backup_db(payload: Payload) -> None:
     host = os.environ.get("postgres_host")
     filename = f"db_backup_{str(datetime.now(tz=timezone.utc).date())}.tar"
 
-    payload.say("Starting DB export. This may take a moment.")
+    progress = ProgressReporter.from_payload(payload, "Backing up the database")
+    progress.start_stage("Exporting the database")
 
     with open(filename, "w") as outfile:
         subprocess.Popen(
@@ -26,8 +29,11 @@ def backup_db(payload: Payload) -> None:
             stdout=outfile,
         ).wait()
 
-    payload.say("DB export complete. Uploading...")
+    progress.end_stage("Exported the database")
+    progress.start_stage("Uploading the backup")
     payload.upload_file(file=filename, title=filename)
+    progress.end_stage("Uploaded the backup")
+    progress.finish()
 
     p = Path(".")
     previous_backups = list(p.glob("db_backup_*.tar"))
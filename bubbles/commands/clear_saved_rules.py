@@ -1,21 +1,17 @@
-import os.path
-
 from utonium import Payload, Plugin
 
-from bubbles.commands.periodic import RULE_MONITORING_DATA_PATH
+from bubbles.commands.periodic import RULE_MONITORING_DATA_DIR
+from bubbles.commands.periodic.rule_monitoring import rule_store
 
 
 def clear_saved_rules(payload: Payload) -> None:
-    path = RULE_MONITORING_DATA_PATH
-
-    if not os.path.exists(path):
-        payload.say("Nothing to clear, the file doesn't exist yet.")
+    if not RULE_MONITORING_DATA_DIR:
+        payload.say("Nothing to clear, the rule monitoring isn't set up.")
         return
 
-    with open(path, "w+") as file:
-        payload.say("Clearing saved rules, I hope you know what you're doing!")
-
-        file.write("")
+    payload.say("Clearing saved rules, I hope you know what you're doing!")
+    cleared = rule_store.clear()
+    payload.say(f"Forgot the rules of {cleared} subreddit(s).")
 
 
 PLUGIN = Plugin(func=clear_saved_rules, regex=r"^clear_saved_rules")
@@ -1,9 +1,7 @@
 """Generation of graphs for the !ctqstats command."""
 import re
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Tuple
-
-from matplotlib import pyplot as plt
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 from bubbles.commands.ctq_utils import (
     CLAIMED_COLOR,
@@ -20,6 +18,11 @@ from bubbles.commands.ctq_utils import (
     _get_rank,
     _reformat_figure,
 )
+from bubbles.rendering import new_figure, setup_matplotlib
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes  # type: ignore
+    from matplotlib.figure import Figure  # type: ignore
 
 header_regex = re.compile(
     r"^\s*\*(?P<format>\w+)\s*Transcription:?(?:\s*(?P<type>[^\n*]+))?\*", re.IGNORECASE
@@ -179,7 +182,7 @@ def _generate_aggregated_bar_chart(
     x_label: str,
     y_label: str,
     rest_label: Optional[str] = None,
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """A helper function to generate a generic plot of aggregated data.
 
     :param posts: The posts to generate the bar chart for.
@@ -222,8 +225,8 @@ def _generate_aggregated_bar_chart(
     data = [entry[1] for entry in reversed(plot_entries)]
     colors.reverse()
 
-    fig: plt.Figure = plt.Figure()
-    ax: plt.Axes = fig.gca()
+    fig: "Figure" = new_figure()
+    ax: "Axes" = fig.gca()
 
     ax.barh(labels, data, color=colors)
     ax.set_ylabel(y_label)
@@ -276,7 +279,7 @@ def _generate_aggregated_bar_chart(
     return fig, transcription
 
 
-def user_transcription_count(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
+def user_transcription_count(completed_posts: List[Dict]) -> Tuple["Figure", str]:
     """Generate stats for transcriptions per user."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -291,7 +294,7 @@ def user_transcription_count(completed_posts: List[Dict]) -> Tuple[plt.Figure, s
 
 def user_video_transcription_count(
     completed_posts: List[Dict],
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate stats for transcriptions per user."""
     video_posts = [
         post for post in completed_posts if _get_post_format_and_type(post)[0].lower() == "video"
@@ -308,7 +311,7 @@ def user_video_transcription_count(
     )
 
 
-def sub_transcription_count(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
+def sub_transcription_count(completed_posts: List[Dict]) -> Tuple["Figure", str]:
     """Generate stats for transcriptions per subreddit."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -323,7 +326,7 @@ def sub_transcription_count(completed_posts: List[Dict]) -> Tuple[plt.Figure, st
 
 def user_max_transcription_length(
     completed_posts: List[Dict],
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate max transcription length stats per user."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -337,7 +340,7 @@ def user_max_transcription_length(
     )
 
 
-def sub_max_transcription_length(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
+def sub_max_transcription_length(completed_posts: List[Dict]) -> Tuple["Figure", str]:
     """Generate max transcription length stats per subreddit."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -353,7 +356,7 @@ def sub_max_transcription_length(completed_posts: List[Dict]) -> Tuple[plt.Figur
 
 def user_avg_transcription_length(
     completed_posts: List[Dict],
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate average transcription length stats per user."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -372,7 +375,7 @@ def user_avg_transcription_length(
     )
 
 
-def sub_avg_transcription_length(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
+def sub_avg_transcription_length(completed_posts: List[Dict]) -> Tuple["Figure", str]:
     """Generate average transcription length stats per subreddit."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -391,7 +394,7 @@ def sub_avg_transcription_length(completed_posts: List[Dict]) -> Tuple[plt.Figur
     )
 
 
-def post_types(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
+def post_types(completed_posts: List[Dict]) -> Tuple["Figure", str]:
     """Generate stats per post type."""
     return _generate_aggregated_bar_chart(
         posts=completed_posts,
@@ -406,7 +409,7 @@ def post_types(completed_posts: List[Dict]) -> Tuple[plt.Figure, str]:
 
 def user_transcription_length_vs_count(
     completed_posts: List[Dict],
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate a plot of the transcription count vs. length per user."""
     user_dir = {}
 
@@ -434,8 +437,8 @@ def user_transcription_length_vs_count(
     y_label = "Transcription count"
     title = "Transcription count vs. length per user"
 
-    fig: plt.Figure = plt.Figure()
-    ax: plt.Axes = fig.gca()
+    fig: "Figure" = new_figure()
+    ax: "Axes" = fig.gca()
 
     ax.scatter(x, y, color=colors)
 
@@ -450,7 +453,7 @@ def user_transcription_length_vs_count(
 
 def sub_transcription_length_vs_count(
     completed_posts: List[Dict],
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate a plot of the transcription count vs. length per user."""
     sub_dir = {}
 
@@ -471,8 +474,8 @@ def sub_transcription_length_vs_count(
     # Transcription count
     y = [sub["count"] for sub in sub_dir.values()]
 
-    fig: plt.Figure = plt.Figure()
-    ax: plt.Axes = fig.gca()
+    fig: "Figure" = new_figure()
+    ax: "Axes" = fig.gca()
 
     ax.scatter(x, y, color=PRIMARY_COLOR)
 
@@ -490,7 +493,7 @@ def sub_transcription_length_vs_count(
 
 def post_timeline(
     submissions: List[Dict], start_time: datetime, end_time: datetime
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate a timeline of posts."""
     events = _get_event_stream(submissions)
 
@@ -507,8 +510,8 @@ def post_timeline(
     all_claimed_time: Optional[datetime] = None
     all_completed_time: Optional[datetime] = None
 
-    fig: plt.Figure = plt.Figure()
-    ax: plt.Axes = fig.gca()
+    fig: "Figure" = new_figure()
+    ax: "Axes" = fig.gca()
 
     title = "Posts over time"
 
@@ -600,7 +603,7 @@ def general_stats(
     completed_posts: List[Dict],
     start_time: datetime,
     end_time: datetime,
-) -> Tuple[plt.Figure, str]:
+) -> Tuple["Figure", str]:
     """Generate general stats for the event."""
     users = set()
     subs = set()
@@ -665,11 +668,10 @@ def general_stats(
     title = "CtQ in Numbers"
 
     # Generate the chart
-    fig: plt.Figure = plt.Figure()
+    fig: "Figure" = new_figure()
     # Disable the axes https://stackoverflow.com/a/9295367
-    ax = plt.Axes(fig, [0.0, 0.0, 1.0, 1.0])
+    ax = fig.add_axes([0.0, 0.0, 1.0, 1.0])
     ax.set_axis_off()
-    fig.add_axes(ax)
 
     # Font sizes
     title_size_f = 25
@@ -747,8 +749,9 @@ def general_stats(
 
 def generate_ctq_graphs(
     submissions: List[Dict], start_time: datetime, end_time: datetime
-) -> Tuple[List[plt.Figure], str]:
+) -> Tuple[List["Figure"], str]:
     """Generate the graphs for the CtQ event and their transcriptions."""
+    setup_matplotlib()
     completed_posts = [post for post in submissions if post["transcription"] and post["user"]]
 
     # We got a list of tuples, we make it a tuple of lists
@@ -1,9 +1,9 @@
 import logging
-import tempfile
 from datetime import datetime, timezone
-from typing import Any, Callable, Dict, List
+from typing import Dict, List
 
 import requests.exceptions
+from utonium import Payload, Plugin
 
 from bubbles.commands.ctq_graphs import generate_ctq_graphs
 from bubbles.commands.ctq_utils import (
@@ -15,7 +15,9 @@ from bubbles.commands.ctq_utils import (
     _get_elapsed,
     _get_list_chunks,
 )
-from bubbles.config import PluginManager, blossom
+from bubbles.config import blossom
+from bubbles.progress import ProgressReporter
+from bubbles.uploads import upload_figures
 
 
 def _is_submission_in_queue(submission: Dict, start_date: datetime, end_date: datetime) -> bool:
@@ -43,10 +45,11 @@ def _is_submission_in_queue(submission: Dict, start_date: datetime, end_date: da
     return True
 
 
-def get_ctq_submissions(start_date: datetime, end_date: datetime, say: Callable) -> List[Dict]:
+def get_ctq_submissions(
+    start_date: datetime, end_date: datetime, progress: ProgressReporter
+) -> List[Dict]:
     """Get the submissions during the CtQ time."""
-    start = datetime.now(tz=timezone.utc)
-    say("Fetching the queue submissions from Blossom... (0%)")
+    progress.start_stage("Fetching the queue submissions from Blossom")
 
     # Posts remain in the queue for a given time
     # We need to consider the posts that were already there at the start
@@ -68,7 +71,9 @@ def get_ctq_submissions(start_date: datetime, end_date: datetime, say: Callable)
             },
         )
         if not response.ok:
-            say(f"Error while fetching the submissions: {response.status_code}\n{response.content}")
+            progress.fail(
+                f"Error while fetching the submissions: {response.status_code}\n{response.content}"
+            )
             return []
 
         try:
@@ -79,10 +84,7 @@ def get_ctq_submissions(start_date: datetime, end_date: datetime, say: Callable)
             return []
 
         submissions += data["results"]
-
-        percentage = len(submissions) / data["count"] if data["count"] > 0 else 1
-
-        say(f"Fetching the queue submissions from Blossom... ({percentage:.0%})")
+        progress.advance(len(data["results"]), total=data["count"])
 
         if data["next"] is None:
             # No more submissions to fetch
@@ -97,15 +99,14 @@ def get_ctq_submissions(start_date: datetime, end_date: datetime, say: Callable)
         if _is_submission_in_queue(submission, start_date, end_date)
     ]
 
-    say(f"Fetched {len(submissions)} queue submissions from Blossom ({_get_elapsed(start)})")
+    progress.end_stage(f"Fetched {len(submissions)} queue submissions from Blossom")
 
     return submissions
 
 
-def attach_transcriptions(submissions: List[Dict], say: Callable) -> List[Dict]:
+def attach_transcriptions(submissions: List[Dict], progress: ProgressReporter) -> List[Dict]:
     """For each submission, attach the corresponding transcription (if available)."""
-    start = datetime.now(tz=timezone.utc)
-    say("Fetching the transcriptions from Blossom... (0%)")
+    progress.start_stage("Fetching the transcriptions from Blossom", total=len(submissions))
 
     updated_submissions = []
 
@@ -114,7 +115,7 @@ def attach_transcriptions(submissions: List[Dict], say: Callable) -> List[Dict]:
     chunks = _get_list_chunks(submissions, 25)
 
     # Try to get the transcriptions for the submissions
-    for idx, chunk in enumerate(chunks):
+    for chunk in chunks:
         for submission in chunk:
             updated_submission = dict(**submission, transcription=None)
 
@@ -136,7 +137,7 @@ def attach_transcriptions(submissions: List[Dict], say: Callable) -> List[Dict]:
                 },
             )
             if not response.ok:
-                say(
+                progress.fail(
                     "Error while fetching the transcriptions: "
                     f"{response.status_code}\n{response.content}"
                 )
@@ -152,18 +153,16 @@ def attach_transcriptions(submissions: List[Dict], say: Callable) -> List[Dict]:
 
             updated_submissions.append(updated_submission)
 
-        percentage = (idx + 1) / len(chunks)
-        say(f"Fetching the transcriptions from Blossom... ({percentage:.0%})")
+        progress.advance(len(chunk))
 
-    say(f"Fetched {tr_count} transcriptions from Blossom ({_get_elapsed(start)})")
+    progress.end_stage(f"Fetched {tr_count} transcriptions from Blossom")
 
     return updated_submissions
 
 
-def attach_users(submissions: List[Dict], say: Callable) -> List[Dict]:
+def attach_users(submissions: List[Dict], progress: ProgressReporter) -> List[Dict]:
     """For each submission, attach the corresponding user (if available)."""
-    start = datetime.now(tz=timezone.utc)
-    say("Fetching the users from Blossom... (0%)")
+    progress.start_stage("Fetching the users from Blossom", total=len(submissions))
 
     updated_submissions = []
 
@@ -172,7 +171,7 @@ def attach_users(submissions: List[Dict], say: Callable) -> List[Dict]:
     chunks = _get_list_chunks(submissions, 25)
 
     # Try to get the transcriptions for the submissions
-    for idx, chunk in enumerate(chunks):
+    for chunk in chunks:
         for submission in chunk:
             updated_submission = dict(**submission, user=None)
 
@@ -195,7 +194,9 @@ def attach_users(submissions: List[Dict], say: Callable) -> List[Dict]:
                 params={"page_size": 1, "page": 1, "id": user_id},
             )
             if not response.ok:
-                say(f"Error while fetching the users: {response.status_code}\n{response.content}")
+                progress.fail(
+                    f"Error while fetching the users: {response.status_code}\n{response.content}"
+                )
                 return []
 
             results = response.json()["results"]
@@ -209,36 +210,49 @@ def attach_users(submissions: List[Dict], say: Callable) -> List[Dict]:
 
             updated_submissions.append(updated_submission)
 
-        percentage = (idx + 1) / len(chunks)
-        say(f"Fetching the users from Blossom... ({percentage:.0%})")
+        progress.advance(len(chunk))
 
-    say(f"Fetched {len(user_cache)} users from Blossom ({_get_elapsed(start)})")
+    progress.end_stage(f"Fetched {len(user_cache)} users from Blossom")
 
     return updated_submissions
 
 
-def generate_ctq_stats(start_date: datetime, end_date: datetime, say: Callable) -> None:
+def generate_ctq_stats(
+    start_date: datetime, end_date: datetime, payload: Payload, progress: ProgressReporter
+) -> None:
     """Generate the stats for the CtQ event."""
     start = datetime.now(tz=timezone.utc)
-    say(f"start: {start_date}, end: {end_date}")
 
-    submissions = get_ctq_submissions(start_date, end_date, say)
-    submissions = attach_transcriptions(submissions, say)
-    submissions = attach_users(submissions, say)
+    submissions = get_ctq_submissions(start_date, end_date, progress)
+    submissions = attach_transcriptions(submissions, progress)
+    submissions = attach_users(submissions, progress)
 
+    progress.start_stage("Generating the graphs")
     figures, transcription = generate_ctq_graphs(submissions, start_date, end_date)
+    progress.end_stage(f"Generated {len(figures)} graphs")
+
+    progress.start_stage("Uploading the graphs")
+    # The graphs and their transcription all go into one post
+    upload_figures(
+        payload.client,
+        payload.get_channel(),
+        figures,
+        name="ctq_stats",
+        initial_comment=f"Here are the CtQ stats! ({_get_elapsed(start)})",
+        extra_files=[
+            {"content": transcription, "filename": "ctq_stats.md", "title": "Transcription"}
+        ],
+    )
+    progress.finish()
 
-    with tempfile.NamedTemporaryFile(delete=False, mode="w", encoding="utf-8", suffix=".txt") as fp:
-        fp.write(transcription)
-        say(f"Transcription: file://{fp.name}")
-
-    say(f"Here are the CtQ stats! ({_get_elapsed(start)})", figures=figures)
 
+def ctq_stats(payload: Payload) -> None:
+    """!ctqstats <start_date> [end_date] - Generate stats for a Clear the Queue event.
 
-def ctq_stats(payload: Any) -> None:
-    """Process the !ctqstats command."""
-    say = payload["extras"]["say"]
-    args = payload.get("text").split()
+    `end_date` is optional and defaults to 12 hours after the start date.
+    """
+    say = payload.say
+    args = payload.get_text().split()
 
     if len(args) < 2:
         # No start time provided
@@ -282,12 +296,10 @@ def ctq_stats(payload: Any) -> None:
         say("The end time must be after the start time.")
         return
 
-    generate_ctq_stats(start_date, end_date, say)
+    progress = ProgressReporter.from_payload(
+        payload, f"Generating the CtQ stats from {start_date} to {end_date}"
+    )
+    generate_ctq_stats(start_date, end_date, payload, progress)
 
 
-PluginManager.register_plugin(
-    ctq_stats,
-    r"ctqstats",
-    help="!ctqstats <start_date> <end_date> - Generate stats for a Clear the Queue event."
-    "<end_date> is optional and defaults to 12 hours after the start date.",
-)
+PLUGIN = Plugin(func=ctq_stats, regex=r"^ctqstats")
@@ -2,9 +2,24 @@ import os
 from datetime import datetime, timedelta, timezone
 
 # The time for which posts remain in the queue until they are removed
-from typing import Dict, List, Optional, TypeVar
-
-from matplotlib import pyplot as plt
+from typing import TYPE_CHECKING, Dict, List, Optional, TypeVar
+
+from bubbles.rendering import (  # noqa: F401
+    BACKGROUND_COLOR,
+    CLAIMED_COLOR,
+    COMPLETED_COLOR,
+    FIGURE_DPI,
+    FIGURE_HEIGHT,
+    FIGURE_WIDTH,
+    LINE_COLOR,
+    PRIMARY_COLOR,
+    SECONDARY_COLOR,
+    TEXT_COLOR,
+    UNCLAIMED_COLOR,
+)
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure  # type: ignore
 
 QUEUE_POST_TIMEOUT = timedelta(hours=int(os.getenv("QUEUE_POST_TIMEOUT", "18")))
 # The default duration of a CtQ event
@@ -18,32 +33,6 @@ DEFAULT_CTQ_START = os.getenv("DEFAULT_CTQ_START")
 # The maximum number of entries to display per chart
 MAX_GRAPH_ENTRIES = int(os.getenv("MAX_GRAPH_ENTRIES", "10"))
 
-BACKGROUND_COLOR = "#36393f"  # Discord background color
-TEXT_COLOR = "white"
-LINE_COLOR = "white"
-PRIMARY_COLOR = "#94e044"
-SECONDARY_COLOR = "#8282ed"
-
-UNCLAIMED_COLOR = "#ffc033"
-CLAIMED_COLOR = "#0eebd0"
-COMPLETED_COLOR = "#94e044"
-
-FIGURE_DPI = 200.0
-FIGURE_WIDTH = 10
-FIGURE_HEIGHT = 4.2
-
-# Global settings for all plots
-plt.rcParams["figure.facecolor"] = BACKGROUND_COLOR
-plt.rcParams["axes.facecolor"] = BACKGROUND_COLOR
-plt.rcParams["axes.labelcolor"] = TEXT_COLOR
-plt.rcParams["axes.edgecolor"] = LINE_COLOR
-plt.rcParams["text.color"] = TEXT_COLOR
-plt.rcParams["xtick.color"] = LINE_COLOR
-plt.rcParams["ytick.color"] = LINE_COLOR
-plt.rcParams["grid.color"] = LINE_COLOR
-plt.rcParams["grid.alpha"] = 0.8
-plt.rcParams["figure.dpi"] = FIGURE_DPI
-
 FLAIR_RANKS = [
     {"name": "Initiate", "threshold": 1, "color": "#ffffff"},
     {"name": "Pink", "threshold": 25, "color": "#e696be"},
@@ -93,7 +82,7 @@ def _convert_blossom_date(blossom_date: Optional[str]) -> Optional[datetime]:
 
 
 def _reformat_figure(
-    fig: plt.Figure, width: float = FIGURE_WIDTH, height: float = FIGURE_HEIGHT
+    fig: "Figure", width: float = FIGURE_WIDTH, height: float = FIGURE_HEIGHT
 ) -> None:
     """Reformat the given figure to the default size."""
     fig.set_size_inches(width, height)
@@ -1,9 +1,10 @@
 import random
 from typing import Any, Callable, Optional
 
-import requests
+import aiohttp
 from utonium import Payload, Plugin
 
+from bubbles.async_runtime import async_plugin, call_sync
 from bubbles.config import COMMAND_PREFIXES
 
 # Pulled a bunch of these URLs from https://github.com/treboryx/animalsAPI -- many thanks
@@ -21,12 +22,22 @@ error_img = (
 )
 
 
-def get_pic(func: Callable, extra_args: Any = None) -> tuple[Optional[str], str]:
+# Give up on an API after this many seconds, there are enough alternatives
+FETCH_TIMEOUT = 10
+
+
+async def _fetch_json(session: aiohttp.ClientSession, url: str) -> Any:
+    async with session.get(url) as response:
+        response.raise_for_status()
+        # Not all of the APIs send the right content type
+        return await response.json(content_type=None)
+
+
+async def get_pic(func: Callable) -> tuple[Optional[str], str]:
     try:
-        if extra_args:
-            return func(extra_args)
-        else:
-            return func()
+        timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            return await func(session)
     except Exception as e:
         return (
             None,
@@ -35,37 +46,37 @@ def get_pic(func: Callable, extra_args: Any = None) -> tuple[Optional[str], str]
         )
 
 
-def get_cat() -> tuple[str, str]:
+async def get_cat(session: aiohttp.ClientSession) -> tuple[str, str]:
     # TODO: add picture bomb functionality
-    return "cat", requests.get(cat_api.format(1)).json()[0]["url"]
+    return "cat", (await _fetch_json(session, cat_api.format(1)))[0]["url"]
 
 
-def get_cat_alt() -> tuple[str, str]:
-    return "lovely cat", requests.get(cat_alt_api).json()["file"]
+async def get_cat_alt(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "lovely cat", (await _fetch_json(session, cat_alt_api))["file"]
 
 
-def get_dog() -> tuple[str, str]:
-    return "dog", requests.get(dog_api).json()["message"]
+async def get_dog(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "dog", (await _fetch_json(session, dog_api))["message"]
 
 
-def get_bunny() -> tuple[str, str]:
-    return "bunny", requests.get(bunny_api).json()["media"]["gif"]
+async def get_bunny(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "bunny", (await _fetch_json(session, bunny_api))["media"]["gif"]
 
 
-def get_lizard() -> tuple[str, str]:
-    return "lizard", requests.get(lizard_api).json()["url"]
+async def get_lizard(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "lizard", (await _fetch_json(session, lizard_api))["url"]
 
 
-def get_fox() -> tuple[str, str]:
-    return "fox", requests.get(fox_api).json()["image"]
+async def get_fox(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "fox", (await _fetch_json(session, fox_api))["image"]
 
 
-def get_duck() -> tuple[str, str]:
-    return "duck", requests.get(duck_url).json()["url"]
+async def get_duck(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "duck", (await _fetch_json(session, duck_url))["url"]
 
 
-def get_shibe() -> tuple[str, str]:
-    return "shibe", requests.get(shibe_api).json()[0]
+async def get_shibe(session: aiohttp.ClientSession) -> tuple[str, str]:
+    return "shibe", (await _fetch_json(session, shibe_api))[0]
 
 
 animals = {
@@ -79,7 +90,7 @@ animals = {
 }
 
 
-def cute(payload: Payload) -> None:
+async def cute(payload: Payload) -> None:
     """!cute [cat/dog/bunny/lizard/fox/duck/shibe], or just !cute to get a random picture."""
     args = payload.get_text().split()
 
@@ -101,11 +112,11 @@ def cute(payload: Payload) -> None:
         # right args. Just pick an animal at random.
         animal = animals.get(random.choice([*animals.keys()]))
 
-    animal_name, pic = get_pic(random.choice(animal))
+    animal_name, pic = await get_pic(random.choice(animal))
     if unknown:
-        payload.say(f"I'm not sure what you asked for, so here's a {animal_name}!")
+        await call_sync(payload.say, f"I'm not sure what you asked for, so here's a {animal_name}!")
 
-    payload.say(pic)
+    await call_sync(payload.say, pic)
 
 
-PLUGIN = Plugin(func=cute, regex=r"^cute")
+PLUGIN = Plugin(func=async_plugin(cute), regex=r"^cute")
@@ -1,9 +1,14 @@
 from utonium import Payload, Plugin
 
-from bubbles.commands.periodic.rule_monitoring import get_subreddit_stack
+from bubbles.commands.periodic.rule_monitoring import format_pass_stats, get_subreddit_stack
 from bubbles.commands.periodic.transcription_check_ping import (
     transcription_check_ping_callback,
 )
+from bubbles.config import app, channel_mirror
+from bubbles.event_dedup import deduplicator
+from bubbles.lazy import unwrap
+from bubbles.slack_client import RateLimitedWebClient
+from bubbles.watchdog import watchdog
 
 
 def debug(payload: Payload) -> None:
@@ -23,8 +28,21 @@ def debug(payload: Payload) -> None:
 
         payload.say(
             f"*New subreddits* ({new_subs_count}): {new_subs}\n\n"
-            f"*Subreddit stack* ({sub_stack_count}): {sub_stack}"
+            f"*Subreddit stack* ({sub_stack_count}): {sub_stack}\n\n"
+            f"{format_pass_stats()}"
         )
+    elif "dedup" in text:
+        payload.say(deduplicator.format_stats())
+    elif "mirror" in text:
+        payload.say(channel_mirror.format_stats())
+    elif "watchdog" in text:
+        payload.say(watchdog.format_stats())
+    elif "ratelimit" in text:
+        client = unwrap(app).client
+        if isinstance(client, RateLimitedWebClient):
+            payload.say(client.format_stats())
+        else:
+            payload.say("The Slack client isn't rate limited.")
     else:
         payload.say("Not sure what you want to debug.")
 
@@ -10,10 +10,14 @@ from utonium.specialty_blocks import ContextStepMessage
 from bubbles.commands.start import _start_service
 from bubbles.commands.stop import _stop_service
 from bubbles.config import COMMAND_PREFIXES
+from bubbles.progress import ProgressReporter
 from bubbles.service_utils import SERVICES, get_service_name, verify_service_up
 
 # the actual command that you run on the server to get the right version
 PYTHON_VERSION = "python3.10"
+# Don't let GitHub or systemd hold up the deploy forever
+HTTP_TIMEOUT = 30
+COMMAND_TIMEOUT = 120
 
 
 class DeployError(Exception):
@@ -24,11 +28,14 @@ def _deploy_service(service: str, payload: Payload) -> None:
     def check_for_new_version() -> dict:
         StatusMessage.add_new_context_step("Checking for new release...")
 
-        output = subprocess.check_output(shlex.split(f"{PYTHON_VERSION} {service}.pyz --version"))
+        output = subprocess.check_output(
+            shlex.split(f"{PYTHON_VERSION} {service}.pyz --version"), timeout=COMMAND_TIMEOUT
+        )
         # starting from something like b'BubblesV2, version ?????\n'
         current_version = output.decode().strip().split(", ")[-1].split()[-1]
         github_response = requests.get(
-            f"https://api.github.com/repos/grafeasgroup/{service}/releases/latest"
+            f"https://api.github.com/repos/grafeasgroup/{service}/releases/latest",
+            timeout=HTTP_TIMEOUT,
         )
         if github_response.status_code != 200:
             print(f"GITHUB RESPONSE CONTENT: {github_response.content}")
@@ -53,7 +60,7 @@ def _deploy_service(service: str, payload: Payload) -> None:
 
         subprocess.check_output(shlex.split(f"chmod +x {str(backup_archive)}"))
         # write the new archive to disk
-        resp = requests.get(url, stream=True)
+        resp = requests.get(url, stream=True, timeout=HTTP_TIMEOUT)
         new_archive = service_path / "temp.pyz"
         with open(new_archive, "wb") as new:
             for chunk in resp.iter_content(chunk_size=8192):
@@ -84,7 +91,10 @@ def _deploy_service(service: str, payload: Payload) -> None:
 
     def _restart_service() -> str:
         return (
-            subprocess.check_output(["sudo", "systemctl", "restart", get_service_name(service)])
+            subprocess.check_output(
+                ["sudo", "systemctl", "restart", get_service_name(service)],
+                timeout=COMMAND_TIMEOUT,
+            )
             .decode()
             .strip()
         )
@@ -127,9 +137,11 @@ def _deploy_service(service: str, payload: Payload) -> None:
         StatusMessage.add_new_context_step(f"Running migrations...")
         try:
             subprocess.check_call(
-                shlex.split(f"sh -c '{PYTHON_VERSION} {str(service)}.pyz -c migrate'")
+                shlex.split(f"sh -c '{PYTHON_VERSION} {str(service)}.pyz -c migrate'"),
+                # Migrations can take a while, but not forever
+                timeout=COMMAND_TIMEOUT * 5,
             )
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
             StatusMessage.step_failed()
             revert_and_recover()
             raise DeployError("Could not perform database migration! Unable to proceed!")
@@ -171,7 +183,12 @@ def _deploy_service(service: str, payload: Payload) -> None:
         StatusMessage.add_new_context_step(f"Successfully deployed {service}!")
         StatusMessage.step_is_info()
 
-    except (DeployError, subprocess.CalledProcessError) as e:
+    except (
+        DeployError,
+        subprocess.CalledProcessError,
+        subprocess.TimeoutExpired,
+        requests.RequestException,
+    ) as e:
         print(e)  # make available in logs
         send_error_end(e)
         return
@@ -204,8 +221,15 @@ def deploy(payload: Payload) -> None:
         return
 
     if service == "all":
-        for system in [_ for _ in SERVICES if _ != "all"]:
+        systems = [_ for _ in SERVICES if _ != "all"]
+        # Every service reports its own steps, this keeps track of the whole run
+        progress = ProgressReporter.from_payload(payload, "Deploying all services")
+        progress.start_stage("Deploying", total=len(systems))
+        for system in systems:
             _deploy_service(system, payload)
+            progress.advance()
+        progress.end_stage(f"Ran the deploys of {', '.join(systems)}")
+        progress.finish()
     else:
         _deploy_service(service, payload)
 
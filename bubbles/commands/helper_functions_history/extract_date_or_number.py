@@ -1,5 +1,8 @@
 from datetime import date, datetime, timezone
 
+# The most messages that can be requested by number. Anything larger is a timestamp.
+MAX_MESSAGES = 10000
+
 
 def extract_date_or_number(arg: str) -> int:
     """Function that extracts either the date or the number of posts required by the
@@ -13,5 +16,5 @@ def extract_date_or_number(arg: str) -> int:
         )
         output_value = int(date_found.timestamp())
     except ValueError:
-        output_value = max(1, min(1000, int(arg)))
+        output_value = max(1, min(MAX_MESSAGES, int(arg)))
     return output_value
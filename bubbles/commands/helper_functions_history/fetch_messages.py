@@ -1,44 +1,21 @@
-from slack_sdk.web import SlackResponse
+from typing import Dict, Iterator
+
 from utonium import Payload
 
-from bubbles.config import rooms_list
+from bubbles.commands.helper_functions_history.extract_date_or_number import MAX_MESSAGES
+from bubbles.config import channel_mirror, rooms_list
+
+# The channel read by !history, !historywho and !historylist; it is mirrored
+HISTORY_CHANNEL = "new_volunteers"
+
 
+def fetch_messages(payload: Payload, input_value: int, channel_name: str) -> Iterator[Dict]:
+    """Function that fetches the number of messages required by the input argument.
 
-def fetch_messages(payload: Payload, input_value: int, channel_name: str) -> SlackResponse:
-    """Function that fetches the number of messages required by the input argument."""
+    The input is either the number of messages or the timestamp of the oldest one.
+    The messages come from the channel mirror where possible, see `bubbles.channel_mirror`.
+    """
     channel = rooms_list[channel_name]
-    if input_value > 1000:
-        messages = payload.client.conversations_history(
-            channel=channel, oldest=str(input_value), inclusive=True
-        )
-        print("Has this message more data?" + str(messages["has_more"]))
-        is_there_other_data = messages["has_more"]
-        print(type(messages["messages"]))
-        last_message = messages["messages"][0]
-        print(last_message["ts"])
-        print("---" + str(type(last_message)))
-        print(last_message)
-        input_value = last_message["ts"]
-        while is_there_other_data:
-            newMessages = payload.client.conversations_history(
-                channel=channel, oldest=input_value, inclusive=True
-            )
-            # print("---" + str(type(messages["messages"])))
-            # print("--- ---" + str(type(newMessages["messages"])))
-            # print("-------")
-            # print()
-            # print(len(messages["messages"]))
-            # print(len(newMessages["messages"]))
-            messages["messages"].extend(newMessages["messages"])
-            # print(len(messages["messages"]))
-            is_there_other_data = newMessages["has_more"]
-            if is_there_other_data:
-                last_message = newMessages["messages"][0]
-                # print(type(last_message))
-                # print(last_message["ts"])
-                # print(last_message.keys())
-                input_value = last_message["ts"]
-            # print("Has this new message more data?" + str(is_there_other_data))
-    else:
-        messages = payload.client.conversations_history(channel=channel, limit=input_value)
-    return messages
+    if input_value > MAX_MESSAGES:
+        return channel_mirror.iter_history(channel, oldest=input_value, inclusive=True)
+    return channel_mirror.iter_history(channel, limit=input_value)
@@ -0,0 +1,11 @@
+from utonium import Payload, Plugin
+
+from bubbles.tl_utils import tl
+
+
+def jobs(payload: Payload) -> None:
+    """!jobs - show when the periodic jobs ran, how long they took and if they failed."""
+    payload.say(tl.format_stats())
+
+
+PLUGIN = Plugin(func=jobs, regex=r"^jobs$")
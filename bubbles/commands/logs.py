@@ -8,6 +8,8 @@ from bubbles.service_utils import SERVICES, get_service_name
 # note: this command requires setting up sudoers access
 
 COMMAND = "journalctl -u {} -n 50"
+# journalctl can hang on a busy journal
+TIMEOUT = 30
 VALID = "Valid choices: {}".format(", ".join(SERVICES))
 
 
@@ -24,7 +26,13 @@ def logs(payload: Payload) -> None:
     if service == "all":
         payload.say("Sorry, that's a lot of logs. Please specify the service you want.")
         payload.say(VALID)
-    result = subprocess.check_output(COMMAND.format(get_service_name(service)).split())
+    try:
+        result = subprocess.check_output(
+            COMMAND.format(get_service_name(service)).split(), timeout=TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        payload.say(f"journalctl didn't answer within {TIMEOUT} seconds, please try again.")
+        return
 
     payload.upload_file(
         content=result.decode().strip(),
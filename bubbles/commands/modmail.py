@@ -1,29 +1,162 @@
+"""Relay the modmail of r/TranscribersOfReddit to #mod_messages.
+
+The poller is cheap when nothing happens: `CheckModmail` runs often, but
+`modmail_callback` only asks Reddit when `poll_interval` says it's time. That
+interval grows while modmail is quiet and drops back to the minimum as soon as
+something arrives. The moderator list is cached, and the last relayed message
+of every conversation is persisted, so a restart doesn't relay it again.
+
+The relayed messages are kept in the `render_cache`, so that the "Expand text"
+and "Collapse text" buttons only edit the Slack message.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple, TypedDict
+
 from praw.models import Redditor, Subreddit
 from slack_sdk.models import blocks
 from utonium import Payload, Plugin
 
-from bubbles.config import app, reddit, rooms_list
+from bubbles.config import app, job_state, reddit, rooms_list
+from bubbles.lazy import LazyProxy
 
-sub = reddit.subreddit("transcribersofreddit")
+sub = LazyProxy(lambda: reddit.subreddit("transcribersofreddit"))
 MESSAGE_CUTOFF_LENGTH = 250
 SLACK_MESSAGE_CUTOFF_LENGTH = 2950  # really 3k but we want to be safe
 
+# The team doesn't change often, and a stale list only mislabels the first message
+MODERATOR_TTL = timedelta(hours=1)
 
-def build_and_send_message(
-    convo_id: str = None,
-    message_id: str = None,
-    expand_message: bool = False,
-    update_message_data: dict = None,
-) -> None:
-    """Starting from a conversation id and a message ID, build the notification message.
+# The job state key of the last relayed message of each conversation
+HIGH_WATER_MARKS_KEY = "modmail.high_water_marks"
+# Only the most recently active conversations are remembered
+MAX_TRACKED_CONVERSATIONS = 500
+# When a conversation got a lot of messages at once, only relay the latest ones
+MAX_RELAYED_PER_CONVERSATION = 5
+# The number of relayed messages that can be expanded without asking Reddit
+RENDER_CACHE_SIZE = 1000
+
+
+class PollInterval:
+    """An interval that grows while there is nothing to do and resets when there is.
 
-    No message_id means start from the latest message.
+    `CheckModmail` runs every `minimum`; the runs in between are skipped.
     """
-    convo = sub.modmail(convo_id)
-    if message_id:
-        message = [m for m in convo.messages if m.id == message_id][0]
-    else:
-        message = convo.messages[-1]
+
+    def __init__(
+        self,
+        minimum: timedelta = timedelta(seconds=15),
+        maximum: timedelta = timedelta(minutes=5),
+        factor: float = 1.5,
+        clock: Any = time.monotonic,
+    ) -> None:
+        self.minimum = minimum.total_seconds()
+        self.maximum = maximum.total_seconds()
+        self.factor = factor
+        self.clock = clock
+        self.current = self.minimum
+        self._next_poll = 0.0
+
+    def is_due(self) -> bool:
+        return self.clock() >= self._next_poll
+
+    def record(self, busy: bool) -> None:
+        """Schedule the next poll depending on whether this one found something."""
+        if busy:
+            self.current = self.minimum
+        else:
+            self.current = min(self.current * self.factor, self.maximum)
+        self._next_poll = self.clock() + self.current
+
+
+poll_interval = PollInterval()
+
+_moderators: Set[str] = set()
+_moderators_updated: Optional[float] = None
+_moderators_lock = threading.Lock()
+
+
+def get_moderator_names() -> Set[str]:
+    """Get the (lowercase) names of our moderators, cached for `MODERATOR_TTL`."""
+    global _moderators, _moderators_updated
+
+    with _moderators_lock:
+        now = time.monotonic()
+        if _moderators_updated is None or now - _moderators_updated > MODERATOR_TTL.total_seconds():
+            _moderators = {moderator.name.lower() for moderator in sub.moderator()}
+            _moderators_updated = now
+        return _moderators
+
+
+def _is_moderator(author: Any) -> bool:
+    name = getattr(author, "name", None)
+    return name is not None and name.lower() in get_moderator_names()
+
+
+def get_unrelayed_messages(messages: List[Any], last_relayed: Optional[str]) -> List[Any]:
+    """Get the messages that came in after the last one that we relayed.
+
+    If we don't know the conversation (or the message is gone), only the latest
+    message is new to us.
+    """
+    ids = [message.id for message in messages]
+    if last_relayed is None or last_relayed not in ids:
+        return messages[-1:]
+    return messages[ids.index(last_relayed) + 1 :][-MAX_RELAYED_PER_CONVERSATION:]
+
+
+def _set_high_water_mark(marks: Dict[str, str], convo_id: str, message_id: str) -> None:
+    # Re-insert to keep the dict ordered by activity, the oldest ones are dropped
+    marks.pop(convo_id, None)
+    marks[convo_id] = message_id
+    for stale in list(marks)[:-MAX_TRACKED_CONVERSATIONS]:
+        del marks[stale]
+    job_state.set(HIGH_WATER_MARKS_KEY, marks)
+
+
+class RenderedMessage(TypedDict):
+    """Everything needed to show a modmail message in Slack."""
+
+    convo_id: str
+    message_id: str
+    sender: str
+    recipient: str
+    subject: str
+    # The full body, up to SLACK_MESSAGE_CUTOFF_LENGTH
+    body: str
+
+
+class RenderCache:
+    """The recently relayed messages, so the expand and collapse buttons don't need Reddit."""
+
+    def __init__(self, max_size: int = RENDER_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._rendered: "OrderedDict[Tuple[str, str], RenderedMessage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, convo_id: str, message_id: str) -> Optional[RenderedMessage]:
+        with self._lock:
+            rendered = self._rendered.get((convo_id, message_id))
+            if rendered is not None:
+                self._rendered.move_to_end((convo_id, message_id))
+            return rendered
+
+    def put(self, rendered: RenderedMessage) -> None:
+        with self._lock:
+            key = (rendered["convo_id"], rendered["message_id"])
+            self._rendered[key] = rendered
+            self._rendered.move_to_end(key)
+            while len(self._rendered) > self.max_size:
+                self._rendered.popitem(last=False)
+
+
+render_cache = RenderCache()
+
+
+def render_message(convo: Any, message: Any) -> RenderedMessage:
+    """Work out who sent the message to whom."""
     # The other end of the message is one of:
     # *.user: Redditor
     # *.participant: Redditor
@@ -44,7 +177,7 @@ def build_and_send_message(
     ):
         # WAIT! We _might_ have been sent a message, but the modmail API doesn't
         # make that clear.
-        if message.author in [i for i in sub.moderator()]:
+        if _is_moderator(message.author):
             # The author is one of our moderators, so we sent it.
             sender = sub
             recipient = participant
@@ -74,7 +207,6 @@ def build_and_send_message(
         # realistically we shouldn't ever hit this, but it's a good safety
         sender = "unknown sender"
         recipient = "unknown recipient"
-    convo.read()
 
     if isinstance(sender, Redditor):
         sender = f"u/{sender.name}"
@@ -86,16 +218,33 @@ def build_and_send_message(
     if isinstance(recipient, Subreddit):
         recipient = f"r/{recipient.display_name}"
 
-    extra = (
-        " :banhammer_fancy:" if convo.subject.startswith("You've been permanently banned") else ""
-    )
-
-    message_body = message.body_markdown
-    show_expando_button = False
-    if len(message_body) > SLACK_MESSAGE_CUTOFF_LENGTH:
+    body = message.body_markdown
+    if len(body) > SLACK_MESSAGE_CUTOFF_LENGTH:
         # whoa buddy that's a big'un
-        message_body = message_body[:SLACK_MESSAGE_CUTOFF_LENGTH] + "..."
+        body = body[:SLACK_MESSAGE_CUTOFF_LENGTH] + "..."
+
+    return {
+        "convo_id": convo.id,
+        "message_id": message.id,
+        "sender": str(sender),
+        "recipient": str(recipient),
+        "subject": convo.subject,
+        "body": body,
+    }
+
+
+def build_chat_args(rendered: RenderedMessage, expand_message: bool = False) -> Dict[str, Any]:
+    """Build the Slack message for the rendered modmail message."""
+    convo_id = rendered["convo_id"]
+    message_id = rendered["message_id"]
+    sender = rendered["sender"]
+    recipient = rendered["recipient"]
+    subject = rendered["subject"]
 
+    extra = " :banhammer_fancy:" if subject.startswith("You've been permanently banned") else ""
+
+    message_body = rendered["body"]
+    show_expando_button = False
     if len(message_body) > MESSAGE_CUTOFF_LENGTH:
         # A long message means we need to both show the button AND maybe change the
         # length of the text.
@@ -105,7 +254,7 @@ def build_and_send_message(
 
     msg_blocks = [
         blocks.SectionBlock(text=f"*{sender}* :arrow_right: *{recipient}*"),
-        blocks.SectionBlock(text=f"*Subject*: {convo.subject}{extra}"),
+        blocks.SectionBlock(text=f"*Subject*: {subject}{extra}"),
         blocks.DividerBlock(),
         blocks.SectionBlock(text=message_body),
         blocks.DividerBlock(),
@@ -113,17 +262,17 @@ def build_and_send_message(
 
     action_elements = [
         blocks.LinkButtonElement(
-            url=f"https://mod.reddit.com/mail/all/{convo.id}",
+            url=f"https://mod.reddit.com/mail/all/{convo_id}",
             text="Open in Modmail",
         )
     ]
     if show_expando_button:
         if not expand_message:
             button_text = "Expand text"
-            value = f"modmail_embiggen_{convo.id}_{message.id}"
+            value = f"modmail_embiggen_{convo_id}_{message_id}"
         else:
             button_text = "Collapse text"
-            value = f"modmail_ensmallen_{convo.id}_{message.id}"
+            value = f"modmail_ensmallen_{convo_id}_{message_id}"
         action_elements += [
             blocks.ButtonElement(
                 text=button_text,
@@ -135,16 +284,16 @@ def build_and_send_message(
         blocks.ActionsBlock(elements=action_elements),
         blocks.ContextBlock(
             elements=[
-                blocks.MarkdownTextObject(text=f"Conversation ID: {convo.id}"),
-                blocks.MarkdownTextObject(text=f"Message ID: {message.id}"),
+                blocks.MarkdownTextObject(text=f"Conversation ID: {convo_id}"),
+                blocks.MarkdownTextObject(text=f"Message ID: {message_id}"),
             ]
         ),
     ]
 
-    chat_args = {
+    return {
         "text": (
             f":modmail: *{sender}* :arrow_right: *{recipient}*\n"
-            f":star2: *{convo.subject}*\n"
+            f":star2: *{subject}*\n"
             f"{message_body}"
         ),
         "as_user": True,
@@ -153,6 +302,33 @@ def build_and_send_message(
         "blocks": msg_blocks,
     }
 
+
+def build_and_send_message(
+    convo_id: str = None,
+    message_id: str = None,
+    expand_message: bool = False,
+    update_message_data: dict = None,
+    convo: Any = None,
+) -> None:
+    """Starting from a conversation id and a message ID, build the notification message.
+
+    No message_id means start from the latest message. Pass the `convo` if it
+    has already been fetched. Messages that were relayed recently are taken from
+    the `render_cache` without asking Reddit.
+    """
+    rendered = render_cache.get(convo_id, message_id) if message_id else None
+    if rendered is None:
+        if convo is None:
+            convo = sub.modmail(convo_id)
+        if message_id:
+            message = [m for m in convo.messages if m.id == message_id][0]
+        else:
+            message = convo.messages[-1]
+        rendered = render_message(convo, message)
+        render_cache.put(rendered)
+
+    chat_args = build_chat_args(rendered, expand_message)
+
     if update_message_data:
         app.client.chat_update(
             channel=update_message_data["channel"],
@@ -163,22 +339,42 @@ def build_and_send_message(
         app.client.chat_postMessage(channel=rooms_list["mod_messages"], **chat_args)
 
 
-def process_modmail(message_state: str) -> None:
-    for convo in sub.modmail.conversations(state=message_state):
-        if not convo.last_unread:
+def process_modmail(message_state: str) -> int:
+    """Relay the new messages of the unread conversations.
+
+    :returns: The number of relayed messages.
+    """
+    marks: Dict[str, str] = dict(job_state.get(HIGH_WATER_MARKS_KEY, {}))
+    relayed = 0
+
+    for listed_convo in sub.modmail.conversations(state=message_state):
+        if not listed_convo.last_unread:
             # this attribute will have a timestamp if there's an unread message and
             # will be empty if we've been here before.
             continue
 
-        build_and_send_message(convo_id=convo.id)
+        convo = sub.modmail(listed_convo.id)
+        for message in get_unrelayed_messages(convo.messages, marks.get(convo.id)):
+            build_and_send_message(convo_id=convo.id, message_id=message.id, convo=convo)
+            # Before marking it as read, so that a crash in-between doesn't lose it
+            _set_high_water_mark(marks, convo.id, message.id)
+            relayed += 1
+        convo.read()
+
+    return relayed
 
 
 def modmail_callback() -> None:
-    unread_counts: dict[str, int] = sub.modmail.unread_count()
+    if not poll_interval.is_due():
+        return
 
+    unread_counts: dict[str, int] = sub.modmail.unread_count()
+    relayed = 0
     for message_state, count in unread_counts.items():
         if count > 0:
-            process_modmail(message_state)
+            relayed += process_modmail(message_state)
+
+    poll_interval.record(busy=relayed > 0)
 
 
 def handle_expansion_actions(payload: Payload) -> None:
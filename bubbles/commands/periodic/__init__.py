@@ -8,4 +8,11 @@ TRANSCRIPTION_CHECK_PING_CHANNEL = "qa_transcription_check_pings"
 MERCH_CHANNEL = "admin_merch"
 
 RULE_MONITORING_CHANNEL_ID = os.getenv("RULE_MONITORING_CHANNEL_ID")
+# The single file the rules used to be saved in, it's moved to the directory on startup
 RULE_MONITORING_DATA_PATH = os.getenv("RULE_MONITORING_DATA_PATH")
+# The rules of every sub are saved in a file of their own in here, see `rule_store`
+RULE_MONITORING_DATA_DIR = os.getenv("RULE_MONITORING_DATA_DIR") or (
+    os.path.splitext(RULE_MONITORING_DATA_PATH)[0] + ".d" if RULE_MONITORING_DATA_PATH else None
+)
+# How many subreddits are checked per run, see `rule_monitoring`
+RULE_MONITORING_CHECKS_PER_RUN = int(os.getenv("RULE_MONITORING_CHECKS_PER_RUN", 10))
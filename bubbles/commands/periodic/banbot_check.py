@@ -1,42 +1,109 @@
-from bubbles.config import app, reddit, rooms_list
+"""Warn the team when a partner subreddit adds a banbot to its moderators.
 
+The moderator lists are fetched in parallel, within our Reddit budget, and
+kept in the job state. Only what changed since the last run is reported: a
+banbot that joined the mod team of a partner (or a new partner with a banbot),
+and banbots that left.
+"""
+from typing import Dict, List, Optional, Set
 
-def banbot_check_callback() -> None:
-    subreddits = reddit.subreddit("TranscribersOfReddit").wiki["subreddits"].content_md.splitlines()
-
-    # make sure to add names in lowercase
-    known_banbots = ["saferbot", "misandrybot", "safestbot"]
-
-    # List of subreddits with banbots that have been "authorized"
-    # after discussion with their mod team
-    subreddit_exceptions = {
-        "BAME_UK": ["safestbot"],
-        "Feminism": ["safestbot"],
-        "insaneparents": ["safestbot"],
-        "ShitLiberalsSay": ["safestbot"],
-        "traaaaaaannnnnnnnnns": ["safestbot"],
-        "GreenAndPleasant": ["safestbot"],
-        "me_irlgbt": ["safestbot"],
-        "CapitalismSux": ["safestbot"],
+from bubbles.config import app, job_state, partner_subreddits, reddit, reddit_budget, rooms_list
+from bubbles.rate_limit import PERIODIC, map_in_threads
+
+# The job state key of the moderators of every partner, casefolded
+MODERATORS_KEY = "banbot_check.moderators"
+WORKERS = 4
+
+# make sure to add names in lowercase
+KNOWN_BANBOTS = ["saferbot", "misandrybot", "safestbot"]
+
+# List of subreddits with banbots that have been "authorized"
+# after discussion with their mod team
+SUBREDDIT_EXCEPTIONS = {
+    "BAME_UK": ["safestbot"],
+    "Feminism": ["safestbot"],
+    "insaneparents": ["safestbot"],
+    "ShitLiberalsSay": ["safestbot"],
+    "traaaaaaannnnnnnnnns": ["safestbot"],
+    "GreenAndPleasant": ["safestbot"],
+    "me_irlgbt": ["safestbot"],
+    "CapitalismSux": ["safestbot"],
+}
+# The partner subreddits are casefolded
+SUBREDDIT_EXCEPTIONS = {sub.casefold(): bots for sub, bots in SUBREDDIT_EXCEPTIONS.items()}
+
+
+def _get_moderators(sub: str) -> List[str]:
+    reddit_budget.acquire()
+    return sorted(mod.name.lower() for mod in reddit.subreddit(sub).moderator())
+
+
+def get_banbots(sub: str, moderators: Optional[List[str]]) -> Set[str]:
+    """Get the banbots on the mod team that haven't been authorized."""
+    if not moderators:
+        return set()
+    allowed = SUBREDDIT_EXCEPTIONS.get(sub, [])
+    return {bot for bot in KNOWN_BANBOTS if bot in moderators and bot not in allowed}
+
+
+def find_banbot_changes(
+    previous: Dict[str, List[str]], current: Dict[str, List[str]]
+) -> Dict[str, Dict[str, List[str]]]:
+    """Find the banbots that joined or left the mod team of a sub since the last run.
+
+    :returns: For both "added" and "removed", the affected subs by banbot.
+    """
+    changes: Dict[str, Dict[str, List[str]]] = {
+        "added": {bot: [] for bot in KNOWN_BANBOTS},
+        "removed": {bot: [] for bot in KNOWN_BANBOTS},
     }
+    for sub, moderators in sorted(current.items()):
+        if moderators == previous.get(sub):
+            # Nothing changed, so there's nothing new to report
+            continue
+        before = get_banbots(sub, previous.get(sub))
+        after = get_banbots(sub, moderators)
+        for bot in after - before:
+            changes["added"][bot].append(sub)
+        for bot in before - after:
+            changes["removed"][bot].append(sub)
+    return changes
+
 
-    sublists = {key: [] for key in known_banbots}
+def banbot_check_callback() -> None:
+    subreddits = sorted(partner_subreddits.get())
+    previous: Dict[str, List[str]] = job_state.get(MODERATORS_KEY, {})
 
-    for sub in subreddits:
-        mods = [mod.name.lower() for mod in reddit.subreddit(sub).moderator()]
-        for banbot in known_banbots:
-            if banbot in mods and banbot not in subreddit_exceptions.get(sub, []):
-                sublists[banbot].append(sub)
+    current = dict(map_in_threads(_get_moderators, subreddits, WORKERS, priority=PERIODIC))
+    changes = find_banbot_changes(previous, current)
+
+    # Keep the old snapshot of the subs we couldn't fetch, forget the former partners
+    job_state.set(
+        MODERATORS_KEY,
+        {
+            sub: current.get(sub, previous.get(sub))
+            for sub in subreddits
+            if sub in current or sub in previous
+        },
+    )
 
     message = (
         ":rotating_light: :radioactive_sign:{0}:radioactive_sign:"
         " detected in the following subreddits: {1} :rotating_light:"
     )
 
-    for banbot in sublists:
-        if len(sublists[banbot]) > 0:
+    for banbot, subs in changes["added"].items():
+        if len(subs) > 0:
+            app.client.chat_postMessage(
+                channel=rooms_list["general"],
+                text=message.format(banbot, ", ".join(subs)),
+                as_user=True,
+            )
+
+    for banbot, subs in changes["removed"].items():
+        if len(subs) > 0:
             app.client.chat_postMessage(
                 channel=rooms_list["general"],
-                text=message.format(banbot, ", ".join(sublists[banbot])),
+                text=f":tada: {banbot} is gone from the following subreddits: {', '.join(subs)}",
                 as_user=True,
             )
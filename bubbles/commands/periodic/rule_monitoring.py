@@ -1,17 +1,33 @@
-import json
+"""Tell the mods when a partner subreddit changes its rules.
+
+Every run checks the next `RULE_MONITORING_CHECKS_PER_RUN` subreddits of the
+stack -- the ones that haven't been checked for the longest -- on a small
+thread pool. Every Reddit call takes a token from `reddit_budget`, so how fast
+we get through all partner subs depends on our API budget rather than on the
+schedule. How long a full pass takes is shown in `!debug rule_monitoring`.
+"""
 import logging
-import os.path
-from datetime import datetime, timezone
-from time import sleep
-from typing import Dict, List, Optional, Tuple, TypedDict
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypedDict, TypeVar
 
 from praw.models import Rule
 
 from bubbles.commands.periodic import (
     RULE_MONITORING_CHANNEL_ID,
+    RULE_MONITORING_CHECKS_PER_RUN,
+    RULE_MONITORING_DATA_DIR,
     RULE_MONITORING_DATA_PATH,
 )
-from bubbles.config import app, reddit
+from bubbles.commands.periodic.rule_store import RuleStore
+from bubbles.config import app, job_state, partner_subreddits, reddit, reddit_budget
+from bubbles.lazy import LazyProxy
+from bubbles.rate_limit import PERIODIC, map_in_threads
+from bubbles.watchdog import check_cancelled
+
+T = TypeVar("T")
 
 # Newly-added subreddits that don't have their rules tracked yet
 new_subreddits: List[str] = []
@@ -19,11 +35,27 @@ new_subreddits: List[str] = []
 # The subreddits that have not been updated for the longest are at the top
 # of the stack (the end of the list)
 subreddit_stack: List[str] = []
+# When the current pass over all subreddits started, how many subs it has, and
+# how long the last complete pass took
+pass_stats: Dict[str, Any] = {}
+# Whether the lists above have been restored from the job state after a restart
+_state_loaded: bool = False
+# The changes of the partner list that haven't been applied to the lists yet
+_pending_added: Set[str] = set()
+_pending_removed: Set[str] = set()
+_pending_lock = threading.Lock()
 # global shutoff check for local development
 DISABLED: bool = False
 
 logger = logging.getLogger("__name__")
 
+NEW_SUBREDDITS_KEY = "rule_monitoring.new_subreddits"
+SUBREDDIT_STACK_KEY = "rule_monitoring.subreddit_stack"
+PASS_STATS_KEY = "rule_monitoring.pass_stats"
+
+# The Reddit budget is what limits us, the threads only hide the latency
+WORKERS = 4
+
 
 class SubredditRule(TypedDict):
     # The rule number
@@ -34,18 +66,6 @@ class SubredditRule(TypedDict):
     created_time: str
 
 
-class RuleEntry(TypedDict):
-    # Iso-formatted date string
-    last_update: str
-    rules: List[SubredditRule]
-
-
-# A map from a subreddit name to its rules
-# If the dict has no entry for a given sub, the rules have not been fetched yet
-# If the dict has an empty list as entry for a given sub, this sub did not define any rules
-SubredditRuleMap = Dict[str, RuleEntry]
-
-
 class RuleEdited(TypedDict):
     """A rule has been edited."""
 
@@ -66,78 +86,50 @@ class RuleChanges(TypedDict):
     edited: List[RuleEdited]
 
 
-def _save_all_rules(rules: SubredditRuleMap) -> None:
-    """Save all rules to the save file."""
-    path = RULE_MONITORING_DATA_PATH
-    dir_path = os.path.dirname(path)
-
-    # Create the data folder if it doesn't exist yet
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path, exist_ok=True)
-
-    # Write the rules to the file
-    with open(path, "w+") as file:
-        json.dump(rules, file, indent=2)
+def _build_rule_store() -> RuleStore:
+    return RuleStore(Path(RULE_MONITORING_DATA_DIR), legacy_path=RULE_MONITORING_DATA_PATH)
 
 
-def _save_rules_for_sub(sub_name: str, rules: Optional[List[SubredditRule]]) -> None:
-    """Save the rules for the given sub.
-
-    The changes are persisted to a file, such that it is available after restart.
-    """
-    rule_entry: RuleEntry = {
-        # It has been updated now
-        "last_updated": datetime.now(tz=timezone.utc).isoformat(),
-        "rules": rules or [],
-    }
+# Created on first use, which also moves the rules over from the old single file
+rule_store: RuleStore = LazyProxy(_build_rule_store)  # type: ignore
 
-    # Load the previous rules
-    all_rules = _load_all_rules()
-    # Add the change
-    all_rules[sub_name] = rule_entry
-    # Save it again
-    _save_all_rules(all_rules)
 
+def _get_subreddit_names() -> List[str]:
+    """Get the names of all subreddits in the queue."""
+    # Sort the list alphabetically
+    return sorted(partner_subreddits.get())
 
-def _load_all_rules() -> SubredditRuleMap:
-    """Loads all rules from the save file."""
-    path = RULE_MONITORING_DATA_PATH
-
-    if not os.path.exists(path):
-        # We don't have any data saved yet, so no rules yet
-        return {}
-
-    with open(path, "r") as file:
-        content = file.read()
 
-        if content == "" or content.isspace():
-            # There is a file, but it's empty, so no rules yet
-            return {}
+def _on_partners_changed(added: Set[str], removed: Set[str]) -> None:
+    """Remember the change of the partner list for the next run.
 
-        # Otherwise, parse the saved rule data
-        return json.loads(content)
+    This can be called from any job that looks at the partner list, so the
+    stacks are only changed by our own job, in `_apply_partner_changes`.
+    """
+    with _pending_lock:
+        _pending_added.update(added)
+        _pending_added.difference_update(removed)
+        _pending_removed.update(removed)
+        _pending_removed.difference_update(added)
 
 
-def _load_rules_for_sub(sub_name: str) -> Optional[List[SubredditRule]]:
-    """Load the rules for the given sub."""
-    all_rules = _load_all_rules()
+def _apply_partner_changes() -> None:
+    """Initialize the new partners right away and forget the removed ones."""
+    global new_subreddits
+    global subreddit_stack
 
-    if rule_entry := all_rules.get(sub_name):
-        return rule_entry["rules"]
+    with _pending_lock:
+        added, removed = set(_pending_added), set(_pending_removed)
+        _pending_added.clear()
+        _pending_removed.clear()
+    if not added and not removed:
+        return
 
-    # We never checked the given sub
-    return None
-
-
-def _get_subreddit_names() -> List[str]:
-    """Get the names of all subreddits in the queue."""
-    tor = reddit.subreddit("TranscribersOfReddit")
-    subreddit_page = tor.wiki["subreddits"]
-    page_content: str = subreddit_page.content_md
-    subreddits: List[str] = page_content.strip().splitlines()
-    # Sort the list alphabetically
-    subreddits.sort(key=lambda x: x.casefold())
-    return subreddits
+    new_subreddits = [name for name in new_subreddits if name.casefold() not in removed]
+    subreddit_stack = [name for name in subreddit_stack if name.casefold() not in removed]
+    known = {name.casefold() for name in new_subreddits}
+    new_subreddits += sorted(name for name in added if name not in known)
+    _save_state()
 
 
 def _convert_subreddit_rule(rule: Rule, index: int) -> SubredditRule:
@@ -157,6 +149,7 @@ def _get_subreddit_rules(sub_name: str) -> List[SubredditRule]:
 
     If no rules have been defined, `None` is returned.
     """
+    reddit_budget.acquire()
     sub = reddit.subreddit(sub_name)
     rules = [_convert_subreddit_rule(rule, idx + 1) for idx, rule in enumerate(sub.rules)]
 
@@ -166,7 +159,15 @@ def _get_subreddit_rules(sub_name: str) -> List[SubredditRule]:
 def _initialize_rules(sub_name: str) -> None:
     """Initialize the rules for the given subreddit."""
     rules = _get_subreddit_rules(sub_name)
-    _save_rules_for_sub(sub_name, rules)
+    rule_store.save_rules(sub_name, rules)
+
+
+def _in_parallel(func: Callable[[str], T], sub_names: List[str]) -> Iterator[Tuple[str, T]]:
+    """Call the function for all subs on the worker pool, yielding the results in order.
+
+    Subs for which the call fails are logged and left out.
+    """
+    return map_in_threads(func, sub_names, WORKERS, priority=PERIODIC)
 
 
 def _compare_rules(old_rules: List[SubredditRule], new_rules: List[SubredditRule]) -> RuleChanges:
@@ -200,14 +201,20 @@ def _check_rule_changes(sub_name: str) -> RuleChanges:
 
     This loads the saved rules from the sub and compares them with the newly
     fetched rules from Reddit.
-    It also saves the new rules back to the file.
+    It also saves the new rules back to the store.
+    Subs without saved rules (e.g. after `!clear_saved_rules`) are only
+    initialized; otherwise every one of their rules would show up as added.
     """
-    old_rules = _load_rules_for_sub(sub_name)
+    old_rules = rule_store.load_rules(sub_name)
     new_rules = _get_subreddit_rules(sub_name)
 
+    if old_rules is None:
+        rule_store.save_rules(sub_name, new_rules)
+        return {"added": [], "removed": [], "edited": []}
+
     changes = _compare_rules(old_rules, new_rules)
 
-    _save_rules_for_sub(sub_name, new_rules)
+    rule_store.save_rules(sub_name, new_rules)
 
     return changes
 
@@ -225,21 +232,22 @@ def _initialize_subreddit_stack() -> None:
     global subreddit_stack
 
     subreddit_names = _get_subreddit_names()
-    saved_rules = _load_all_rules()
+    # Only looks at the modification times, the rules themselves aren't loaded
+    last_checked = rule_store.get_last_checked()
 
     _new_subreddits: List[str] = []
-    entries: List[Tuple[str, RuleEntry]] = []
+    entries: List[Tuple[str, float]] = []
 
-    # Check which subs are new and which are already in the save file
+    # Check which subs are new and which are already in the store
     for sub_name in subreddit_names:
-        if saved_rules.get(sub_name) is None:
+        if (checked := last_checked.get(sub_name.casefold())) is None:
             _new_subreddits.append(sub_name)
         else:
-            entries.append((sub_name, saved_rules[sub_name]))
+            entries.append((sub_name, checked))
 
     # Sort the old entries by the time they were last updated
     # The oldest entries are last, so at the top of the stack
-    entries.sort(key=lambda x: x[1]["last_updated"], reverse=True)
+    entries.sort(key=lambda x: x[1], reverse=True)
     _subreddit_stack = [entry[0] for entry in entries]
 
     logging.info(
@@ -251,6 +259,40 @@ def _initialize_subreddit_stack() -> None:
     # We only do this once the process is complete, in case the bot crashes in-between
     new_subreddits = _new_subreddits
     subreddit_stack = _subreddit_stack
+    pass_stats["started"] = time.time()
+    pass_stats["subreddits"] = len(_new_subreddits) + len(_subreddit_stack)
+    _save_state()
+
+
+def _finish_pass() -> None:
+    """Record how long it took to get through all subreddits."""
+    if "started" not in pass_stats:
+        return
+    now = time.time()
+    pass_stats["last_duration"] = now - pass_stats.pop("started")
+    pass_stats["last_finished"] = now
+    pass_stats["last_subreddits"] = pass_stats.pop("subreddits", 0)
+    job_state.set(PASS_STATS_KEY, pass_stats)
+
+
+def _load_state() -> None:
+    """Continue with the subreddits that were left before the restart."""
+    global new_subreddits
+    global subreddit_stack
+    global _state_loaded
+
+    new_subreddits = job_state.get(NEW_SUBREDDITS_KEY, [])
+    subreddit_stack = job_state.get(SUBREDDIT_STACK_KEY, [])
+    pass_stats.update(job_state.get(PASS_STATS_KEY, {}))
+    partner_subreddits.subscribe(_on_partners_changed)
+    _state_loaded = True
+
+
+def _save_state() -> None:
+    """Persist the subreddits that are left to process."""
+    job_state.set(NEW_SUBREDDITS_KEY, new_subreddits)
+    job_state.set(SUBREDDIT_STACK_KEY, subreddit_stack)
+    job_state.set(PASS_STATS_KEY, pass_stats)
 
 
 def _format_rule(rule: SubredditRule) -> str:
@@ -338,8 +380,37 @@ def get_subreddit_stack() -> Tuple[List[str], List[str]]:
     return new_subreddits, subreddit_stack
 
 
+def _format_duration(seconds: float) -> str:
+    return str(timedelta(seconds=int(seconds)))
+
+
+def format_pass_stats() -> str:
+    """Describe how long it takes to check all subreddits, for humans."""
+    lines = []
+    if "last_duration" in pass_stats:
+        finished = datetime.fromtimestamp(pass_stats["last_finished"], tz=timezone.utc)
+        lines.append(
+            f"*Last full pass*: {_format_duration(pass_stats['last_duration'])}"
+            f" for {pass_stats['last_subreddits']} subreddits"
+            f" (finished {finished:%Y-%m-%d %H:%M} UTC)"
+        )
+    else:
+        lines.append("*Last full pass*: <None>")
+    if "started" in pass_stats:
+        left = len(new_subreddits) + len(subreddit_stack)
+        lines.append(
+            f"*Current pass*: running for {_format_duration(time.time() - pass_stats['started'])},"
+            f" {left} of {pass_stats['subreddits']} subreddits left"
+        )
+    lines.append(
+        f"*Reddit budget*: {reddit_budget.rate * 60:.0f} requests per minute,"
+        f" {RULE_MONITORING_CHECKS_PER_RUN} subreddits per run"
+    )
+    return "\n".join(lines)
+
+
 def rule_monitoring_callback() -> None:
-    """Check for rule changes for the next subreddit in the list.
+    """Check for rule changes for the next subreddits in the list.
 
     If no subs are left to process, the subreddit list is updated again.
     If new subs have been added, they will be processed immediately.
@@ -351,37 +422,53 @@ def rule_monitoring_callback() -> None:
         return
 
     # Global shutoff. If there's no path in the config, don't run.
-    if not RULE_MONITORING_DATA_PATH:
+    if not RULE_MONITORING_DATA_DIR:
         logger.error("No path to rules file found. Not running rules checks.")
         DISABLED = True
         return
 
+    if not _state_loaded:
+        _load_state()
+
+    # New partners don't have to wait for the next pass; this only downloads the
+    # list when it changed
+    partner_subreddits.get()
+    _apply_partner_changes()
+
     # Repopulate the subreddit queue if necessary
     if len(subreddit_stack) == 0:
         _initialize_subreddit_stack()
 
     # If there are new subs, check all of their rules directly
     if len(new_subreddits) > 0:
-        for sub_name in new_subreddits:
-            _initialize_rules(sub_name)
-            # Make sure we don't go over the API rate limit
-            sleep(1)
-
-        subs = ", ".join(new_subreddits)
-        # Reset new subreddits, we initialized them all
-        new_subreddits = []
-        _notify_mods(f"*Initialized* the rules of the following sub(s):\n{subs}")
+        initialized: List[str] = []
+        for sub_name, _ in _in_parallel(_initialize_rules, list(new_subreddits)):
+            initialized.append(sub_name)
+            # Remove them one by one, so a restart doesn't initialize them again
+            new_subreddits = [name for name in new_subreddits if name != sub_name]
+            _save_state()
+            # The rest is initialized in the next run
+            check_cancelled()
+
+        if initialized:
+            subs = ", ".join(initialized)
+            _notify_mods(f"*Initialized* the rules of the following sub(s):\n{subs}")
 
     # If no subs need to be checked, we wait for the next cycle
     # Then, the stack will be re-initialized
     if len(subreddit_stack) == 0:
         return
 
-    # Process the next sub in the stack
-    sub_name = subreddit_stack.pop()
-    # Check the changes (and save the new rules to file)
-    rule_changes = _check_rule_changes(sub_name)
-
-    # If there were changes, notify the mods
-    if change_message := _get_rule_change_message(sub_name, rule_changes):
-        _notify_mods(change_message)
+    # Process the next subs in the stack, the ones at the top first
+    batch = subreddit_stack[-RULE_MONITORING_CHECKS_PER_RUN:][::-1]
+    del subreddit_stack[-len(batch) :]
+    # Check the changes (and save the new rules to the store)
+    for sub_name, rule_changes in _in_parallel(_check_rule_changes, batch):
+        # If there were changes, notify the mods
+        if change_message := _get_rule_change_message(sub_name, rule_changes):
+            _notify_mods(change_message)
+
+    if len(subreddit_stack) == 0 and len(new_subreddits) == 0:
+        _finish_pass()
+    # Only now, so the subs are checked again if we crash in-between
+    _save_state()
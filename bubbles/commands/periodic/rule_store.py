@@ -0,0 +1,117 @@
+"""Save the rules of every partner subreddit in a file of its own.
+
+The rules of all subreddits used to live in a single JSON file, which was read,
+parsed and written again for every check -- once a minute. Now every sub has its
+own file in the store directory:
+
+- Files are written to a temporary file first and then renamed, so a crash
+  never leaves a half-written file behind.
+- Every file holds a hash of the rules. If a check finds the same rules again,
+  the file is only touched, so its modification time still tells when the sub
+  was last checked without reading it.
+- Subreddit names are casefolded, so "r/Pics" and "r/pics" share a file.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+SUFFIX = ".json"
+
+
+def hash_rules(rules: List[Dict[str, Any]]) -> str:
+    """Get a hash that changes whenever the rules do."""
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+
+
+class RuleStore:
+    """The saved rules of the partner subreddits, one file per sub.
+
+    :param legacy_path: The single JSON file that was used before, if any. It is
+    split up into the store once and then renamed.
+    """
+
+    def __init__(self, directory: Path, legacy_path: Optional[Path] = None) -> None:
+        self.directory = Path(directory)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.legacy_path is not None and self.legacy_path.is_file():
+            self._migrate(self.legacy_path)
+
+    def _get_path(self, sub_name: str) -> Path:
+        return self.directory / f"{sub_name.casefold()}{SUFFIX}"
+
+    def load_rules(self, sub_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Load the rules of the sub, or None if it was never checked."""
+        try:
+            with open(self._get_path(sub_name)) as file:
+                return json.load(file)["rules"]
+        except FileNotFoundError:
+            return None
+
+    def save_rules(
+        self, sub_name: str, rules: List[Dict[str, Any]], checked_at: Optional[float] = None
+    ) -> bool:
+        """Save the rules of the sub, marking it as checked.
+
+        :param checked_at: When the rules were fetched (seconds since the epoch), now by default.
+        :returns: False if the rules didn't change, so nothing had to be written.
+        """
+        path = self._get_path(sub_name)
+        rules_hash = hash_rules(rules)
+        times = (checked_at, checked_at) if checked_at is not None else None
+
+        try:
+            with open(path) as file:
+                unchanged = json.load(file).get("hash") == rules_hash
+        except (FileNotFoundError, ValueError):
+            unchanged = False
+        if unchanged:
+            os.utime(path, times)
+            return False
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{path.name}")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump({"subreddit": sub_name, "hash": rules_hash, "rules": rules}, file)
+            os.utime(tmp_path, times)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def get_last_checked(self) -> Dict[str, float]:
+        """Get when each saved sub was last checked, by casefolded name."""
+        return {
+            entry.name[: -len(SUFFIX)]: entry.stat().st_mtime
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(SUFFIX) and not entry.name.startswith(".")
+        }
+
+    def clear(self) -> int:
+        """Forget the rules of all subs.
+
+        :returns: The number of subs that were removed.
+        """
+        names = self.get_last_checked()
+        for name in names:
+            os.remove(self.directory / f"{name}{SUFFIX}")
+        return len(names)
+
+    def _migrate(self, legacy_path: Path) -> None:
+        content = legacy_path.read_text()
+        entries = json.loads(content) if content.strip() else {}
+        for sub_name, entry in entries.items():
+            last_updated = datetime.fromisoformat(entry["last_updated"]).timestamp()
+            self.save_rules(sub_name, entry["rules"], checked_at=last_updated)
+
+        legacy_path.rename(legacy_path.with_name(legacy_path.name + ".migrated"))
+        log.info(f"Moved the rules of {len(entries)} subs from {legacy_path} to {self.directory}")
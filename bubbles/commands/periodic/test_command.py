@@ -1,11 +1,11 @@
 # Test command specifically for ensuring that periodic commands are functioning appropriately.
-from bubbles.config import DEFAULT_CHANNEL, app
+from bubbles.config import DEFAULT_CHANNEL, app, rooms_list
 
 
 def test_periodic_callback() -> None:
     app.client.chat_postMessage(
         text="Ay, it's a test command!",
-        channel=DEFAULT_CHANNEL,
+        channel=rooms_list[DEFAULT_CHANNEL],
         as_user=True,
         unfurl_links=False,
         unfurl_media=False,
@@ -3,8 +3,9 @@ import random
 import re
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Dict, List, Optional, Tuple, TypedDict
+from typing import Dict, Iterable, List, Optional, Tuple, TypedDict
 
+from slack_sdk.errors import SlackApiError
 from slack_sdk.web import SlackResponse
 
 from bubbles.commands.helper_functions_history.extract_author import extract_author
@@ -12,7 +13,7 @@ from bubbles.commands.periodic import (
     TRANSCRIPTION_CHECK_CHANNEL,
     TRANSCRIPTION_CHECK_PING_CHANNEL,
 )
-from bubbles.config import app, rooms_list, users_list
+from bubbles.config import app, channel_mirror, permalinks, rooms_list, users_list
 
 USERNAME_REGEX = re.compile(r"u/(?P<username>[^ *:\[\]()?!<>]+)")
 STATUS_REGEX = re.compile(r"Status: \*(?P<status>[^*]+)\*(?: by u/(?P<mod>\S+))?")
@@ -145,10 +146,9 @@ def _get_check_status(message: Dict) -> Tuple[CheckStatus, Optional[str]]:
 
 def _get_check_link(message: Dict) -> Optional[str]:
     """Get a permalink to the Slack message of the check."""
-    response = app.client.chat_getPermalink(
-        channel=rooms_list[TRANSCRIPTION_CHECK_CHANNEL], message_ts=message["ts"]
+    return permalinks.get(
+        rooms_list[TRANSCRIPTION_CHECK_CHANNEL], message["ts"], message.get("thread_ts")
     )
-    return response.data.get("permalink")
 
 
 def _get_check_time(message: Dict) -> datetime:
@@ -172,7 +172,7 @@ def _get_check_data(message: Dict) -> CheckData:
     }
 
 
-def _extract_open_checks(messages: List[Dict]) -> List[CheckData]:
+def _extract_open_checks(messages: Iterable[Dict]) -> List[CheckData]:
     """Process the given list of messages and extract open checks.
 
     :returns:  A list of all open checks, with the status, the moderator and the user.
@@ -323,20 +323,18 @@ def transcription_check_ping(
     start_time = now if start_now else now - CHECK_SEARCH_START_DELTA
     end_time = now - CHECK_SEARCH_END_DELTA
 
-    messages_response = app.client.conversations_history(
-        channel=rooms_list[TRANSCRIPTION_CHECK_CHANNEL],
-        oldest=end_time.timestamp(),
-        latest=start_time.timestamp(),
-        limit=1000,
+    messages = channel_mirror.iter_history(
+        rooms_list[TRANSCRIPTION_CHECK_CHANNEL],
+        oldest=end_time,
+        latest=start_time,
     )
-    if not messages_response.get("ok"):
-        logging.error(f"Failed to get check messages!\n{messages_response}")
+    try:
+        # Get the reminder for the checks
+        checks = _extract_open_checks(messages)
+    except SlackApiError as e:
+        logging.error(f"Failed to get check messages!\n{e.response}")
         return None
 
-    # Get the reminder for the checks
-    messages = messages_response["messages"]
-    checks = _extract_open_checks(messages)
-
     # Only consider checks for the given user, if specified
     if user_filter is not None:
 
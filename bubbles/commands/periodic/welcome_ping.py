@@ -2,14 +2,12 @@ from datetime import datetime, timedelta, timezone
 
 from bubbles.commands.helper_functions_history.extract_author import extract_author
 from bubbles.commands.periodic import NEW_VOLUNTEER_CHANNEL, NEW_VOLUNTEER_PING_CHANNEL
-from bubbles.config import app, rooms_list
+from bubbles.config import app, channel_mirror, permalinks, rooms_list
 
 
 def get_username_and_permalink(message: dict) -> tuple[str, str]:
     username = message["text"].split(" ")[0].split("|")[1][:-1]
-    permalink = app.client.chat_getPermalink(
-        channel=rooms_list[NEW_VOLUNTEER_CHANNEL], message_ts=message["ts"]
-    ).data.get("permalink")
+    permalink = permalinks.get(rooms_list[NEW_VOLUNTEER_CHANNEL], message["ts"])
     return username, permalink
 
 
@@ -17,11 +15,11 @@ def welcome_ping_callback() -> None:
     timestamp_needed_end_cry = datetime.now(tz=timezone.utc) - timedelta(days=7)
     timestamp_needed_start_cry = datetime.now(tz=timezone.utc) - timedelta(hours=4)
 
-    response = app.client.conversations_history(
-        channel=rooms_list[NEW_VOLUNTEER_CHANNEL],
-        oldest=timestamp_needed_end_cry.timestamp(),
-        latest=timestamp_needed_start_cry.timestamp(),
-    )  # ID for #bottest
+    messages = channel_mirror.iter_history(
+        rooms_list[NEW_VOLUNTEER_CHANNEL],
+        oldest=timestamp_needed_end_cry,
+        latest=timestamp_needed_start_cry,
+    )
     cry = False
     users_to_welcome = {}
     GOOD_REACTIONS = [
@@ -33,7 +31,7 @@ def welcome_ping_callback() -> None:
         "exclamation",
         "heavy_exclamation_mark",
     ]
-    for message in response["messages"]:
+    for message in messages:
         try:
             if message["username"] != "Kierra":  # Ignore all messages not done by Kierra
                 print("This user is not Kierra. Message ignored. " + str(message["username"]))
@@ -79,11 +77,11 @@ def welcome_ping_callback() -> None:
 def periodic_ping_in_progress_callback() -> None:
     timestamp_needed_end_watchping = datetime.now(tz=timezone.utc) - timedelta(days=14)
     timestamp_needed_start_watchping = datetime.now(tz=timezone.utc) - timedelta(hours=24)
-    response_watchping = app.client.conversations_history(
-        channel=rooms_list[NEW_VOLUNTEER_CHANNEL],
-        oldest=timestamp_needed_end_watchping.timestamp(),
-        latest=timestamp_needed_start_watchping.timestamp(),
-    )  # ID for #bottest
+    messages_watchping = channel_mirror.iter_history(
+        rooms_list[NEW_VOLUNTEER_CHANNEL],
+        oldest=timestamp_needed_end_watchping,
+        latest=timestamp_needed_start_watchping,
+    )
     watchping = False
     #    client.chat_postMessage(
     #        channel=rooms_list["new_volunteers_pings_in_progress"],
@@ -100,7 +98,7 @@ def periodic_ping_in_progress_callback() -> None:
         "exclamation",
         "heavy_exclamation_mark",
     ]
-    for message in response_watchping["messages"]:
+    for message in messages_watchping:
         try:
             if message["username"] != "Kierra":  # Ignore all messages not done by Kierra
                 print("This user is not Kierra. Message ignored. " + str(message["username"]))
@@ -2,14 +2,18 @@ import re
 import warnings
 from datetime import MAXYEAR, datetime, timedelta, timezone
 
-import matplotlib.pyplot as plt
 from numpy import flip
 from utonium import Payload, Plugin
 
 from bubbles.commands.helper_functions_history.extract_date_or_number import (
     extract_date_or_number,
 )
-from bubbles.commands.helper_functions_history.fetch_messages import fetch_messages
+from bubbles.commands.helper_functions_history.fetch_messages import (
+    HISTORY_CHANNEL,
+    fetch_messages,
+)
+from bubbles.rendering import get_pyplot
+from bubbles.uploads import upload_figures
 
 # get rid of matplotlib's complaining
 warnings.filterwarnings("ignore")
@@ -18,8 +22,9 @@ warnings.filterwarnings("ignore")
 def plot_comments_history(payload: Payload) -> None:
     """!history [number of posts] - plot new volunteer join rate.
 
-    `number of posts` must be an integer between 1 and 1000 inclusive.
+    `number of posts` must be an integer between 1 and 10000 inclusive.
     """
+    plt = get_pyplot()
     count_days = {}
     count_hours = [0] * 24
     args = payload.get_text().split()
@@ -31,7 +36,7 @@ def plot_comments_history(payload: Payload) -> None:
             payload.say(
                 "`!history [number of posts]` shows the number of new comments"
                 " in #new-volunteers in function of their day. `number of posts`"
-                " must be an integer between 1 and 1000 inclusive."
+                " must be an integer between 1 and 10000 inclusive."
             )
             return
         else:
@@ -42,12 +47,13 @@ def plot_comments_history(payload: Payload) -> None:
         )
         return
 
-    response = fetch_messages(payload, input_value, "new_volunteers")
+    messages = fetch_messages(payload, input_value, HISTORY_CHANNEL)
+    message_count = 0
 
     timestamp = 0  # stop linter from complaining
     timestamp_min = datetime(MAXYEAR, 1, 1, tzinfo=timezone.utc)
-    print("Number of messages retrieved: " + str(len(response["messages"])))
-    for message in response["messages"]:
+    for message in messages:
+        message_count += 1
         if not re.search(
             r"^<https://reddit.com/u", message["text"]
         ):  # Remove all messages who are not given by the bot
@@ -66,7 +72,7 @@ def plot_comments_history(payload: Payload) -> None:
         # print(str(timeSend)+"| "+userWhoSentMessage+" sent: "+textMessage)
         count_hours[hour_message] = count_hours[hour_message] + 1
     timestamp = timestamp_min
-    payload.say(f"{str(len(response['messages']))} messages retrieved since {str(timestamp)}")
+    payload.say(f"{message_count} messages retrieved since {str(timestamp)}")
     number_posts = []
     dates = []
     for i in range(0, max(count_days.keys())):
@@ -75,14 +81,13 @@ def plot_comments_history(payload: Payload) -> None:
         else:
             number_posts.append(count_days[i])
         dates.append(datetime.now(tz=timezone.utc) - timedelta(days=i))
+    days_figure = plt.figure()
     plt.plot(flip(dates), flip(number_posts))
     plt.xlabel("Data")
     plt.ylabel("Number of messages")
     plt.grid(True, which="both")
-    plt.savefig("plotHour.png")
-    payload.upload_file(file="plotHour.png")
 
-    plt.close()
+    hours_figure = plt.figure()
     plt.bar(range(0, 24), count_hours, 1, align="edge")
     plt.xlabel("Hour UTC")
     plt.ylabel("Number of messages")
@@ -98,10 +103,13 @@ def plot_comments_history(payload: Payload) -> None:
     plt.text(8, max(count_hours) + 0.5, "West Coast evening")
     plt.text(13.5, max(count_hours) + 0.5, "Far East/Oceania evening")
     plt.text(19.5, max(count_hours) + 0.5, "Europe/Africa/Middle East evening")
-    plt.savefig("plotHours.png")
-    payload.upload_file(file="plotHours.png")
 
-    plt.close()
+    # Both charts go into the same message
+    upload_figures(
+        payload.client, payload.get_channel(), [days_figure, hours_figure], name="history"
+    )
+    plt.close(days_figure)
+    plt.close(hours_figure)
 
 
 PLUGIN = Plugin(func=plot_comments_history, regex=r"^history([0-9 ]+)?", interactive_friendly=False)
@@ -7,7 +7,10 @@ from bubbles.commands.helper_functions_history.extract_author import extract_aut
 from bubbles.commands.helper_functions_history.extract_date_or_number import (
     extract_date_or_number,
 )
-from bubbles.commands.helper_functions_history.fetch_messages import fetch_messages
+from bubbles.commands.helper_functions_history.fetch_messages import (
+    HISTORY_CHANNEL,
+    fetch_messages,
+)
 
 # get rid of matplotlib's complaining
 warnings.filterwarnings("ignore")
@@ -16,7 +19,7 @@ warnings.filterwarnings("ignore")
 def plot_comments_historylist(payload: Payload) -> None:
     """!historylist [number of posts] - plot new volunteers by who welcomed them.
 
-    `number of posts` must be an integer between 1 and 1000 inclusive.
+    `number of posts` must be an integer between 1 and 10000 inclusive.
     """
     args = payload.get_text().split()
     # client = payload.client
@@ -26,7 +29,7 @@ def plot_comments_historylist(payload: Payload) -> None:
             payload.say(
                 "`!historylist [number of posts]` shows the number of new comments"
                 " in #new-volunteers in function of the mod having welcomed them."
-                " `number of posts` must be an integer between 1 and 1000 inclusive."
+                " `number of posts` must be an integer between 1 and 10000 inclusive."
             )
             return
         else:
@@ -37,11 +40,13 @@ def plot_comments_historylist(payload: Payload) -> None:
         )
         return
 
-    response = fetch_messages(payload, input_value, "new_volunteers")
+    messages = fetch_messages(payload, input_value, HISTORY_CHANNEL)
+    message_count = 0
     count_reactions_people = {}
     list_volunteers_per_person = {}
     GOOD_REACTIONS = ["watch", "heavy_check_mark", "email", "exclamation_point"]
-    for message in response["messages"]:
+    for message in messages:
+        message_count += 1
         # userWhoSentMessage = "[ERROR]" # Happens if a bot posts a message
         # if "user" in message.keys():
         #     userWhoSentMessage = usersList[message["user"]]
@@ -58,10 +63,7 @@ def plot_comments_historylist(payload: Payload) -> None:
             welcomed_username
         ]
     count_reactions_people = dict(sorted(count_reactions_people.items()))
-    payload.say(
-        f"{str(len(response['messages']))} messages retrieved."
-        f" Numerical data: {count_reactions_people}"
-    )
+    payload.say(f"{message_count} messages retrieved. Numerical data: {count_reactions_people}")
 
     keys_dict = list(sorted(list_volunteers_per_person.keys()))
     for key in keys_dict:
@@ -2,7 +2,6 @@ import re
 import warnings
 from datetime import MAXYEAR, datetime, timedelta, timezone
 
-import matplotlib.pyplot as plt
 from numpy import cumsum, flip, zeros
 from utonium import Payload, Plugin
 
@@ -10,8 +9,13 @@ from bubbles.commands.helper_functions_history.extract_author import extract_aut
 from bubbles.commands.helper_functions_history.extract_date_or_number import (
     extract_date_or_number,
 )
-from bubbles.commands.helper_functions_history.fetch_messages import fetch_messages
+from bubbles.commands.helper_functions_history.fetch_messages import (
+    HISTORY_CHANNEL,
+    fetch_messages,
+)
 from bubbles.config import users_list
+from bubbles.rendering import get_pyplot
+from bubbles.uploads import upload_figures
 
 # get rid of matplotlib's complaining
 warnings.filterwarnings("ignore")
@@ -20,8 +24,9 @@ warnings.filterwarnings("ignore")
 def plot_comments_historywho(payload: Payload) -> None:
     """!historywho [number of posts] "person" - plot welcomed people by specific mod.
 
-    `number of posts` must be an integer between 1 and 1000 inclusive.
+    `number of posts` must be an integer between 1 and 10000 inclusive.
     """
+    plt = get_pyplot()
     count_reactions_all = {}
     count_reactions_people = {}
     datetime_now = datetime.now(tz=timezone.utc)
@@ -52,13 +57,15 @@ def plot_comments_historywho(payload: Payload) -> None:
         payload.say(f"Too many arguments given as inputs! Syntax: {HELP_MESSAGE}")
         return
 
-    response = fetch_messages(payload, input_value, "new_volunteers")
+    messages = fetch_messages(payload, input_value, HISTORY_CHANNEL)
+    message_count = 0
     # countReactions['Nobody'] = 0
     GOOD_REACTIONS = ["watch", "heavy_check_mark", "email", "exclamation_point"]
 
     timestamp = 0  # stop the linter from yelling
     timestamp_min = datetime(MAXYEAR, 1, 1, tzinfo=timezone.utc)
-    for message in response["messages"]:
+    for message in messages:
+        message_count += 1
         # print(message)
         if not re.search(
             r"^<https://reddit.com/u", message["text"]
@@ -89,7 +96,7 @@ def plot_comments_historywho(payload: Payload) -> None:
         # print(str(lastDatetime))
         # print(time_send)
 
-    payload.say(f"{str(len(response['messages']))} messages retrieved since {str(timestamp_min)}")
+    payload.say(f"{message_count} messages retrieved since {str(timestamp_min)}")
     number_posts = {}
     print(count_reactions_people.keys())
     dates = []
@@ -142,9 +149,9 @@ def plot_comments_historywho(payload: Payload) -> None:
     plt.ylabel("Number of new volunteers")
     plt.grid(True, "both")
     plt.legend()
-    plt.savefig("plotHourMods.png")
-    plt.close()
-    payload.upload_file(file="plotHourMods.png")
+    figure = plt.gcf()
+    upload_figures(payload.client, payload.get_channel(), [figure], name="historywho")
+    plt.close(figure)
 
 
 PLUGIN = Plugin(func=plot_comments_historywho, regex=r"^historywho([ \"a-zA-Z]+)?")
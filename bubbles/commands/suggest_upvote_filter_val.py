@@ -1,19 +1,72 @@
+"""!suggest filter - guess a good upvote filter for a partner subreddit.
+
+The numbers come from a single `new` listing of the subreddit: the ten-post
+window is just its beginning. The upvotes and post times of the listing are
+cached for a few minutes, so trying out suggestions for the same sub doesn't
+ask Reddit again, and all statistics are computed on numpy arrays.
+
+`!suggest filter all` does the same for every partner subreddit at once. The
+listings are fetched on a few threads within our Reddit budget, and the results
+are uploaded as a CSV file with a short summary.
+"""
+import csv
+import io
 import math
 import re
-import statistics
+import threading
 import time
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
+import numpy as np
 from utonium import Payload, Plugin
 
-from bubbles.config import reddit
+from bubbles.config import partner_subreddits, reddit, reddit_budget
+from bubbles.progress import ProgressReporter
+from bubbles.rate_limit import DEFAULT, map_in_threads
+from bubbles.uploads import upload_files
 
 SUGGEST_FILTER_RE = r"^suggest filter (?:r\/|\/r\/)?(?P<sub_name>\S+)$"
+# Without a prefix, "all" means all partners; use "r/all" for the subreddit
+SUGGEST_FILTER_ALL_RE = r"^suggest filter all$"
 
+# Reddit doesn't return more than this from a listing
+LISTING_LIMIT = 1000
+# The number of posts Reddit returns per request
+PAGE_SIZE = 100
+WINDOW_SIZE = 10
+# Long enough for a tuning session, short enough to pick up new posts
+LISTING_TTL = timedelta(minutes=10)
+# The number of subreddits fetched at the same time by `!suggest filter all`
+WORKERS = 4
+# The most active subs listed in the summary of `!suggest filter all`
+SUMMARY_SIZE = 10
 
-def avg(mylist: List) -> int:
-    return sum(mylist) / len(mylist)
+CSV_COLUMNS = [
+    "subreddit",
+    "posts_last_24h",
+    "posts_per_day",
+    "window_min_karma",
+    "window_max_karma",
+    "suggested_window",
+    "suggested_all",
+]
+
+
+class Listing(NamedTuple):
+    """The newest posts of a subreddit, newest first."""
+
+    ups: np.ndarray
+    created_utc: np.ndarray
+    fetched: float
+
+    @property
+    def window(self) -> "Listing":
+        return Listing(self.ups[:WINDOW_SIZE], self.created_utc[:WINDOW_SIZE], self.fetched)
+
+
+_listings: Dict[str, Listing] = {}
+_listings_lock = threading.Lock()
 
 
 def balance_queue_modifier(count_per_day: float) -> float:
@@ -31,50 +84,78 @@ def balance_queue_modifier(count_per_day: float) -> float:
     return target_queue_percentage / queue_percentage
 
 
-def reject_outliers(upvote_list: List) -> List:
-    # pure python implementation of https://stackoverflow.com/q/11686720
-    if len(upvote_list) < 2:
-        return upvote_list
+def get_outlier_mask(upvotes: np.ndarray) -> np.ndarray:
+    """Get which of the upvote counts are not outliers.
+
+    See https://stackoverflow.com/q/11686720
+    """
+    if len(upvotes) < 2:
+        return np.ones(len(upvotes), dtype=bool)
 
     # Make the multiplier smaller to increase the sensitivity and reject more.
     # Make it larger to have it be more lenient.
     multiplier = 0.7
-    avg = sum(upvote_list) / len(upvote_list)
-    s_dev = statistics.stdev(upvote_list)
-    return [n for n in upvote_list if (avg - multiplier * s_dev < n < avg + multiplier * s_dev)]
-
-
-def get_new_posts_from_sub(subreddit: str) -> [List, List]:
-    """Return two generators from praw -- the 10 post window and 1k from new."""
-    return [
-        list(reddit.subreddit(subreddit).new(limit=10)),
-        list(reddit.subreddit(subreddit).new(limit=1000)),
+    # The sample standard deviation, like `statistics.stdev`
+    return np.abs(upvotes - upvotes.mean()) < multiplier * upvotes.std(ddof=1)
+
+
+def _take_tokens(listing: Any) -> Iterator[Any]:
+    """Go through the praw listing, taking a token from the budget for every page."""
+    posts = iter(listing)
+    for index in range(LISTING_LIMIT):
+        if index % PAGE_SIZE == 0:
+            # The listing requests the next page when we ask for its first post
+            reddit_budget.acquire()
+        post = next(posts, None)
+        if post is None:
+            return
+        yield post
+
+
+def _is_fresh(listing: Listing) -> bool:
+    return time.time() - listing.fetched < LISTING_TTL.total_seconds()
+
+
+def get_new_posts_from_sub(subreddit: str) -> Listing:
+    """Get the newest posts of the sub from one listing, cached for `LISTING_TTL`."""
+    key = subreddit.casefold()
+    with _listings_lock:
+        listing = _listings.get(key)
+    if listing is not None and _is_fresh(listing):
+        return listing
+
+    posts = [
+        (post.ups, post.created_utc)
+        for post in _take_tokens(reddit.subreddit(subreddit).new(limit=LISTING_LIMIT))
     ]
+    data = np.array(posts, dtype=float).reshape(-1, 2)
+    listing = Listing(ups=data[:, 0], created_utc=data[:, 1], fetched=time.time())
+    with _listings_lock:
+        # The subs are typed in by hand, so don't hold on to the ones nobody asks for again
+        for name in [name for name, old in _listings.items() if not _is_fresh(old)]:
+            del _listings[name]
+        _listings[key] = listing
+    return listing
 
 
-def get_upvotes_from_list(post_list: List) -> List:
-    return [post.ups for post in post_list]
+def get_min_max_karma(listing: Listing) -> Tuple[int, int]:
+    """Return the smallest and largest karma seen in the posts."""
+    return int(listing.ups.min()), int(listing.ups.max())
 
 
-def get_min_max_karma(post_list: List) -> [int, int]:
-    """Return the smallest and largest karma seen in a list of Reddit posts."""
-    upvote_list = get_upvotes_from_list(post_list)
-    return min(upvote_list), max(upvote_list)
-
-
-def get_time_diffs(post_list: List) -> [int, int]:
-    """Return time differences in post time from now from a list of Reddit posts.
+def get_time_diffs(listing: Listing) -> Tuple[float, float]:
+    """Return time differences in post time from now.
 
     Starting from now, what is the time difference between the soonest post and
     the latest post?
     """
-    current_time = time.time()
-    time_diffs = [current_time - post.created_utc for post in post_list]
+    time_diffs = time.time() - listing.created_utc
+    return time_diffs.min(), time_diffs.max()
 
-    return min(time_diffs), max(time_diffs)
 
-
-def calculate_hours_and_minutes_timedelta_from_diffs(start_diff: int, end_diff: int) -> [int, int]:
+def calculate_hours_and_minutes_timedelta_from_diffs(
+    start_diff: float, end_diff: float
+) -> Tuple[int, int]:
     """Take the output from get_time_diffs and convert to an X hours Y minutes format."""
     current_time = time.time()
 
@@ -87,32 +168,16 @@ def calculate_hours_and_minutes_timedelta_from_diffs(start_diff: int, end_diff:
     return hours, formatted_minutes
 
 
-def get_total_count_of_posts_per_day(post_list: List) -> int:
-    """Take all available submissions, sort them per day, then average the days."""
-    submissions_per_day = {}
-
-    for post in post_list:
-        # count how many submissions we have per day
-        post_time = datetime.fromtimestamp(post.created_utc, tz=timezone.utc)
-        post_time_key = "{}-{}".format(post_time.month, post_time.day)
-        if not submissions_per_day.get(post_time_key):
-            submissions_per_day[post_time_key] = 1
-        else:
-            submissions_per_day[post_time_key] += 1
+def get_total_count_of_posts_per_day(listing: Listing) -> float:
+    """Count the submissions per (UTC) day, then average the days."""
+    days = (listing.created_utc // timedelta(days=1).total_seconds()).astype(np.int64)
+    _, counts = np.unique(days, return_counts=True)
+    return round(float(counts.mean()), 2)
 
-    # just grab the raw per-day counts and average them
-    return round(avg([v for k, v in submissions_per_day.items()]), 2)
 
-
-def get_total_count_of_posts_in_24_hours(post_list: List) -> int:
-    submissions_last_24h = []
-    current_time = time.time()
-
-    for post in post_list:
-        if timedelta(seconds=current_time - post.created_utc) < timedelta(days=1):
-            submissions_last_24h.append(post)
-
-    return len(submissions_last_24h)
+def get_total_count_of_posts_in_24_hours(listing: Listing) -> int:
+    age = time.time() - listing.created_utc
+    return int(np.count_nonzero(age < timedelta(days=1).total_seconds()))
 
 
 def sigmoid(x: float) -> float:
@@ -120,7 +185,7 @@ def sigmoid(x: float) -> float:
     return 1 / (1 + math.exp(-x))
 
 
-def estimate_filter_value(vote_list: List[int], number_of_posts_per_day: int) -> int:
+def estimate_filter_value(votes: np.ndarray, number_of_posts_per_day: float) -> int:
     r"""Create a guess of a filter value based on the votes and a modifier.
 
     We start with a list of votes from a given window of any size, then cut out
@@ -134,7 +199,11 @@ def estimate_filter_value(vote_list: List[int], number_of_posts_per_day: int) ->
     # warning: black magic ahead.
     # Take the ten-post window, calculate the outliers, and remove them from the data,
     # then average the rest.
-    avg_votes: float = avg(reject_outliers(vote_list))
+    kept = votes[get_outlier_mask(votes)]
+    if len(kept) == 0:
+        # Everything is an outlier if all posts have the same votes; keep them all
+        kept = votes
+    avg_votes: float = kept.mean()
     # Reddit limits the queue length to 1000 posts. Create a modifier based on the
     # total amount of the queue we want any given subreddit to consume based on the
     # number of submissions in a 24-hour period that subreddit receives.
@@ -142,12 +211,11 @@ def estimate_filter_value(vote_list: List[int], number_of_posts_per_day: int) ->
     # When we remove the outliers from the 10-submission window, it is useful to know
     # exactly how much of an outlier those rejected values were. We'll use it later
     # to create the outlier modifier.
-    outlier_point_percentage: float = avg(reject_outliers(vote_list)) / avg(vote_list)
+    # Without any votes at all, nothing stands out
+    outlier_point_percentage: float = avg_votes / votes.mean() if votes.mean() else 1.0
     # Out of the ten posts that we pulled for the window, what percent were rejected
     # as outliers?
-    percentage_of_rejected_outliers: float = (
-        len(vote_list) - len(reject_outliers(vote_list))
-    ) * 0.1
+    percentage_of_rejected_outliers: float = (len(votes) - len(kept)) * 0.1
     # Dynamically create a modifier based on how severe the outliers are using a
     # https://en.wikipedia.org/wiki/Logistic_function
     outlier_modifier: float = sigmoid(
@@ -160,12 +228,114 @@ def estimate_filter_value(vote_list: List[int], number_of_posts_per_day: int) ->
     return round((avg_votes / queue_modifier) * outlier_modifier * activity_modifier)
 
 
+def get_filter_suggestion(sub_name: str) -> Optional[Dict[str, Any]]:
+    """Get the stats and the suggested thresholds of the sub, or None if it has no posts."""
+    all_posts = get_new_posts_from_sub(sub_name)
+    if len(all_posts.ups) == 0:
+        return None
+    ten_post_window = all_posts.window
+
+    min_karma, max_karma = get_min_max_karma(ten_post_window)
+    hours, minutes = calculate_hours_and_minutes_timedelta_from_diffs(
+        *get_time_diffs(ten_post_window)
+    )
+    posts_per_day_count = get_total_count_of_posts_per_day(all_posts)
+
+    return {
+        "subreddit": sub_name,
+        "posts_last_24h": get_total_count_of_posts_in_24_hours(all_posts),
+        "posts_per_day": posts_per_day_count,
+        "window_min_karma": min_karma,
+        "window_max_karma": max_karma,
+        "window_hours": hours,
+        "window_minutes": minutes,
+        "suggested_window": estimate_filter_value(ten_post_window.ups, posts_per_day_count),
+        "suggested_all": estimate_filter_value(all_posts.ups, posts_per_day_count),
+    }
+
+
+def format_suggestions_csv(suggestions: List[Dict[str, Any]]) -> str:
+    """Build a CSV table of the suggestions, one row per subreddit."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(suggestions)
+    return output.getvalue()
+
+
+def format_suggestions_summary(
+    suggestions: List[Dict[str, Any]], no_posts: List[str], failed: List[str]
+) -> str:
+    """Summarize the suggestions, listing the most active subs."""
+    lines = [f"Suggested thresholds for {len(suggestions)} partner subreddits."]
+    if no_posts:
+        lines.append(f"No posts in: {', '.join(no_posts)}")
+    if failed:
+        lines.append(f"Failed to fetch: {', '.join(failed)}")
+
+    busiest = sorted(suggestions, key=lambda row: row["posts_per_day"], reverse=True)
+    if busiest:
+        lines.append(f"\nThe {min(SUMMARY_SIZE, len(busiest))} most active subs:")
+        lines.append("```")
+        lines.append(f"{'subreddit':<24} {'posts/day':>9} {'window':>7} {'1k':>7}")
+        for row in busiest[:SUMMARY_SIZE]:
+            lines.append(
+                f"{row['subreddit']:<24} {row['posts_per_day']:>9}"
+                f" {row['suggested_window']:>7} {row['suggested_all']:>7}"
+            )
+        lines.append("```")
+    return "\n".join(lines)
+
+
+def suggest_filter_all(payload: Payload) -> None:
+    """Suggest thresholds for all partner subreddits and upload them as a table."""
+    progress = ProgressReporter.from_payload(payload, "Suggesting filters for all partners")
+
+    progress.start_stage("Loading the partner subreddits")
+    sub_names = sorted(partner_subreddits.get())
+    progress.end_stage(f"Found {len(sub_names)} partner subreddits")
+
+    progress.start_stage("Fetching the newest posts", total=len(sub_names))
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    # Leave room in the budget for the commands of everyone else
+    for sub_name, suggestion in map_in_threads(
+        get_filter_suggestion, sub_names, WORKERS, priority=DEFAULT
+    ):
+        results[sub_name] = suggestion
+        progress.advance()
+    progress.end_stage(f"Fetched the posts of {len(results)} subreddits")
+
+    suggestions = [suggestion for suggestion in results.values() if suggestion is not None]
+    no_posts = [sub_name for sub_name, suggestion in results.items() if suggestion is None]
+    failed = [sub_name for sub_name in sub_names if sub_name not in results]
+
+    progress.start_stage("Uploading the suggestions")
+    upload_files(
+        payload.client,
+        payload.get_channel(),
+        [
+            {
+                "content": format_suggestions_csv(suggestions),
+                "filename": "filter_suggestions.csv",
+                "title": "Filter suggestions",
+            }
+        ],
+        initial_comment=format_suggestions_summary(suggestions, no_posts, failed),
+    )
+    progress.finish()
+
+
 def suggest_filter(payload: Payload) -> None:
-    """!suggest filter {subreddit} - create a guess for a post filter value
+    """!suggest filter {subreddit|all} - create a guess for a post filter value
 
     Usage: @bubbles suggest filter r/thathappened
+    Use `all` to get a table of the suggestions for every partner subreddit.
     """
     text = payload.cleaned_text
+    if re.search(SUGGEST_FILTER_ALL_RE, text):
+        suggest_filter_all(payload)
+        return
+
     match = re.search(SUGGEST_FILTER_RE, text)
 
     if match is None:
@@ -178,32 +348,23 @@ def suggest_filter(payload: Payload) -> None:
     sub_name = match.group("sub_name")
     payload.say(f"Processing data for r/{sub_name}. This may take a moment...")
 
-    ten_post_window, all_posts = get_new_posts_from_sub(sub_name)
-    upvote_list_window = get_upvotes_from_list(ten_post_window)
-    upvote_list_all_posts = get_upvotes_from_list(all_posts)
-
-    min_karma, max_karma = get_min_max_karma(ten_post_window)
-    hours, minutes = calculate_hours_and_minutes_timedelta_from_diffs(
-        *get_time_diffs(ten_post_window)
-    )
-
-    posts_per_day_count = get_total_count_of_posts_per_day(all_posts)
-    posts_per_last_24h_count = get_total_count_of_posts_in_24_hours(all_posts)
-
-    suggested_value_window = estimate_filter_value(upvote_list_window, posts_per_day_count)
-    suggested_value_all = estimate_filter_value(upvote_list_all_posts, posts_per_day_count)
+    suggestion = get_filter_suggestion(sub_name)
+    if suggestion is None:
+        payload.say(f"r/{sub_name} doesn't have any posts, so I can't suggest anything.")
+        return
 
     payload.say(
         f"Stats for r/{sub_name} over the last 10 submissions:\n"
         f"\n"
-        f"* karma distribution: {min_karma} | {max_karma}\n"
-        f"* time spread: {hours}h {minutes}m\n"
+        f"* karma distribution: {suggestion['window_min_karma']}"
+        f" | {suggestion['window_max_karma']}\n"
+        f"* time spread: {suggestion['window_hours']}h {suggestion['window_minutes']}m\n"
         f"\n"
-        f"Number of submissions in the last 24h: {posts_per_last_24h_count}\n"
-        f"Average new submissions per day: {posts_per_day_count}\n"
+        f"Number of submissions in the last 24h: {suggestion['posts_last_24h']}\n"
+        f"Average new submissions per day: {suggestion['posts_per_day']}\n"
         f"\n"
-        f"Suggested threshold based on the window: {suggested_value_window}\n"
-        f"Suggested threshold from last 1k posts: {suggested_value_all}\n"
+        f"Suggested threshold based on the window: {suggestion['suggested_window']}\n"
+        f"Suggested threshold from last 1k posts: {suggestion['suggested_all']}\n"
     )
 
 
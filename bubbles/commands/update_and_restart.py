@@ -14,6 +14,9 @@ from bubbles.config import USERNAME
 
 logger = logging.getLogger(__name__)
 
+# Don't let GitHub hold up the update forever
+HTTP_TIMEOUT = 30
+
 
 def update(payload: Payload) -> None:
     """!update - pull changes from github and restart!"""
@@ -25,7 +28,9 @@ def update(payload: Payload) -> None:
     )
 
     StatusMessage.add_new_context_step("Preparing update...")
-    response = requests.get("https://api.github.com/repos/grafeasgroup/bubbles/releases/latest")
+    response = requests.get(
+        "https://api.github.com/repos/grafeasgroup/bubbles/releases/latest", timeout=HTTP_TIMEOUT
+    )
     if response.status_code != 200:
         logger.error(f"GITHUB RESPONSE CONTENT: {response.content}")
         StatusMessage.step_failed(
@@ -66,14 +71,14 @@ def update(payload: Payload) -> None:
         subprocess.check_output(shlex.split(f"chmod +x {str(backup_archive)}"))
 
         # write the new archive to disk
-        resp = requests.get(url, stream=True)
+        resp = requests.get(url, stream=True, timeout=HTTP_TIMEOUT)
         new_archive = folder / "temp.pyz"
         with open(new_archive, "wb") as new:
             for chunk in resp.iter_content(chunk_size=8192):
                 new.write(chunk)
 
         subprocess.check_output(shlex.split(f"chmod +x {str(new_archive)}"))
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, requests.RequestException):
         StatusMessage.step_failed(
             error=True,
             end_text=(
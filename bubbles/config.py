@@ -1,21 +1,23 @@
 import logging
 import os
-from datetime import datetime, timezone
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List
-from unittest import mock
+from typing import Any, Dict, List, Optional
 from unittest.mock import MagicMock
 
-import matplotlib as mpl  # type: ignore
-import praw
-import slack_bolt
-from blossom_wrapper import BlossomAPI  # type: ignore
 from dotenv import load_dotenv
-from praw import Reddit  # type: ignore
 from shiv.bootstrap import current_zipfile
-from slack_bolt import App
 from tinydb import TinyDB
 
+from bubbles.channel_mirror import ChannelMirror
+from bubbles.job_state import JobState
+from bubbles.lazy import LazyProxy
+from bubbles.partner_subreddits import PartnerSubreddits
+from bubbles.permalinks import PermalinkService
+from bubbles.rate_limit import TokenBucket
+from bubbles.slack_directory import SlackDirectory
+
 log = logging.getLogger(__name__)
 
 # Build paths inside the project like this: BASE_DIR / "myfolder"
@@ -46,101 +48,218 @@ REDDIT_USER_AGENT = os.environ.get("reddit_user_agent", None)
 
 ENABLE_BLOSSOM = os.environ.get("enable_blossom", False)
 
-try:
-    reddit = Reddit(
-        username=os.environ.get("reddit_username"),
-        password=os.environ.get("reddit_password"),
-        client_id=os.environ.get("reddit_client_id"),
-        client_secret=os.environ.get("reddit_secret"),
-        user_agent=os.environ.get("reddit_user_agent"),
-    )
-except praw.exceptions.MissingRequiredAttributeException as e:
-    log.warning(f"Missing required Reddit secret:{e}\nDisabling Reddit access.")
-    reddit = MagicMock()
-
-try:
-    app = App(
-        signing_secret=os.environ.get("slack_signing_secret"),
-        token=os.environ.get("slack_oauth_token"),
-    )
-except slack_bolt.error.BoltError as e:
-    log.warning(
-        f"Missing required Slack secret: {e}\nDisabling Slack. If you are not running"
-        f" in interactive mode, the bot will not function as expected."
-    )
-    app = MagicMock()
+SLACK_DIRECTORY_PATH = Path(
+    os.environ.get("slack_directory_path", BASE_DIR / "slack_directory.json")
+)
+SLACK_DIRECTORY_TTL = timedelta(hours=float(os.environ.get("slack_directory_ttl_hours", 6)))
+
+# How many commands may run at the same time and how many may wait for a free worker
+DISPATCH_WORKERS = int(os.environ.get("dispatch_workers", 8))
+DISPATCH_MAX_PENDING = int(os.environ.get("dispatch_max_pending", 50))
+
+# The local copy of the welcome and QA channels, see `bubbles.channel_mirror`
+CHANNEL_MIRROR_PATH = Path(
+    os.environ.get("channel_mirror_path", BASE_DIR / "channel_mirror.sqlite3")
+)
+CHANNEL_MIRROR_BACKFILL = timedelta(days=float(os.environ.get("channel_mirror_backfill_days", 90)))
+
+# Our share of Reddit's API limit for the bulk jobs, see `reddit_budget`
+REDDIT_REQUESTS_PER_MINUTE = float(os.environ.get("reddit_requests_per_minute", 60))
+
+# Where stuck and slow commands and jobs are reported, see `bubbles.watchdog`
+DIAGNOSTICS_CHANNEL = os.environ.get("diagnostics_channel", DEFAULT_CHANNEL)
+
+# Load matplotlib's fonts in the background once connected, see `bubbles.rendering`
+WARM_UP_RENDERING = os.environ.get("warm_up_rendering", "true").lower() != "false"
+
+
+def _build_reddit() -> Any:
+    import praw  # type: ignore
+
+    try:
+        return praw.Reddit(
+            username=os.environ.get("reddit_username"),
+            password=os.environ.get("reddit_password"),
+            client_id=os.environ.get("reddit_client_id"),
+            client_secret=os.environ.get("reddit_secret"),
+            user_agent=os.environ.get("reddit_user_agent"),
+        )
+    except praw.exceptions.MissingRequiredAttributeException as e:
+        log.warning(f"Missing required Reddit secret:{e}\nDisabling Reddit access.")
+        return MagicMock()
+
+
+def _build_mock_app() -> MagicMock:
+    """Build a stand-in for the Slack app that never talks to Slack."""
+    mock_app = MagicMock()
 
     class AuthResponse:
         data = {"user_id": "1234"}
 
-    app.client.auth_test.return_value = AuthResponse
-    app.client.users_list.return_value = {
+    mock_app.client.auth_test.return_value = AuthResponse
+    mock_app.client.users_list.return_value = {
         "members": [{"real_name": "console", "deleted": False, "id": "abc"}]
     }
-    app.client.conversations_list.return_value = {
+    mock_app.client.conversations_list.return_value = {
         "channels": [{"id": "456", "name": DEFAULT_CHANNEL}]
     }
+    return mock_app
+
+
+def _build_app() -> Any:
+    import slack_bolt
+
+    from bubbles.slack_client import RateLimitedWebClient
+
+    token = os.environ.get("slack_oauth_token")
+    try:
+        return slack_bolt.App(
+            signing_secret=os.environ.get("slack_signing_secret"),
+            # Without a token Bolt complains right away, and we fall back to the mock
+            client=RateLimitedWebClient(token=token) if token else None,
+        )
+    except slack_bolt.error.BoltError as e:
+        log.warning(
+            f"Missing required Slack secret: {e}\nDisabling Slack. If you are not running"
+            f" in interactive mode, the bot will not function as expected."
+        )
+        return _build_mock_app()
+
+
+def _build_blossom() -> Any:
+    if ENABLE_BLOSSOM:
+        from blossom_wrapper import BlossomAPI  # type: ignore
+
+        # Feature flag means that we can lock away blossom functionality until
+        # blossom is actually ready to roll.
+        blossom_api = BlossomAPI(
+            email=os.getenv("blossom_email"),
+            password=os.getenv("blossom_password"),
+            api_key=os.getenv("blossom_api_key"),
+            api_base_url=os.getenv("blossom_api_url"),
+        )
+        print("blossom loaded!")
+        return blossom_api
 
-if ENABLE_BLOSSOM:
-    # Feature flag means that we can lock away blossom functionality until
-    # blossom is actually ready to roll.
-    blossom = BlossomAPI(
-        email=os.getenv("blossom_email"),
-        password=os.getenv("blossom_password"),
-        api_key=os.getenv("blossom_api_key"),
-        api_base_url=os.getenv("blossom_api_url"),
-    )
-    print("blossom loaded!")
-else:
     logging.warning("Blossom is disabled, set ENABLE_BLOSSOM env variable to true")
-    blossom = mock.MagicMock()
+    return MagicMock()
+
+
+def _build_directory(snapshot_path: Optional[Path] = SLACK_DIRECTORY_PATH) -> SlackDirectory:
+    slack_directory = SlackDirectory(
+        app.client,
+        snapshot_path,
+        ttl=SLACK_DIRECTORY_TTL,
+        team_id=_auth_data.get("team_id"),
+    )
+    slack_directory.start()
+    # support for running commands through CLI
+    slack_directory.users["bubbles_console"] = "bubbles_console"
+
+    if DEFAULT_CHANNEL not in slack_directory.rooms:
+        # The snapshot is older than the channel, we need the current data right now
+        slack_directory.refresh()
+
+    return slack_directory
+
+
+def _build_channel_mirror() -> ChannelMirror:
+    from bubbles.commands.helper_functions_history.fetch_messages import HISTORY_CHANNEL
+    from bubbles.commands.periodic import NEW_VOLUNTEER_CHANNEL, TRANSCRIPTION_CHECK_CHANNEL
+
+    channels = [
+        rooms_list[name]
+        for name in (NEW_VOLUNTEER_CHANNEL, TRANSCRIPTION_CHECK_CHANNEL, HISTORY_CHANNEL)
+        if name in rooms_list
+    ]
+    return ChannelMirror(
+        app.client, CHANNEL_MIRROR_PATH, channels, backfill=CHANNEL_MIRROR_BACKFILL
+    )
+
+
+# None of the clients are created on import. Creating them means logging in to the
+# respective service, so we wait until something actually needs them; this keeps
+# `bubbles --version`, `--help` and friends off the network.
+reddit = LazyProxy(_build_reddit)
+app = LazyProxy(_build_app)
+blossom = LazyProxy(_build_blossom)
 
 # There is an overloaded __get__ in the underlying Bolt app, so this type
 # doesn't resolve cleanly.
-ME: str = app.client.auth_test().data["user_id"]  # type: ignore
+_auth_data: Dict[str, Any] = LazyProxy(lambda: app.client.auth_test().data)  # type: ignore
+ME: str = LazyProxy(lambda: _auth_data["user_id"])  # type: ignore
 
+# The jobs that go through many subreddits take a token before each Reddit call,
+# so they stay within our budget and leave room for the commands
+reddit_budget = TokenBucket(
+    REDDIT_REQUESTS_PER_MINUTE / 60, max(REDDIT_REQUESTS_PER_MINUTE / 10, 1)
+)
+
+# The subreddits listed on the ToR wiki, shared by all jobs that go through them
+partner_subreddits: PartnerSubreddits = LazyProxy(  # type: ignore
+    lambda: PartnerSubreddits(
+        lambda: reddit.subreddit("TranscribersOfReddit").wiki["subreddits"],
+        state=job_state,
+        budget=reddit_budget,
+    )
+)
+
+# Links to Slack messages are built from the workspace URL, see `bubbles.permalinks`
+permalinks: PermalinkService = LazyProxy(  # type: ignore
+    lambda: PermalinkService(app.client, _auth_data.get("url"))
+)
+
+# The prefixes that we know without asking Slack who we are.
+STATIC_COMMAND_PREFIXES = ("!", USERNAME, f"@{USERNAME}")
 # Slack will send the internal ID to represent the user, so we need to
 # dynamically add that ID so we can listen for it. This will change
 # per workspace, so it can't be hardcoded.
-COMMAND_PREFIXES = ("!", USERNAME, f"@{USERNAME}", ME, f"<@{ME}>")
+COMMAND_PREFIXES: tuple = LazyProxy(  # type: ignore
+    lambda: (*STATIC_COMMAND_PREFIXES, str(ME), f"<@{ME}>")
+)
+
+# The users and rooms of the workspace are loaded from a snapshot on disk and then
+# kept up to date in the background, see `bubbles.slack_directory`.
+directory: SlackDirectory = LazyProxy(_build_directory)  # type: ignore
 
 # Define the list of users (conversion ID <-> username)
 # 'Any' here is either a list or a str; mypy can't handle that.
 # See https://stackoverflow.com/a/62862029
-users_list: Dict[str, Any] = {"ids_only": []}
-users = app.client.users_list()
-for user in users["members"]:
-    if not user["deleted"]:
-        # Extract the display name if available
-        name = user.get("profile", {}).get("display_name") or user.get("real_name") or user["id"]
-        users_list[user["id"]] = name
-        users_list[name] = user["id"]
-        users_list["ids_only"].append(user["id"])
-
-users_list["bubbles_console"] = "bubbles_console"  # support for running commands through CLI
+users_list: Dict[str, Any] = LazyProxy(lambda: directory.users)  # type: ignore
 
 # Define the list of rooms (useful to retrieve the ID of the rooms, knowing their name)
-rooms_list = {}
-rooms = app.client.conversations_list()
-for room in rooms["channels"]:
-    rooms_list[room["id"]] = room["name"]
-    rooms_list[room["name"]] = room["id"]
-
-# Now that we have an understanding of what channels are available and what the actual
-# IDs are, we can't send a message to a named channel anymore (e.g. "bottest") -- it's
-# gotta go to the internal Slack channel ID. So now we'll redefine DEFAULT_CHANNEL to
-# be the internal slack ID version.
-DEFAULT_CHANNEL = rooms_list[DEFAULT_CHANNEL]
+# Note that we can't send a message to a named channel (e.g. "bottest") -- it's
+# gotta go to the internal Slack channel ID, e.g. `rooms_list[DEFAULT_CHANNEL]`.
+rooms_list: Dict[str, str] = LazyProxy(lambda: directory.rooms)  # type: ignore
+
+# The welcome and QA channels are read from a local mirror instead of paging through Slack
+channel_mirror: ChannelMirror = LazyProxy(_build_channel_mirror)  # type: ignore
+
+
+def use_offline_slack() -> None:
+    """Replace the Slack app with a mock that never talks to Slack.
+
+    This is used for the interactive mode and the self check, which don't have
+    anything to do with the real workspace.
+    """
+    app._lazy_set(_build_mock_app())
+    permalinks._lazy_set(PermalinkService(app.client))
+    directory._lazy_set(_build_directory(snapshot_path=None))
+    # Nothing is mirrored, so everything is read from (the mock of) Slack
+    channel_mirror._lazy_set(ChannelMirror(app.client, ":memory:", []))
+
 
 # Define the mod to ping for periodic_callback (leave to None if no mod has to be pinged)
 mods_array: List = []
 for i in range(0, 24):
     mods_array.append(None)
 
-mpl.rcParams["figure.figsize"] = [20, 10]
-
 # https://tinydb.readthedocs.io/en/latest/getting-started.html#basic-usage
 db = TinyDB(BASE_DIR / "db.json")
+# TinyDB isn't thread-safe, hold this while using `db` outside of the main thread
+db_lock = threading.RLock()
+# The last runs, cursors and queues of the periodic jobs
+job_state = JobState(db, lock=db_lock)
 
 
 TIME_STARTED = datetime.now(tz=timezone.utc)
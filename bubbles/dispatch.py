@@ -0,0 +1,185 @@
+"""Run the plugins off Bolt's listener threads.
+
+Bolt only has a handful of listener threads, and a `!ctqstats` or `!deploy all`
+blocks one of them for minutes. The `DispatchExecutor` hands every event to a
+bounded pool of workers instead:
+
+- Events of the same channel are processed one after the other, in the order in
+  which they arrived, so that replies don't get mixed up.
+- Heavy commands have a concurrency limit (e.g. only one `deploy` at a time).
+  They don't hold up the channel while they run.
+- If too much work piles up, or a limited command is already running, the event
+  is rejected with `DispatchOverloaded` so that we can tell the user right away
+  instead of silently queueing it.
+- Every task runs under the watchdog with the deadline of its command, so a
+  command that hangs is reported instead of silently taking up a worker.
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from bubbles.exceptions import DispatchOverloaded
+from bubbles.rate_limit import INTERACTIVE, prioritized
+from bubbles.watchdog import watchdog
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 50
+
+# The maximum number of concurrent runs of the commands that take a while.
+# Everything that isn't listed here is unlimited.
+COMMAND_LIMITS = {
+    "backup": 1,
+    "ctqstats": 1,
+    "deploy": 1,
+    "restart": 1,
+    "start": 1,
+    "stop": 1,
+    "update": 1,
+    "history": 2,
+    "historywho": 2,
+    "logs": 2,
+    "subreddits": 2,
+    "suggest": 2,
+}
+
+# How long a command may take before the watchdog reports it as stuck
+DEFAULT_DEADLINE = timedelta(minutes=2)
+COMMAND_DEADLINES = {
+    "backup": timedelta(minutes=30),
+    "ctqstats": timedelta(minutes=30),
+    "deploy": timedelta(minutes=20),
+    "history": timedelta(minutes=10),
+    "historywho": timedelta(minutes=10),
+    "subreddits": timedelta(minutes=10),
+    "suggest": timedelta(minutes=30),
+    "update": timedelta(minutes=10),
+}
+
+
+def strip_prefix(text: str, prefixes: Iterable[str]) -> Optional[str]:
+    """Get the message without its command prefix, if it is addressed to us."""
+    text = text.strip()
+    # Check the longest prefixes first, "@bubbles" also starts with "@"
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if text.lower().startswith(prefix.lower()):
+            return text[len(prefix) :].lstrip(" :,")
+    return None
+
+
+def get_command(text: str, prefixes: Iterable[str]) -> Optional[str]:
+    """Get the name of the command in the message, if it is addressed to us.
+
+    >>> get_command("!deploy tor", ("!", "bubbles"))
+    'deploy'
+    >>> get_command("bubbles: ping", ("!", "bubbles"))
+    'ping'
+    """
+    words = (strip_prefix(text, prefixes) or "").split(maxsplit=1)
+    return words[0].lower() if words else None
+
+
+class DispatchExecutor:
+    """A bounded worker pool with per-channel ordering and per-command limits."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        command_limits: Optional[Dict[str, int]] = None,
+        command_deadlines: Optional[Dict[str, timedelta]] = None,
+    ) -> None:
+        self.max_pending = max_pending
+        self.command_limits = COMMAND_LIMITS if command_limits is None else command_limits
+        self.command_deadlines = (
+            COMMAND_DEADLINES if command_deadlines is None else command_deadlines
+        )
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dispatch")
+        self._lock = threading.Lock()
+        # Everything that has been accepted, but hasn't finished yet
+        self._pending = 0
+        self._running_commands: Dict[str, int] = defaultdict(int)
+        # The queued tasks of each channel. A channel only has a lane while one of
+        # the workers is draining it.
+        self._lanes: Dict[str, Deque[Callable[[], Any]]] = {}
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(
+        self,
+        func: Callable,
+        *args: Any,
+        channel: Optional[str] = None,
+        command: Optional[str] = None,
+    ) -> None:
+        """Schedule `func(*args)` to be run on one of the workers.
+
+        :param channel: Tasks with the same channel are run in submission order.
+        :param command: The name of the command, used to apply its concurrency limit.
+        :raises DispatchOverloaded: If the task can't be accepted right now.
+        """
+        deadline = self.command_deadlines.get(command or "", DEFAULT_DEADLINE)
+        task = partial(self._watched, command or "event", deadline, func, *args)
+        limit = self.command_limits.get(command) if command else None
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise DispatchOverloaded(
+                    "I'm a bit swamped right now, please try again in a minute."
+                )
+            if limit is not None:
+                if self._running_commands[command] >= limit:
+                    raise DispatchOverloaded(
+                        f"`{command}` is already running, please wait for it to finish."
+                    )
+                self._running_commands[command] += 1
+            self._pending += 1
+
+            if limit is not None or channel is None:
+                # Limited commands are the slow ones, don't hold up the channel for them
+                self._pool.submit(self._run, task, command if limit is not None else None)
+            elif channel in self._lanes:
+                self._lanes[channel].append(task)
+            else:
+                self._lanes[channel] = deque([task])
+                self._pool.submit(self._drain, channel)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    @staticmethod
+    def _watched(name: str, deadline: timedelta, func: Callable, *args: Any) -> None:
+        with watchdog.track(name, deadline):
+            func(*args)
+
+    def _run(self, task: Callable[[], Any], command: Optional[str] = None) -> None:
+        try:
+            # Someone is waiting for the answer, so it goes ahead of the periodic jobs
+            with prioritized(INTERACTIVE):
+                task()
+        except Exception:
+            log.exception("Failed to process event")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if command is not None:
+                    self._running_commands[command] -= 1
+
+    def _drain(self, channel: str) -> None:
+        """Work through the tasks of the channel until there are none left."""
+        while True:
+            with self._lock:
+                lane = self._lanes[channel]
+                if not lane:
+                    del self._lanes[channel]
+                    return
+                task = lane.popleft()
+            self._run(task)
@@ -0,0 +1,313 @@
+"""Decide cheaply which Slack events are worth handing to the plugin manager.
+
+The plugin manager tests every event against the regex of every plugin in turn,
+including the big pattern in `commands/yell.py`, and that happens for every edit,
+every bot message and every reaction in every channel we're in. Most of those
+can never do anything, so the `DispatchIndex` throws them out first:
+
+- bot messages and edits/deletions are rejected immediately
+- for messages with a command prefix the first word is looked up in a keyword
+  table built from the literal start of the plugin regexes; the remaining
+  plugins are matched with a single combined pattern
+- messages without a prefix only need the plugins that ignore the prefix (one
+  combined pattern) and the callbacks that want to see every message
+- reactions and block-kit actions need a plugin listening for them
+
+Messages are then handed to a `PluginViews` copy of the plugin manager that only
+knows the matched plugin and the callbacks, so the plugin manager doesn't go
+through every regex again. Commands that no plugin knows only reach the callbacks.
+"""
+import copy
+import logging
+import re
+from collections import Counter
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utonium import Plugin, PluginManager
+
+from bubbles.dispatch import strip_prefix
+from bubbles.plugin_manifest import describe_patterns
+
+log = logging.getLogger(__name__)
+
+# Message subtypes that none of the plugins act on
+IGNORED_SUBTYPES = {"bot_message", "message_changed", "message_deleted", "message_replied"}
+
+# The flags that can be applied to a part of a pattern, see `_scope`
+SCOPED_FLAGS = [(re.ASCII, "a"), (re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s")]
+
+NAMED_GROUP = re.compile(r"\(\?P<\w+>")
+# A literal word at the start of a pattern, e.g. "deploy" in `^deploy ?(.+)`
+LEADING_KEYWORD = re.compile(r"^\^(\w+)(.?)")
+QUANTIFIERS = "?*+{"
+
+
+class Route(Enum):
+    # A plugin might respond to the event
+    DISPATCH = "dispatch"
+    # Only the callbacks are interested, nothing is going to respond to it
+    OBSERVE = "observe"
+    # Nothing is interested in the event
+    REJECT = "reject"
+
+
+def get_plugin_name(plugin: Plugin) -> str:
+    """Get the name of the command module that defines the plugin."""
+    func = (
+        getattr(plugin, "func", None)
+        or getattr(plugin, "reaction_func", None)
+        or getattr(plugin, "block_kit_action_func", None)
+        or getattr(plugin, "callback", None)
+    )
+    return getattr(func, "__module__", "unknown").rsplit(".", 1)[-1]
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+def _get_keyword(pattern: str, flags: int) -> Optional[str]:
+    """Get the literal word that every match of the pattern has to start with."""
+    if flags & re.VERBOSE or _has_top_level_alternation(pattern):
+        return None
+    if not (match := LEADING_KEYWORD.match(pattern)):
+        return None
+
+    keyword, following = match.groups()
+    if following and following in QUANTIFIERS:
+        # The last character is optional or repeated, e.g. `^stops?`
+        keyword = keyword[:-1]
+    return keyword.casefold() or None
+
+
+def _scope(pattern: str, flags: int) -> str:
+    """Wrap the pattern in a group that applies its flags only to itself.
+
+    Named groups are turned into plain groups, as the names of the different
+    plugins would clash.
+    """
+    body = NAMED_GROUP.sub("(?:", pattern)
+    letters = "".join(letter for flag, letter in SCOPED_FLAGS if flags & flag)
+    if flags & re.VERBOSE:
+        letters += "x"
+        # A comment on the last line would swallow the closing parenthesis
+        body += "\n"
+    return f"(?{letters}:{body})" if letters else f"(?:{body})"
+
+
+class _CombinedPattern:
+    """Many patterns merged into one regex that tells which of them matched."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, str, int]]) -> None:
+        self.names: Dict[str, str] = {}
+        self.fallbacks: List[Tuple[str, re.Pattern]] = []
+
+        parts = []
+        for name, pattern, flags in patterns:
+            group = f"_p{len(self.names)}"
+            part = f"(?P<{group}>{_scope(pattern, flags)})"
+            try:
+                re.compile(part)
+            except re.error as e:
+                # e.g. global inline flags in the middle of the pattern
+                log.warning(f"Can't merge the pattern of {name}, matching it by itself: {e}")
+                self.fallbacks.append((name, re.compile(pattern, flags)))
+                continue
+            self.names[group] = name
+            parts.append(part)
+
+        self.regex = re.compile("|".join(parts)) if parts else None
+
+    def search(self, text: str) -> Optional[str]:
+        """Get the name of a pattern that matches the text, if there is one."""
+        if self.regex is not None and (match := self.regex.search(text)):
+            return self.names[match.lastgroup]
+        for name, regex in self.fallbacks:
+            if regex.search(text):
+                return name
+        return None
+
+
+class DispatchIndex:
+    """Sort incoming events into the ones that need the plugins and the ones that don't.
+
+    :param entries: The plugin descriptions, as written by `describe_patterns`.
+    :param command_prefixes: The prefixes that mark a message as a command.
+    :param bot_user_id: Our own user ID; we never respond to ourselves.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[Dict[str, Any]],
+        command_prefixes: Iterable[str],
+        bot_user_id: Optional[str] = None,
+    ) -> None:
+        self.command_prefixes = tuple(command_prefixes)
+        self.bot_user_id = bot_user_id
+        # How often each route was taken and each plugin was matched
+        self.stats: Counter = Counter()
+
+        self.keywords: Dict[str, List[Tuple[str, re.Pattern]]] = {}
+        irregular = []
+        ignore_prefix = []
+        reactions = []
+        actions = []
+        self.has_callbacks = False
+
+        for entry in entries:
+            name = entry.get("module") or entry.get("func_name") or "unknown"
+            self.has_callbacks |= entry["has_callback"]
+
+            if (regex := entry["regex"]) is not None:
+                if entry["ignore_prefix"]:
+                    ignore_prefix.append((name, regex, entry["flags"]))
+                elif keyword := _get_keyword(regex, entry["flags"]):
+                    self.keywords.setdefault(keyword, []).append(
+                        (name, re.compile(regex, entry["flags"]))
+                    )
+                else:
+                    irregular.append((name, regex, entry["flags"]))
+            if entry["reaction_regex"] is not None:
+                reactions.append((name, entry["reaction_regex"], 0))
+            if entry["block_kit_action_regex"] is not None:
+                actions.append((name, entry["block_kit_action_regex"], 0))
+
+        self.commands = _CombinedPattern(irregular)
+        self.ignore_prefix = _CombinedPattern(ignore_prefix)
+        self.reactions = _CombinedPattern(reactions)
+        self.actions = _CombinedPattern(actions)
+
+    @classmethod
+    def from_plugins(
+        cls,
+        plugins: Iterable[Plugin],
+        command_prefixes: Iterable[str],
+        bot_user_id: Optional[str] = None,
+    ) -> "DispatchIndex":
+        return cls(
+            [
+                {"module": get_plugin_name(plugin), **describe_patterns(plugin)}
+                for plugin in plugins
+            ],
+            command_prefixes,
+            bot_user_id,
+        )
+
+    def route_message(self, event: Dict) -> Tuple[Route, Optional[str], Optional[str]]:
+        """Decide what to do with a message event.
+
+        :returns: The route, the name of the command and the plugin that handles it.
+        """
+        if (
+            event.get("subtype") in IGNORED_SUBTYPES
+            or event.get("bot_id")
+            or (self.bot_user_id and event.get("user") == self.bot_user_id)
+        ):
+            return self._count(Route.REJECT), None, None
+
+        text = event.get("text") or ""
+        if words := (strip_prefix(text, self.command_prefixes) or "").split(maxsplit=1):
+            command = words[0].lower()
+            if plugin := self._find_command_plugin(" ".join(words), command):
+                self.stats[f"plugin:{plugin}"] += 1
+                return self._count(Route.DISPATCH), command, plugin
+            # Nobody answers unknown commands, but the callbacks still see them
+            self.stats["unknown_command"] += 1
+        elif plugin := self.ignore_prefix.search(text):
+            self.stats[f"plugin:{plugin}"] += 1
+            return self._count(Route.DISPATCH), None, plugin
+
+        if self.has_callbacks:
+            return self._count(Route.OBSERVE), None, None
+        return self._count(Route.REJECT), None, None
+
+    def route_reaction(self, event: Dict) -> Route:
+        if event.get("user") == self.bot_user_id and self.bot_user_id:
+            return self._count(Route.REJECT)
+        if self.reactions.search(event.get("reaction") or ""):
+            return self._count(Route.DISPATCH)
+        return self._count(Route.REJECT)
+
+    def route_action(self, body: Dict) -> Route:
+        for action in body.get("actions") or []:
+            # Like utonium, match the value too: buttons without an action_id get a random one
+            if self.actions.search(action.get("action_id") or "") or self.actions.search(
+                action.get("value") or ""
+            ):
+                return self._count(Route.DISPATCH)
+        return self._count(Route.REJECT)
+
+    def _find_command_plugin(self, text: str, command: str) -> Optional[str]:
+        """Find the plugin that handles the command, mostly for the statistics."""
+        keyword = command.casefold()
+        # `^history` also matches "historywho", so look at every start of the word
+        for end in range(len(keyword), 0, -1):
+            for name, regex in self.keywords.get(keyword[:end], ()):
+                if regex.search(text):
+                    return name
+        return self.commands.search(text)
+
+    def _count(self, route: Route) -> Route:
+        self.stats[route.value] += 1
+        return route
+
+
+class PluginViews:
+    """Copies of the plugin manager that only know the plugins an event is routed to.
+
+    The plugin manager matches a message against all of its plugins in turn. The
+    `DispatchIndex` already knows which plugin it is for, so the message goes to
+    a copy with just that plugin. The callbacks want to see every message, so
+    every copy also has them -- without their regexes, as stand-ins that only
+    have the callback.
+    """
+
+    def __init__(self, manager: PluginManager) -> None:
+        plugins = list(manager.plugins)
+        callbacks = {
+            id(plugin): Plugin(callback=plugin.callback)
+            for plugin in plugins
+            if getattr(plugin, "callback", None) is not None
+        }
+
+        def build_view(chosen: Optional[Plugin]) -> PluginManager:
+            # Shallow, so the copies share the caches and clients of the manager
+            view = copy.copy(manager)
+            view.plugins = [
+                plugin if plugin is chosen else callbacks[id(plugin)]
+                for plugin in plugins
+                if plugin is chosen or id(plugin) in callbacks
+            ]
+            return view
+
+        self.callbacks_only = build_view(None)
+        self.views: Dict[str, PluginManager] = {
+            get_plugin_name(plugin): build_view(plugin)
+            for plugin in plugins
+            if getattr(plugin, "regex", None) is not None
+        }
+
+    def get(self, plugin_name: Optional[str]) -> PluginManager:
+        """Get the copy for the plugin, or the one with only the callbacks."""
+        if plugin_name is None:
+            return self.callbacks_only
+        return self.views.get(plugin_name, self.callbacks_only)
@@ -0,0 +1,139 @@
+"""Drop Slack events that we have already seen.
+
+If we don't acknowledge an event within three seconds, Slack sends it again --
+and every copy used to trigger the command again, so an expensive `!deploy` or
+`!backup` could run twice. The `EventDeduplicator` remembers recent events for a
+while and reports the copies, no matter whether Slack flagged them as retries.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+# Slack gives up after three retries spread over about an hour and a half
+DEFAULT_TTL = timedelta(hours=2)
+DEFAULT_MAX_SIZE = 10_000
+
+RETRY_HEADER = "x-slack-retry-num"
+
+
+def get_retry_attempt(headers: Optional[Mapping[str, Union[str, Sequence[str]]]]) -> int:
+    """Get the retry number from the request headers; 0 for the first delivery."""
+    value = (headers or {}).get(RETRY_HEADER)
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    try:
+        return int(value) if value is not None else 0
+    except ValueError:
+        return 0
+
+
+def get_event_keys(body: Dict, event: Optional[Dict] = None) -> List[Tuple]:
+    """Get everything that identifies the event; a copy shares at least one of them."""
+    event = event if event is not None else body.get("event") or {}
+    keys: List[Tuple] = []
+
+    if event_id := body.get("event_id"):
+        keys.append(("event_id", event_id))
+    if client_msg_id := event.get("client_msg_id"):
+        keys.append(("client_msg_id", client_msg_id))
+
+    if event.get("type") == "reaction_added":
+        # The same reaction can be removed and added again, so the event time counts too
+        item = event.get("item") or {}
+        keys.append(
+            (
+                "reaction",
+                event.get("user"),
+                event.get("reaction"),
+                item.get("ts"),
+                event.get("event_ts"),
+            )
+        )
+    elif event.get("channel") and event.get("ts"):
+        # Edits share the channel and ts with the original message
+        keys.append(("message", event["channel"], event["ts"], event.get("subtype")))
+
+    for action in body.get("actions") or []:
+        if action.get("action_ts"):
+            keys.append(("action", action.get("action_id"), action["action_ts"]))
+
+    return keys
+
+
+class EventDeduplicator:
+    """A bounded cache of recently seen events that forgets them after the TTL."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: timedelta = DEFAULT_TTL) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # How many events we've seen, how many were copies and which key gave them away
+        self.stats: Counter = Counter()
+
+        # Key -> time it was first seen, oldest first
+        self._seen: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_duplicate(
+        self,
+        body: Dict,
+        event: Optional[Dict] = None,
+        headers: Optional[Mapping[str, Any]] = None,
+    ) -> bool:
+        """Remember the event and determine if we've processed it before."""
+        keys = get_event_keys(body, event)
+        retry_attempt = get_retry_attempt(headers)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            self.stats["events"] += 1
+            if retry_attempt:
+                self.stats["retries"] += 1
+
+            for key in keys:
+                if key in self._seen:
+                    self.stats["duplicates"] += 1
+                    self.stats[f"hit:{key[0]}"] += 1
+                    return True
+
+            for key in keys:
+                self._seen[key] = now
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+
+            if retry_attempt:
+                # A retry of something we never saw, the first delivery got lost
+                self.stats["retries_of_unseen"] += 1
+        return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.ttl.total_seconds()
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if seen_at > cutoff:
+                return
+            del self._seen[key]
+
+    def format_stats(self) -> str:
+        """Summarize the counters for humans."""
+        hits = ", ".join(
+            f"{name[4:]}: {count}"
+            for name, count in sorted(self.stats.items())
+            if name[:4] == "hit:"
+        )
+        return (
+            f"*Events seen:* {self.stats['events']}\n"
+            f"*Duplicates dropped:* {self.stats['duplicates']} ({hits or 'none'})\n"
+            f"*Flagged as retry by Slack:* {self.stats['retries']}"
+            f" ({self.stats['retries_of_unseen']} of events we never got)\n"
+            f"*Remembered events:* {len(self)}"
+        )
+
+
+# Shared by all listeners, so that `!debug dedup` can show the counters
+deduplicator = EventDeduplicator()
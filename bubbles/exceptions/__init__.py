@@ -4,3 +4,15 @@ class BubblesException(Exception):
 
 class BubblesConfigException(Exception):
     pass
+
+
+class DispatchOverloaded(BubblesException):
+    """Raised when a command can't be accepted right now; the message is meant for the user."""
+
+    pass
+
+
+class TaskCancelled(BubblesException):
+    """Raised by `bubbles.watchdog.check_cancelled` in a task that is past its deadline."""
+
+    pass
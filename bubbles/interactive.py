@@ -1,10 +1,16 @@
 import random
-from typing import Any, Optional
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import TYPE_CHECKING, Any, Optional
 
 import click
-import matplotlib.pyplot as plt
 from utonium import PluginManager
 
+from bubbles.rendering import get_pyplot
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure  # type: ignore
+
 
 class MockClient:
     def chat_postMessage(self, *args: Any, **kwargs: str) -> None:
@@ -13,9 +19,21 @@ class MockClient:
     def reactions_add(self, *args: Any, **kwargs: str) -> None:
         print(f"Reacting with {kwargs.get('name')}")
 
+    def chat_update(self, *args: Any, **kwargs: str) -> None:
+        print(kwargs.get("text"))
+
     def files_upload(self, *args: Any, **kwargs: str) -> None:
         print(f"Uploading a file called {kwargs.get('title')}")
 
+    def files_upload_v2(self, *args: Any, **kwargs: Any) -> None:
+        for upload in kwargs.get("file_uploads") or [kwargs]:
+            # Save the file to the temp folder, so that it can be opened from the console
+            suffix = Path(upload.get("filename") or "").suffix
+            with NamedTemporaryFile(delete=False, suffix=suffix) as file:
+                content = upload.get("content") or b""
+                file.write(content.encode() if isinstance(content, str) else content)
+            print(f"Uploading {upload.get('title') or upload.get('filename')}: file://{file.name}")
+
     def reactions_list(self, *args: Any, **kwargs: Any) -> dict:
         """Triggers short circuit condition in Payload.get_reaction_message()."""
         return {
@@ -54,7 +72,7 @@ class InteractiveSession:
         click.echo(message)
         return self.build_message_payload(message)
 
-    def say(self, message: str, figures: Optional[list[plt.Figure]] = None) -> None:
+    def say(self, message: str, figures: Optional[list["Figure"]] = None) -> None:
         print_msg = message
 
         if figures and len(figures) > 0:
@@ -65,7 +83,7 @@ class InteractiveSession:
                 file = NamedTemporaryFile(delete=False, suffix=".png")
                 fig.savefig(file, format="png")
                 attachments.append(file)
-                plt.close(fig)
+                get_pyplot().close(fig)
                 file.close()
 
             # Generate (in most cases) clickable links to the files
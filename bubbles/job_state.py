@@ -0,0 +1,43 @@
+"""State of the periodic jobs that survives a restart.
+
+Without it every deploy started the jobs from zero: the aligned pings fired as
+if they had never run and the rule monitoring went through all subreddits again.
+`JobState` keeps small JSON values -- the last run of every job, cursors and
+queues -- in a table of the TinyDB database.
+"""
+import threading
+from typing import Any, Optional
+
+from tinydb import Query, TinyDB
+
+TABLE_NAME = "job_state"
+
+
+class JobState:
+    """A key-value store for the periodic jobs.
+
+    :param lock: TinyDB isn't thread-safe, so everyone writing to the same
+    database has to share this lock.
+    """
+
+    def __init__(
+        self, db: TinyDB, lock: Optional[threading.RLock] = None, table_name: str = TABLE_NAME
+    ) -> None:
+        self._table = db.table(table_name)
+        self._lock = lock or threading.RLock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            document = self._table.get(Query().key == key)
+        return document["value"] if document is not None else default
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._table.upsert({"key": key, "value": value}, Query().key == key)
+
+    def get_last_run(self, job_name: str) -> Optional[float]:
+        """Get when the job last ran, in seconds since the epoch."""
+        return self.get(f"{job_name}.last_run")
+
+    def set_last_run(self, job_name: str, timestamp: float) -> None:
+        self.set(f"{job_name}.last_run", timestamp)
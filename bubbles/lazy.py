@@ -0,0 +1,117 @@
+"""Proxies for objects that are expensive to build and should only exist once used.
+
+Building the Slack app, the Reddit client or Blossom means logging in to the
+respective services. Wrapping them in a `LazyProxy` lets modules import them as
+usual while the actual network traffic only happens on first use -- so that e.g.
+`bubbles --version` doesn't have to log in to Slack first.
+"""
+import threading
+from typing import Any, Callable, Iterator
+
+_UNSET = object()
+
+
+class LazyProxy:
+    """Stand-in for the object returned by `factory`, which is called on first use.
+
+    Attribute access, item access, iteration, comparison and formatting are all
+    forwarded to the real object. Code that needs the real thing (e.g. because it
+    does `isinstance` checks) can get it with `unwrap`.
+    """
+
+    __slots__ = ("_lazy_factory", "_lazy_obj", "_lazy_lock")
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_obj", _UNSET)
+        object.__setattr__(self, "_lazy_lock", threading.RLock())
+
+    def _lazy_resolve(self) -> Any:
+        obj = object.__getattribute__(self, "_lazy_obj")
+        if obj is not _UNSET:
+            return obj
+
+        with object.__getattribute__(self, "_lazy_lock"):
+            obj = object.__getattribute__(self, "_lazy_obj")
+            if obj is _UNSET:
+                obj = object.__getattribute__(self, "_lazy_factory")()
+                object.__setattr__(self, "_lazy_obj", obj)
+        return obj
+
+    def _lazy_set(self, obj: Any) -> None:
+        """Use the given object instead of calling the factory."""
+        with object.__getattribute__(self, "_lazy_lock"):
+            object.__setattr__(self, "_lazy_obj", obj)
+
+    def _lazy_is_resolved(self) -> bool:
+        return object.__getattribute__(self, "_lazy_obj") is not _UNSET
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._lazy_resolve(), name, value)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._lazy_resolve()[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._lazy_resolve()[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        del self._lazy_resolve()[key]
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._lazy_resolve()
+
+    def __iter__(self) -> Iterator:
+        return iter(self._lazy_resolve())
+
+    def __len__(self) -> int:
+        return len(self._lazy_resolve())
+
+    def __bool__(self) -> bool:
+        return bool(self._lazy_resolve())
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._lazy_resolve()(*args, **kwargs)
+
+    def __eq__(self, other: Any) -> bool:
+        return self._lazy_resolve() == unwrap(other)
+
+    def __ne__(self, other: Any) -> bool:
+        return self._lazy_resolve() != unwrap(other)
+
+    def __hash__(self) -> int:
+        return hash(self._lazy_resolve())
+
+    def __add__(self, other: Any) -> Any:
+        return self._lazy_resolve() + unwrap(other)
+
+    def __radd__(self, other: Any) -> Any:
+        return unwrap(other) + self._lazy_resolve()
+
+    def __str__(self) -> str:
+        return str(self._lazy_resolve())
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self._lazy_resolve(), format_spec)
+
+    def __repr__(self) -> str:
+        if not self._lazy_is_resolved():
+            return f"<LazyProxy (unresolved) of {object.__getattribute__(self, '_lazy_factory')}>"
+        return repr(self._lazy_resolve())
+
+
+def unwrap(obj: Any) -> Any:
+    """Return the real object behind a `LazyProxy`, building it if necessary."""
+    if isinstance(obj, LazyProxy):
+        return obj._lazy_resolve()
+    return obj
+
+
+def is_resolved(obj: Any) -> bool:
+    """Determine if the object behind a `LazyProxy` has already been built."""
+    if isinstance(obj, LazyProxy):
+        return obj._lazy_is_resolved()
+    return True
@@ -3,26 +3,44 @@ import os
 import pathlib
 import re
 import sys
-from typing import Any, Callable
+import threading
+from typing import Any, Callable, Optional
 
 import click
 from click.core import Context
-from slack_bolt.adapter.socket_mode import SocketModeHandler
 from utonium import Payload, PluginManager
 
 from bubbles import __version__
 from bubbles.config import (
     COMMAND_PREFIXES,
     DEFAULT_CHANNEL,
+    DIAGNOSTICS_CHANNEL,
+    DISPATCH_MAX_PENDING,
+    DISPATCH_WORKERS,
+    ME,
+    STATIC_COMMAND_PREFIXES,
+    WARM_UP_RENDERING,
     app,
+    channel_mirror,
+    directory,
     rooms_list,
+    use_offline_slack,
     users_list,
 )
-from bubbles.interactive import InteractiveSession, MockClient
-from bubbles.tl_commands import enable_tl_jobs
+from bubbles.dispatch import DispatchExecutor
+from bubbles.dispatch_index import DispatchIndex, PluginViews, Route
+from bubbles.event_dedup import deduplicator
+from bubbles.exceptions import DispatchOverloaded
+from bubbles.lazy import unwrap
+from bubbles.plugin_manifest import LazyPluginManager
 from bubbles.tl_utils import tl
+from bubbles.watchdog import watchdog
 
 plugin_manager: PluginManager
+dispatcher: DispatchExecutor
+dispatch_index: DispatchIndex
+plugin_views: PluginViews
+command_prefixes: tuple
 log = logging.getLogger(__name__)
 command_folder_path = pathlib.Path(__file__).parent / "commands"
 
@@ -48,12 +66,24 @@ Full list of available helper arguments is here:
 
 Full list of available event keys:
     https://api.slack.com/events
+
+Slack sends an event again if it thinks we missed it, so every listener first
+checks with `deduplicator` whether the event is a copy of one we already have.
+
+The listeners don't run the plugins themselves, they hand them to `dispatcher`
+so that a slow command doesn't block Bolt's listener threads. Events that none of
+the plugins care about are thrown out by `dispatch_index` before that, and
+messages only go to the plugin they are for (and the callbacks), see `plugin_views`.
+
+Commands and periodic jobs that take too long are reported to the diagnostics
+channel by the `watchdog`.
+
+The listeners are only attached in `register_event_handlers`, because building
+the Slack app means logging in to Slack -- which we don't want to do just to
+answer `bubbles --version`.
 """
 
 
-@app.event("reaction_removed")
-@app.event("app_mention")
-@app.event("dnd_updated_user")
 def handle(ack: Callable[[], None]) -> None:
     """Gracefully handle extra events so that slack is okay with it.
 
@@ -63,39 +93,125 @@ def handle(ack: Callable[[], None]) -> None:
     `app_mention`. So... we'll just accept `app_mention` events and sinkhole
     them.
 
-    Same goes for "reaction_removed" -- we need "reaction_added" but don't
-    currently care about removals. If we ever start caring about removals,
-    then we have the handler and can move it somewhere else.
+    Same goes for "dnd_updated_user", which we subscribe to but don't use.
     """
     ack()
 
 
-@app.event("message")
+def handle_directory_change(ack: Callable[[], None], event: dict) -> None:
+    """Keep the cached users and rooms in sync with the workspace."""
+    ack()
+    directory.handle_event(event)
+
+
+def _report_diagnostics(text: str) -> None:
+    channel = rooms_list.get(DIAGNOSTICS_CHANNEL, DIAGNOSTICS_CHANNEL)
+    app.client.chat_postMessage(channel=channel, text=text, unfurl_links=False, as_user=True)
+
+
+def _dispatch(
+    say: Callable,
+    channel: Optional[str],
+    command: Optional[str],
+    report: bool,
+    func: Callable,
+    *args: Any,
+) -> None:
+    """Hand the event to the dispatcher, telling the user if it can't take it."""
+    try:
+        dispatcher.submit(func, *args, channel=channel, command=command)
+    except DispatchOverloaded as e:
+        log.warning(f"Dropped {command or 'event'} in {channel}: {e}")
+        if report:
+            say(str(e))
+
+
 def handle_message(
-    ack: Callable[[], None], payload: Any, client: Any, context: Any, say: Callable, body: dict
+    ack: Callable[[], None],
+    payload: Any,
+    client: Any,
+    context: Any,
+    say: Callable,
+    body: dict,
+    request: Any,
 ) -> None:
     ack()
-    plugin_manager.message_received(payload, client, context, body, say)
+    if deduplicator.is_duplicate(body, payload, request.headers):
+        return
+    # The mirror wants all messages of its channels, including edits and deletions
+    channel_mirror.handle_event(payload)
+    route, command, plugin = dispatch_index.route_message(payload)
+    if route is Route.REJECT:
+        return
+    # Only complain about messages that were meant for us
+    _dispatch(
+        say,
+        payload.get("channel"),
+        command,
+        command is not None,
+        plugin_views.get(plugin).message_received,
+        payload,
+        client,
+        context,
+        body,
+        say,
+    )
 
 
-@app.event("reaction_added")
 def reaction_added(
-    ack: Callable[[], None], payload: Any, client: Any, context: Any, say: Callable
+    ack: Callable[[], None],
+    payload: Any,
+    client: Any,
+    context: Any,
+    say: Callable,
+    body: dict,
+    request: Any,
 ) -> None:
     ack()
     # reaction_added_callback(payload)
-    plugin_manager.reaction_received(payload, client, context, say)
+    if deduplicator.is_duplicate(body, payload, request.headers):
+        return
+    channel_mirror.handle_event(payload)
+    if dispatch_index.route_reaction(payload) is Route.REJECT:
+        return
+    channel = (payload.get("item") or {}).get("channel")
+    _dispatch(
+        say, channel, None, False, plugin_manager.reaction_received, payload, client, context, say
+    )
 
 
-pattern = re.compile(".*")
+def reaction_removed(ack: Callable[[], None], payload: Any, body: dict, request: Any) -> None:
+    """No plugin cares about removed reactions, but the channel mirror does."""
+    ack()
+    if deduplicator.is_duplicate(body, payload, request.headers):
+        return
+    channel_mirror.handle_event(payload)
 
 
-@app.action(pattern)
 def handle_action(
-    ack: Callable[[], None], body: Any, client: Any, context: Any, say: Callable
+    ack: Callable[[], None], body: Any, client: Any, context: Any, say: Callable, request: Any
 ) -> None:
     ack()
-    plugin_manager.action_received(body, client, context, say)
+    if deduplicator.is_duplicate(body, {}, request.headers):
+        return
+    if dispatch_index.route_action(body) is Route.REJECT:
+        return
+    channel = (body.get("channel") or {}).get("id")
+    _dispatch(say, channel, None, True, plugin_manager.action_received, body, client, context, say)
+
+
+def register_event_handlers(slack_app: Any) -> None:
+    """Attach all of our listeners to the Slack app."""
+    for event in ["app_mention", "dnd_updated_user"]:
+        slack_app.event(event)(handle)
+    for event in ["user_change", "team_join", "channel_created", "channel_rename"]:
+        slack_app.event(event)(handle_directory_change)
+    slack_app.event("message")(handle_message)
+    slack_app.event("reaction_added")(reaction_added)
+    slack_app.event("reaction_removed")(reaction_removed)
+    # Every action has to be acknowledged, even the ones no plugin listens for --
+    # `dispatch_index` sorts them out after that.
+    slack_app.action(re.compile(".*"))(handle_action)
 
 
 @click.group(
@@ -117,26 +233,43 @@ def handle_action(
     default=False,
     help="Start Bubbles in interactive mode for local testing.",
 )
+@click.option(
+    "--async",
+    "use_async",
+    is_flag=True,
+    default=False,
+    help="Connect to Slack with the asyncio runtime, see `bubbles.async_runtime`.",
+)
 @click.version_option(version=__version__, prog_name="BubblesV2")
-def main(ctx: Context, command: str, interactive: bool) -> None:
+def main(ctx: Context, command: str, interactive: bool, use_async: bool) -> None:
     """Run Bubbles."""
-    global plugin_manager
+    global plugin_manager, dispatcher, dispatch_index, plugin_views, command_prefixes
     if ctx.invoked_subcommand:
         # If we asked for a specific command, don't run the bot. Instead, pass control
         # directly to the subcommand.
         return
 
-    plugin_manager = PluginManager(
-        command_prefixes=COMMAND_PREFIXES,
+    if interactive or command:
+        # Neither of these talk to the real workspace, so don't log in to Slack
+        use_offline_slack()
+        command_prefixes = STATIC_COMMAND_PREFIXES
+    else:
+        command_prefixes = unwrap(COMMAND_PREFIXES)
+
+    # Commands are only imported once they're first used, see `bubbles.plugin_manifest`
+    plugin_manager = LazyPluginManager(
+        command_prefixes=command_prefixes,
         command_folder=command_folder_path,
-        slack_app=app,
+        slack_app=unwrap(app),
         interactive_mode=interactive,
-        users_dict=users_list,
-        rooms_dict=rooms_list,
+        users_dict=unwrap(users_list),
+        rooms_dict=unwrap(rooms_list),
     )
     plugin_manager.load_all_plugins()
 
     if command:
+        from bubbles.interactive import MockClient
+
         # todo: this is broken
         plugin_manager.process_message(
             Payload(
@@ -152,12 +285,47 @@ def main(ctx: Context, command: str, interactive: bool) -> None:
         return
 
     if interactive:
+        from bubbles.interactive import InteractiveSession
+
         InteractiveSession(plugin_manager).repl()
         sys.exit(0)
+
+    from bubbles.tl_commands import enable_tl_jobs
+
+    dispatcher = DispatchExecutor(max_workers=DISPATCH_WORKERS, max_pending=DISPATCH_MAX_PENDING)
+    dispatch_index = DispatchIndex.from_plugins(
+        plugin_manager.plugins, command_prefixes, bot_user_id=str(ME)
+    )
+    plugin_views = PluginViews(plugin_manager)
     enable_tl_jobs()
+    watchdog.report = _report_diagnostics
+    watchdog.start()
+    # Catch up on the QA channels while we connect; until then they're read from Slack
+    channel_mirror.start()
     tl.start()
-    app.client.chat_postMessage(channel=DEFAULT_CHANNEL, text=":wave:", as_user=True)
-    SocketModeHandler(app, os.environ.get("slack_websocket_token")).start()
+    app.client.chat_postMessage(channel=rooms_list[DEFAULT_CHANNEL], text=":wave:", as_user=True)
+
+    if use_async:
+        from bubbles import async_runtime
+
+        # The plugins keep using the synchronous client on the dispatcher's threads
+        async_runtime.run(register_event_handlers, app.client)
+        return
+
+    from slack_bolt.adapter.socket_mode import SocketModeHandler
+
+    register_event_handlers(app)
+    handler = SocketModeHandler(unwrap(app), os.environ.get("slack_websocket_token"))
+    handler.connect()
+
+    if WARM_UP_RENDERING:
+        from bubbles.rendering import warm_up_in_background
+
+        # Now that we're listening, get the first chart request off to a fast start
+        warm_up_in_background()
+
+    # The socket mode client runs on its own threads; this is what `handler.start()` does
+    threading.Event().wait()
 
 
 @main.command()
@@ -176,6 +344,7 @@ def selfcheck(verbose: bool) -> None:
     import pytest
 
     import bubbles.test
+    from bubbles.tl_commands import enable_tl_jobs
 
     # -x is 'exit immediately if a test fails'
     # We need to get the path because the file is actually inside the extracted
@@ -185,17 +354,20 @@ def selfcheck(verbose: bool) -> None:
     if not verbose:
         args.append("-qq")
 
+    # The self check must not post to or listen on the real workspace
+    use_offline_slack()
+
     try:
+        # If any of the commands have a syntax error, it will explode here. The jobs
+        # are only registered, not started, so none of them can reach out to Reddit.
+        # The plugins are loaded eagerly on purpose, so that all of them get imported.
         enable_tl_jobs()
-        tl.start()
-        # If any of the commands have a syntax error, it will explode here.
-        tl.stop()
         plugin_manager = PluginManager(
-            command_prefixes=COMMAND_PREFIXES,
+            command_prefixes=STATIC_COMMAND_PREFIXES,
             command_folder=command_folder_path,
-            slack_app=app,
-            users_dict=users_list,
-            rooms_dict=rooms_list,
+            slack_app=unwrap(app),
+            users_dict=unwrap(users_list),
+            rooms_dict=unwrap(rooms_list),
         )
         plugin_manager.load_all_plugins()
     except Exception as e:
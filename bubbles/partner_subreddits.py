@@ -0,0 +1,134 @@
+"""The partner subreddits, as listed on r/TranscribersOfReddit/wiki/subreddits.
+
+The rule monitoring and the banbot check used to download and parse the wiki
+page on their own. `PartnerSubreddits` is the one place that reads it:
+
+- The page is only downloaded again when its latest revision changed, and the
+  revision is checked at most every `check_interval`.
+- The names are normalized ("/r/Pics " -> "pics"), so every consumer gets the
+  same casefolded set without duplicates.
+- Listeners are told which subs were added and removed, e.g. so that the rules
+  of a new partner are fetched right away. The last known list is kept in the
+  job state, so this includes the changes made while the bot was down.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, FrozenSet, List, Optional, Set
+
+from bubbles.job_state import JobState
+from bubbles.rate_limit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL = timedelta(minutes=5)
+STATE_KEY = "partner_subreddits"
+
+Listener = Callable[[Set[str], Set[str]], None]
+
+
+def normalize_subreddit_name(line: str) -> Optional[str]:
+    """Get the casefolded name of the subreddit on the line of the wiki page, if any."""
+    name = line.strip().strip("/")
+    if name.lower().startswith("r/"):
+        name = name[2:]
+    name = name.strip()
+    if not name or name.startswith("#") or " " in name:
+        return None
+    return name.casefold()
+
+
+def parse_subreddit_names(content: str) -> FrozenSet[str]:
+    """Get the subreddits listed on the wiki page."""
+    names = (normalize_subreddit_name(line) for line in content.splitlines())
+    return frozenset(name for name in names if name)
+
+
+class PartnerSubreddits:
+    """The registry of our partner subreddits.
+
+    :param get_page: Get (a fresh, unfetched copy of) the praw wiki page.
+    :param budget: Every Reddit call takes a token from this, if given.
+    """
+
+    def __init__(
+        self,
+        get_page: Callable[[], Any],
+        state: Optional[JobState] = None,
+        budget: Optional[TokenBucket] = None,
+        check_interval: timedelta = DEFAULT_CHECK_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.get_page = get_page
+        self.state = state
+        self.budget = budget
+        self.check_interval = check_interval
+        self.clock = clock
+
+        saved = state.get(STATE_KEY) if state is not None else None
+        self.revision: Optional[str] = saved["revision"] if saved else None
+        self.subreddits: Optional[FrozenSet[str]] = (
+            frozenset(saved["subreddits"]) if saved else None
+        )
+        self.fetches = 0
+        self._checked: Optional[float] = None
+        self._listeners: List[Listener] = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, listener: Listener) -> None:
+        """Call `listener(added, removed)` whenever the list of subreddits changes."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get(self) -> FrozenSet[str]:
+        """Get the casefolded names of the partner subreddits, refreshing them if due."""
+        with self._lock:
+            if (
+                self.subreddits is None
+                or self._checked is None
+                or self.clock() - self._checked >= self.check_interval.total_seconds()
+            ):
+                self.refresh()
+            return self.subreddits or frozenset()
+
+    def refresh(self, force: bool = False) -> None:
+        """Check the revision of the wiki page and download it if it changed."""
+        with self._lock:
+            page = self.get_page()
+            revision = self._get_revision(page)
+            self._checked = self.clock()
+            if not force and revision is not None and revision == self.revision:
+                return
+
+            self._take_token()
+            subreddits = parse_subreddit_names(page.content_md)
+            self.fetches += 1
+            previous, self.subreddits, self.revision = self.subreddits, subreddits, revision
+            if self.state is not None:
+                self.state.set(STATE_KEY, {"revision": revision, "subreddits": sorted(subreddits)})
+
+            if previous is not None and previous != subreddits:
+                self._notify(set(subreddits - previous), set(previous - subreddits))
+
+    def _take_token(self) -> None:
+        if self.budget is not None:
+            self.budget.acquire()
+
+    def _get_revision(self, page: Any) -> Optional[str]:
+        """Get the ID of the latest revision of the page, or None if we can't tell."""
+        self._take_token()
+        try:
+            latest = next(iter(page.revisions(limit=1)), None)
+        except Exception:
+            log.exception("Couldn't get the revisions of the partner list, downloading it")
+            return None
+        return latest["id"] if latest else None
+
+    def _notify(self, added: Set[str], removed: Set[str]) -> None:
+        log.info(f"Partner subreddits changed, added: {added}, removed: {removed}")
+        for listener in self._listeners:
+            try:
+                listener(added, removed)
+            except Exception:
+                log.exception(f"Failed to tell {listener} about the partner subreddits")
@@ -0,0 +1,46 @@
+"""Build links to Slack messages without asking Slack for every single one.
+
+A permalink is just the workspace URL, the channel ID and the timestamp of the
+message, e.g. `https://grafeas.slack.com/archives/C0123/p1623456789000200`. The
+workspace URL is part of the `auth.test` response that we fetch anyway, so
+`chat.getPermalink` is only needed (and then cached) if we don't know it.
+"""
+from functools import lru_cache
+from typing import Any, Optional
+
+# The number of permalinks to remember when we have to ask Slack for them
+CACHE_SIZE = 2048
+
+
+def build_permalink(
+    workspace_url: str, channel: str, ts: str, thread_ts: Optional[str] = None
+) -> str:
+    """Build the permalink of the message in the given workspace."""
+    permalink = f"{workspace_url.rstrip('/')}/archives/{channel}/p{ts.replace('.', '')}"
+    if thread_ts and thread_ts != ts:
+        # A reply in a thread
+        permalink += f"?thread_ts={thread_ts}&cid={channel}"
+    return permalink
+
+
+class PermalinkService:
+    """Get permalinks to Slack messages.
+
+    :param workspace_url: The URL of the workspace, as returned by `auth.test`.
+    If it is not known, the links are fetched from Slack instead.
+    """
+
+    def __init__(self, client: Any, workspace_url: Optional[str] = None) -> None:
+        self.client = client
+        self.workspace_url = workspace_url
+        self._fetch = lru_cache(maxsize=CACHE_SIZE)(self._fetch_permalink)
+
+    def get(self, channel: str, ts: str, thread_ts: Optional[str] = None) -> Optional[str]:
+        """Get the permalink of the message with the given timestamp in the channel."""
+        if self.workspace_url:
+            return build_permalink(self.workspace_url, channel, ts, thread_ts)
+        return self._fetch(channel, ts)
+
+    def _fetch_permalink(self, channel: str, ts: str) -> Optional[str]:
+        response = self.client.chat_getPermalink(channel=channel, message_ts=ts)
+        return response.data.get("permalink")
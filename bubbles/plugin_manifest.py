@@ -0,0 +1,217 @@
+"""A precomputed manifest of the command plugins, so that they can be imported on demand.
+
+Importing every command at startup drags in matplotlib, numpy, praw models and the
+Slack blocks before the first message can be handled, even though most commands
+are rarely used. At build time (`make shiv`) we import everything once and write
+down what each plugin listens for; at runtime `LazyPluginManager` registers cheap
+stand-ins from that manifest and only imports the real module when a message,
+reaction or block-kit action first matches it.
+
+Run `python -m bubbles.plugin_manifest` to (re)generate the manifest.
+"""
+import hashlib
+import importlib
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utonium import Plugin, PluginManager
+
+log = logging.getLogger(__name__)
+
+COMMANDS_PACKAGE = "bubbles.commands"
+COMMAND_FOLDER = Path(__file__).parent / "commands"
+MANIFEST_PATH = Path(__file__).parent / "plugin_manifest.json"
+
+# Bumped whenever the format of the entries changes
+MANIFEST_VERSION = 1
+
+
+def _find_command_modules(command_folder: Path = COMMAND_FOLDER) -> List[str]:
+    return sorted(path.stem for path in command_folder.glob("*.py") if path.stem != "__init__")
+
+
+def _get_source_hash(module: str, command_folder: Path = COMMAND_FOLDER) -> str:
+    return hashlib.sha1((command_folder / f"{module}.py").read_bytes()).hexdigest()
+
+
+def _get_pattern(plugin: Plugin, attr: str, flags: int = 0) -> Tuple[Optional[str], int]:
+    """Get the raw pattern and the flags of one of the regexes of the plugin."""
+    value = getattr(plugin, attr, None)
+    if isinstance(value, re.Pattern):
+        # Unicode matching is the default for str patterns anyway
+        return value.pattern, value.flags & ~re.UNICODE
+    return value, flags
+
+
+def describe_patterns(plugin: Plugin) -> Dict[str, Any]:
+    """Write down everything needed to match events to the plugin without importing it."""
+    regex, flags = _get_pattern(plugin, "regex", int(getattr(plugin, "flags", 0) or 0))
+    reaction_regex, _ = _get_pattern(plugin, "reaction_regex")
+    block_kit_action_regex, _ = _get_pattern(plugin, "block_kit_action_regex")
+    func = (
+        getattr(plugin, "func", None)
+        or getattr(plugin, "reaction_func", None)
+        or getattr(plugin, "block_kit_action_func", None)
+    )
+
+    return {
+        "regex": regex,
+        "flags": flags,
+        "ignore_prefix": bool(getattr(plugin, "ignore_prefix", False)),
+        "interactive_friendly": bool(getattr(plugin, "interactive_friendly", True)),
+        "has_callback": getattr(plugin, "callback", None) is not None,
+        "reaction_regex": reaction_regex,
+        "block_kit_action_regex": block_kit_action_regex,
+        "func_name": func.__name__ if func else None,
+        "doc": func.__doc__ if func else None,
+    }
+
+
+def describe_plugin(module: str, plugin: Plugin) -> Dict[str, Any]:
+    """Describe the plugin of the given command module for the manifest."""
+    return {
+        "module": module,
+        "source_hash": _get_source_hash(module),
+        **describe_patterns(plugin),
+    }
+
+
+def build_manifest(command_folder: Path = COMMAND_FOLDER) -> Dict[str, Any]:
+    """Import all command modules and describe the plugins they define."""
+    plugins = []
+    for module in _find_command_modules(command_folder):
+        try:
+            imported = importlib.import_module(f"{COMMANDS_PACKAGE}.{module}")
+        except Exception as e:
+            log.error(f"Skipping {module} in the plugin manifest, it can't be imported: {e}")
+            continue
+
+        if plugin := getattr(imported, "PLUGIN", None):
+            plugins.append(describe_plugin(module, plugin))
+
+    return {"version": MANIFEST_VERSION, "plugins": plugins}
+
+
+def write_manifest(path: Path = MANIFEST_PATH) -> Dict[str, Any]:
+    manifest = build_manifest()
+    with open(path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Optional[Dict[str, Any]]:
+    """Load the manifest, if there is a usable one."""
+    try:
+        with open(path, "r") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable plugin manifest: {e}")
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        log.warning("Ignoring plugin manifest of an unknown version.")
+        return None
+
+    return manifest
+
+
+def _is_unchanged(entry: Dict[str, Any]) -> bool:
+    """Determine if the module still has the source the entry was built from."""
+    try:
+        return entry["source_hash"] == _get_source_hash(entry["module"])
+    except OSError:
+        return False
+
+
+def import_plugin(module: str) -> Plugin:
+    """Import the given command module and return its plugin definition."""
+    return importlib.import_module(f"{COMMANDS_PACKAGE}.{module}").PLUGIN
+
+
+def _on_demand(module: str, attr: str, entry: Dict[str, Any]) -> Callable:
+    """Build a function that imports the real plugin on first call and forwards to it."""
+
+    def load_and_call(payload: Any) -> Any:
+        return getattr(import_plugin(module), attr)(payload)
+
+    load_and_call.__name__ = entry.get("func_name") or attr
+    load_and_call.__module__ = f"{COMMANDS_PACKAGE}.{module}"
+    load_and_call.__doc__ = entry.get("doc")
+    return load_and_call
+
+
+def build_stand_in(entry: Dict[str, Any]) -> Plugin:
+    """Create a plugin that matches like the real one, but doesn't import it yet."""
+    module = entry["module"]
+    kwargs: Dict[str, Any] = {
+        "ignore_prefix": entry["ignore_prefix"],
+        "interactive_friendly": entry["interactive_friendly"],
+    }
+    if entry["regex"] is not None:
+        kwargs |= {
+            "func": _on_demand(module, "func", entry),
+            "regex": entry["regex"],
+            "flags": entry["flags"],
+        }
+    if entry["reaction_regex"] is not None:
+        kwargs |= {
+            "reaction_func": _on_demand(module, "reaction_func", entry),
+            "reaction_regex": entry["reaction_regex"],
+        }
+    if entry["block_kit_action_regex"] is not None:
+        kwargs |= {
+            "block_kit_action_func": _on_demand(module, "block_kit_action_func", entry),
+            "block_kit_action_regex": entry["block_kit_action_regex"],
+        }
+    return Plugin(**kwargs)
+
+
+class LazyPluginManager(PluginManager):
+    """A plugin manager that only imports command modules once they are needed.
+
+    Without a manifest (e.g. when running from a checkout) all plugins are
+    loaded up front, just like before.
+    """
+
+    def load_all_plugins(self) -> None:
+        manifest = load_manifest()
+        if manifest is None:
+            super().load_all_plugins()
+            return
+
+        described = set()
+        for entry in manifest["plugins"]:
+            module = entry["module"]
+            described.add(module)
+
+            if entry["has_callback"] or not _is_unchanged(entry):
+                # Callbacks need to see every message, so there's nothing to defer.
+                # Modules that changed since the manifest was built can't be trusted.
+                self._load_now(module)
+            else:
+                self.register_plugin(build_stand_in(entry))
+
+        for module in _find_command_modules():
+            if module not in described:
+                # Either new since the manifest was built or broken
+                self._load_now(module)
+
+    def _load_now(self, module: str) -> None:
+        try:
+            imported = importlib.import_module(f"{COMMANDS_PACKAGE}.{module}")
+        except Exception as e:
+            log.error(f"Failed to load {module}: {e}")
+            return
+        if plugin := getattr(imported, "PLUGIN", None):
+            self.register_plugin(plugin)
+
+
+if __name__ == "__main__":
+    written = write_manifest(Path(sys.argv[1]) if len(sys.argv) > 1 else MANIFEST_PATH)
+    print(f"Wrote plugin manifest with {len(written['plugins'])} plugins.")
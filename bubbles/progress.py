@@ -0,0 +1,176 @@
+"""Report the progress of long-running commands in a single Slack message.
+
+Posting a new message for every step of `!ctqstats` spammed the channel and
+spent our Slack rate limit on status updates instead of the actual work. A
+`ProgressReporter` posts one message and edits it with `chat.update` as the
+command moves along. Edits within `min_interval` of the last one are skipped,
+except when a stage starts or ends, so the message always shows the stage
+that is actually running.
+
+    progress = ProgressReporter.from_payload(payload, "Generating the CtQ stats")
+    progress.start_stage("Fetching the submissions", total=len(pages))
+    for page in pages:
+        ...
+        progress.advance()
+    progress.end_stage(f"Fetched {count} submissions")
+    progress.finish("Here are the stats!")
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from bubbles.watchdog import check_cancelled
+
+log = logging.getLogger(__name__)
+
+# The minimum number of seconds between two edits of the message
+MIN_INTERVAL = 2.0
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration like `42s` or `3m 05s`."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+class ProgressReporter:
+    """A Slack message that shows the progress of a command.
+
+    :param say: Posts the message, e.g. `payload.say`.
+    :param client: The Slack client used to edit the message.
+    :param title: The first line of the message.
+    """
+
+    def __init__(
+        self,
+        say: Callable,
+        client: Any,
+        title: str,
+        min_interval: float = MIN_INTERVAL,
+    ) -> None:
+        self.say = say
+        self.client = client
+        self.title = title
+        self.min_interval = min_interval
+
+        self.start_time = time.monotonic()
+        # The summaries of the finished stages
+        self.lines: List[str] = []
+        self.stage: Optional[str] = None
+        self.done = 0
+        self.total: Optional[int] = None
+        self._stage_start = self.start_time
+
+        self._channel: Optional[str] = None
+        self._ts: Optional[str] = None
+        self._posted = False
+        self._last_sent = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_payload(cls, payload: Any, title: str, **kwargs: Any) -> "ProgressReporter":
+        return cls(payload.say, payload.client, title, **kwargs)
+
+    def start_stage(self, stage: str, total: Optional[int] = None) -> None:
+        """Start the next step of the command, with `total` units of work if known."""
+        with self._lock:
+            self.stage = stage
+            self.done = 0
+            self.total = total
+            self._stage_start = time.monotonic()
+        self._send(force=True)
+
+    def advance(self, amount: int = 1, total: Optional[int] = None) -> None:
+        """Mark some units of work of the current stage as done.
+
+        :raises TaskCancelled: If the command ran past its deadline, see `bubbles.watchdog`.
+        """
+        check_cancelled()
+        with self._lock:
+            self.done += amount
+            if total is not None:
+                self.total = total
+        self._send()
+
+    def end_stage(self, summary: Optional[str] = None) -> None:
+        """Finish the current stage, keeping the summary in the message."""
+        with self._lock:
+            if summary is None:
+                summary = self.stage
+            if summary:
+                elapsed = format_duration(time.monotonic() - self._stage_start)
+                self.lines.append(f":heavy_check_mark: {summary} ({elapsed})")
+            self.stage = None
+            self.total = None
+        self._send(force=True)
+
+    def finish(self, text: Optional[str] = None) -> None:
+        """Mark the whole command as done."""
+        with self._lock:
+            self.stage = None
+            elapsed = format_duration(time.monotonic() - self.start_time)
+            self.lines.append(f"{text or 'Done!'} ({elapsed} total)")
+        self._send(force=True)
+
+    def fail(self, text: str) -> None:
+        """Mark the command as failed, e.g. because an API returned an error."""
+        with self._lock:
+            if self.stage:
+                self.lines.append(f":x: {self.stage}")
+                self.stage = None
+            self.lines.append(text)
+        self._send(force=True)
+
+    def render(self) -> str:
+        """Build the text of the message."""
+        lines = [f"*{self.title}*", *self.lines]
+        if self.stage:
+            lines.append(self._render_stage())
+        return "\n".join(lines)
+
+    def _render_stage(self) -> str:
+        elapsed = time.monotonic() - self._stage_start
+        if not self.total:
+            return f"{self.stage}... ({format_duration(elapsed)} elapsed)"
+
+        fraction = min(self.done / self.total, 1)
+        text = f"{self.stage}... {fraction:.0%} ({self.done}/{self.total})"
+        text += f", {format_duration(elapsed)} elapsed"
+        if 0 < fraction < 1:
+            eta = elapsed / fraction * (1 - fraction)
+            text += f", about {format_duration(eta)} left"
+        return text
+
+    def _send(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_sent < self.min_interval:
+                return
+            self._last_sent = now
+            text = self.render()
+
+            if self._ts is None:
+                if self._posted and not force:
+                    # We can't edit a message we don't know, so only milestones get reposted
+                    return
+                response = self.say(text)
+                self._posted = True
+                try:
+                    self._channel = response["channel"]
+                    self._ts = response["ts"]
+                except (KeyError, TypeError):
+                    pass
+                return
+
+            try:
+                self.client.chat_update(channel=self._channel, ts=self._ts, text=text)
+            except Exception as e:
+                # The command itself is more important than its progress
+                log.warning(f"Failed to update the progress message: {e}")
@@ -0,0 +1,162 @@
+"""Token buckets for the APIs that limit how often we may call them.
+
+A `TokenBucket` hands out `rate` tokens per second and saves up to `capacity` of
+them for bursts. Callers that have to wait for a token are served by priority:
+whatever a human is waiting for goes ahead of the output of the periodic jobs.
+The priority is set per thread with `prioritized`, so the code that makes the
+calls doesn't need to know about it. `map_in_threads` hands it on to the
+threads of a pool.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Lower numbers go first
+INTERACTIVE = 0
+DEFAULT = 1
+PERIODIC = 2
+
+_local = threading.local()
+
+
+def current_priority() -> int:
+    """Get the priority of the calls made by the current thread."""
+    return getattr(_local, "priority", DEFAULT)
+
+
+@contextmanager
+def prioritized(priority: int) -> Iterator[None]:
+    """Make all calls of the current thread within the block use the given priority."""
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def map_in_threads(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    max_workers: int,
+    priority: Optional[int] = None,
+) -> Iterator[Tuple[T, R]]:
+    """Call the function for all items on a pool of threads, yielding the results in order.
+
+    Items for which the call fails are logged and left out.
+
+    :param priority: The priority of the calls the threads make. Defaults to the
+    priority of the current thread.
+    """
+    priority = current_priority() if priority is None else priority
+
+    def work(item: T) -> Tuple[bool, Optional[R]]:
+        with prioritized(priority):
+            try:
+                return True, func(item)
+            except Exception:
+                log.exception(f"Failed to process {item}")
+                return False, None
+
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        for item, (ok, result) in zip(items, executor.map(work, items)):
+            if ok:
+                yield item, result  # type: ignore
+
+
+class TokenBucket:
+    """A thread-safe token bucket that serves its waiters by priority."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """:param rate: The number of tokens added per second.
+        :param capacity: The maximum number of tokens that can be saved up.
+        """
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Nothing is handed out before this time, see `penalize`
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """The number of callers that are currently waiting for a token."""
+        return len(self._waiters)
+
+    def acquire(self, priority: Optional[int] = None) -> float:
+        """Take a token, waiting until one is available.
+
+        :param priority: Defaults to the priority of the current thread.
+        :returns: The number of seconds we had to wait.
+        """
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+
+        with self._cond:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiters, ticket)
+            waited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] != ticket:
+                        # Someone more important (or earlier) is first in line
+                        self._cond.wait()
+                        waited = True
+                        continue
+
+                    delay = self._get_delay(now)
+                    if delay <= 0:
+                        self._tokens -= 1
+                        return now - start if waited else 0.0
+                    self._cond.wait(delay)
+                    waited = True
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now, without waiting."""
+        with self._cond:
+            if self._waiters or self._get_delay(time.monotonic()) > 0:
+                return False
+            self._tokens -= 1
+            return True
+
+    def penalize(self, seconds: float) -> None:
+        """Hand out no tokens for the given time, e.g. because the API told us to back off."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            # Start over with a single token once the time is up
+            self._tokens = min(self._tokens, 1)
+            self._updated = max(self._updated, self._blocked_until)
+            self._cond.notify_all()
+
+    def _get_delay(self, now: float) -> float:
+        """Refill the bucket and determine how long it takes until the next token."""
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
@@ -0,0 +1,113 @@
+"""The shared matplotlib setup for every command that draws charts.
+
+Importing pyplot and building matplotlib's font cache takes a noticeable amount of
+time, so nothing here happens on import. Commands call `setup_matplotlib` (or
+`get_pyplot`) right before they draw; the bot additionally warms everything up on
+a background thread once it is connected, so that the first chart doesn't stall.
+"""
+import logging
+import threading
+from io import BytesIO
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+BACKGROUND_COLOR = "#36393f"  # Discord background color
+TEXT_COLOR = "white"
+LINE_COLOR = "white"
+PRIMARY_COLOR = "#94e044"
+SECONDARY_COLOR = "#8282ed"
+
+UNCLAIMED_COLOR = "#ffc033"
+CLAIMED_COLOR = "#0eebd0"
+COMPLETED_COLOR = "#94e044"
+
+FIGURE_DPI = 200.0
+FIGURE_WIDTH = 10
+FIGURE_HEIGHT = 4.2
+
+# Global settings for all plots
+THEME = {
+    "figure.figsize": [20, 10],
+    "figure.facecolor": BACKGROUND_COLOR,
+    "axes.facecolor": BACKGROUND_COLOR,
+    "axes.labelcolor": TEXT_COLOR,
+    "axes.edgecolor": LINE_COLOR,
+    "text.color": TEXT_COLOR,
+    "xtick.color": LINE_COLOR,
+    "ytick.color": LINE_COLOR,
+    "grid.color": LINE_COLOR,
+    "grid.alpha": 0.8,
+    "figure.dpi": FIGURE_DPI,
+}
+
+_setup_lock = threading.Lock()
+_is_set_up = False
+
+
+def setup_matplotlib() -> None:
+    """Select the Agg backend and apply the theme. Safe to call any number of times."""
+    global _is_set_up
+    if _is_set_up:
+        return
+
+    with _setup_lock:
+        if _is_set_up:
+            return
+
+        import matplotlib  # type: ignore
+
+        # We only ever render to files; there is no display on the server anyway
+        matplotlib.use("Agg")
+        matplotlib.rcParams.update(THEME)
+        _is_set_up = True
+
+
+def get_pyplot() -> Any:
+    """Get the pyplot module, set up with our theme."""
+    setup_matplotlib()
+
+    from matplotlib import pyplot as plt  # type: ignore
+
+    return plt
+
+
+def new_figure(**kwargs: Any) -> Any:
+    """Create a figure with our theme, without going through pyplot."""
+    setup_matplotlib()
+
+    from matplotlib.figure import Figure  # type: ignore
+
+    return Figure(**kwargs)
+
+
+def warm_up() -> None:
+    """Build the font cache and render a throwaway figure.
+
+    The first figure after a restart pays for loading the fonts and the
+    rendering code, so we do that before anyone asks for a chart.
+    """
+    fig = new_figure(figsize=(FIGURE_WIDTH, FIGURE_HEIGHT))
+    ax = fig.gca()
+    ax.plot([0, 1], [0, 1], color=PRIMARY_COLOR)
+    ax.set_title("Warm-up")
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
+    fig.savefig(BytesIO(), format="png")
+
+
+def warm_up_in_background() -> threading.Thread:
+    """Run `warm_up` on a daemon thread, so that it never delays anything else."""
+
+    def run() -> None:
+        try:
+            warm_up()
+        except Exception as e:
+            # The charts will just be slow the first time, nothing more
+            log.warning(f"Failed to warm up matplotlib: {e}")
+        else:
+            log.info("Warmed up matplotlib.")
+
+    thread = threading.Thread(target=run, name="rendering-warm-up", daemon=True)
+    thread.start()
+    return thread
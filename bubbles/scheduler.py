@@ -0,0 +1,356 @@
+"""Run the periodic jobs.
+
+A single dispatcher thread keeps the jobs in a heap ordered by their next fire
+time and hands them to a small worker pool when they are due. This replaces
+`timeloop`, which gave every job its own thread and let a slow run overlap with
+the next one.
+
+- A job never runs twice at the same time. If it is still busy when it is due
+  again, the run is skipped -- or, with `overlap=QUEUE`, done right after.
+- The next fire time is computed from the schedule, not from when the last run
+  finished, so jobs don't drift. Slots that were missed entirely are dropped.
+- Jobs can be aligned to multiples of their interval (e.g. every 4 hours at
+  00:00, 04:00, ... UTC), which is computed anew for every run.
+- A random jitter and a stagger for the jobs that start right away keep the
+  jobs from all hitting Reddit and Slack in the very same second.
+- The duration, outcome and lateness of every job are recorded, see `!jobs`.
+- Every run is tracked by the watchdog. A run that takes longer than the
+  job's timeout (by default its interval) is reported as stuck.
+- With a `JobState`, the last run of every job survives a restart: a job that
+  was due while the bot was down runs once right away, one that ran shortly
+  before waits for its next slot.
+"""
+import heapq
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from bubbles.watchdog import watchdog
+
+if TYPE_CHECKING:
+    from bubbles.job_state import JobState
+
+log = logging.getLogger(__name__)
+
+# What to do when a job is due while it is still running
+SKIP = "skip"
+QUEUE = "queue"
+
+DEFAULT_WORKERS = 4
+# The jobs that start immediately are started this far apart
+STAGGER = timedelta(seconds=5)
+
+
+def next_aligned(now: float, interval: float) -> float:
+    """Get the next multiple of the interval (in seconds since the epoch) after now."""
+    return (math.floor(now / interval) + 1) * interval
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    return str(timedelta(seconds=int(seconds)))
+
+
+class Job:
+    """A periodic job and the statistics of its runs."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], object],
+        interval: timedelta,
+        align: bool = False,
+        jitter: timedelta = timedelta(0),
+        overlap: str = SKIP,
+        timeout: Optional[timedelta] = None,
+    ) -> None:
+        if interval <= timedelta(0):
+            raise ValueError(f"The interval of {name} must be positive.")
+        if overlap not in (SKIP, QUEUE):
+            raise ValueError(f"Unknown overlap policy {overlap!r} for {name}.")
+
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.align = align
+        self.jitter = jitter
+        self.overlap = overlap
+        # A run that takes longer than this is reported by the watchdog
+        self.timeout = timeout or interval
+
+        # The slot of the next run, and the time it actually fires (with jitter)
+        self.next_slot = 0.0
+        self.next_run = 0.0
+        self.running = False
+        # When the run that waits for the current one to finish was due
+        self.queued_since: Optional[float] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_start: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_lateness: Optional[float] = None
+        self.max_lateness = 0.0
+        self.last_error: Optional[str] = None
+
+    def format_stats(self, now: float) -> str:
+        text = f"`{self.name}` every {_format_seconds(self.interval.total_seconds())}"
+        if self.running:
+            text += ", *running*"
+        if self.last_start is None:
+            text += ", never ran"
+        else:
+            outcome = f"failed: {self.last_error}" if self.last_error else "ok"
+            text += (
+                f", last run {_format_seconds(now - self.last_start)} ago"
+                f" ({_format_seconds(self.last_duration or 0)}, {outcome})"
+            )
+        text += f", next in {_format_seconds(max(self.next_run - now, 0))}"
+        text += f"\n      {self.runs} runs, {self.failures} failed, {self.skipped} skipped"
+        if self.last_lateness is not None:
+            text += (
+                f", started {_format_seconds(self.last_lateness)} late"
+                f" (max {_format_seconds(self.max_lateness)})"
+            )
+        return text
+
+
+class Scheduler:
+    """Runs jobs on a fixed schedule on a pool of worker threads.
+
+    :param state: Where the last run of every job is persisted, if anywhere.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_WORKERS,
+        clock: Callable[[], float] = time.time,
+        state: Optional["JobState"] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.clock = clock
+        self.state = state
+        self.jobs: Dict[str, Job] = {}
+
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._immediate_jobs = 0
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], object],
+        interval: timedelta,
+        start_after: timedelta = timedelta(0),
+        align: bool = False,
+        jitter: timedelta = timedelta(0),
+        overlap: str = SKIP,
+        timeout: Optional[timedelta] = None,
+    ) -> Job:
+        """Schedule the function to be called every `interval`.
+
+        :param start_after: The delay of the first run. Ignored for aligned jobs and
+        for jobs whose last run is known from the state.
+        :param align: Run on multiples of the interval (UTC) instead.
+        :param jitter: Each run is delayed by a random time up to this.
+        :param overlap: SKIP or QUEUE the runs that are due while the job is running.
+        :param timeout: How long a run may take before the watchdog reports it.
+        Defaults to the interval.
+        """
+        job = Job(
+            name, func, interval, align=align, jitter=jitter, overlap=overlap, timeout=timeout
+        )
+
+        with self._cond:
+            if name in self.jobs:
+                log.warning(f"Replacing the periodic job {name}.")
+            now = self.clock()
+            slot = self._get_first_slot(job, now, self._get_last_run(name))
+            if slot is None:
+                slot = now + start_after.total_seconds()
+                immediate = start_after <= timedelta(0)
+            else:
+                immediate = slot <= now
+            if immediate:
+                slot += STAGGER.total_seconds() * self._immediate_jobs
+                self._immediate_jobs += 1
+            self.jobs[name] = job
+            self._push(job, slot)
+        return job
+
+    def start(self) -> None:
+        """Start running the jobs in the background."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="periodic-job"
+            )
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop scheduling new runs and, optionally, wait for the current ones."""
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+        if thread is not None:
+            thread.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until none of the jobs are running.
+
+        :returns: False if the timeout ran out first.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not any(job.running for job in self.jobs.values()), timeout
+            )
+
+    def run_pending(self) -> float:
+        """Start all jobs that are due.
+
+        :returns: The number of seconds until the next job is due.
+        """
+        with self._cond:
+            while self._heap:
+                when, _, job = self._heap[0]
+                if self.jobs.get(job.name) is not job:
+                    # The job was replaced in the meantime
+                    heapq.heappop(self._heap)
+                    continue
+                now = self.clock()
+                if when > now:
+                    return when - now
+                heapq.heappop(self._heap)
+                self._fire(job, when)
+            return math.inf
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            delay = self.run_pending()
+            with self._cond:
+                if not self._stopped.is_set():
+                    # New jobs wake us up, so this doesn't need to be exact
+                    self._cond.wait(min(delay, 60))
+
+    def _get_last_run(self, name: str) -> Optional[float]:
+        if self.state is None:
+            return None
+        try:
+            return self.state.get_last_run(name)
+        except Exception:
+            log.exception(f"Couldn't load the last run of {name}")
+            return None
+
+    def _get_first_slot(self, job: Job, now: float, last_run: Optional[float]) -> Optional[float]:
+        """Get the slot of the first run, or None to use the `start_after` delay."""
+        interval = job.interval.total_seconds()
+        if job.align:
+            if last_run is not None and next_aligned(last_run, interval) <= now:
+                # A slot passed while we were down, catch up on it once
+                return now
+            return next_aligned(now, interval)
+        if last_run is None:
+            return None
+        return max(last_run + interval, now)
+
+    def _push(self, job: Job, slot: float) -> None:
+        job.next_slot = slot
+        job.next_run = slot + random.uniform(0, job.jitter.total_seconds())
+        heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+        self._cond.notify_all()
+
+    def _get_next_slot(self, job: Job) -> float:
+        interval = job.interval.total_seconds()
+        now = self.clock()
+        if job.align:
+            return next_aligned(max(now, job.next_slot), interval)
+        slot = job.next_slot + interval
+        if slot <= now:
+            # We fell behind, there's no point in catching up on every missed run
+            slot += math.ceil((now - slot) / interval) * interval
+        return slot
+
+    def _fire(self, job: Job, planned: float) -> None:
+        """Start the job, or skip it if it's still running. Requires the lock."""
+        self._push(job, self._get_next_slot(job))
+
+        if job.running:
+            if job.overlap == QUEUE and job.queued_since is None:
+                job.queued_since = planned
+            else:
+                job.skipped += 1
+                log.warning(f"Skipped {job.name}, the previous run is still going.")
+            return
+
+        self._submit(job, planned)
+
+    def _submit(self, job: Job, planned: float) -> None:
+        job.running = True
+        if self._executor is None:
+            # Not started (or already stopped)
+            job.running = False
+            return
+        self._executor.submit(self._run, job, planned)
+
+    def _run(self, job: Job, planned: float) -> None:
+        start = self.clock()
+        error = None
+        try:
+            with watchdog.track(f"job {job.name}", job.timeout):
+                job.func()
+        except Exception as e:
+            error = e
+            log.exception(f"The periodic job {job.name} failed")
+
+        if self.state is not None:
+            # Outside of the lock, this writes to disk
+            try:
+                self.state.set_last_run(job.name, start)
+            except Exception:
+                log.exception(f"Couldn't save the last run of {job.name}")
+
+        with self._cond:
+            job.runs += 1
+            job.last_start = start
+            job.last_duration = self.clock() - start
+            job.last_lateness = max(start - planned, 0)
+            job.max_lateness = max(job.max_lateness, job.last_lateness)
+            job.last_error = f"{type(error).__name__}: {error}" if error else None
+            if error:
+                job.failures += 1
+
+            job.running = False
+            if job.queued_since is not None:
+                planned, job.queued_since = job.queued_since, None
+                self._submit(job, planned)
+            self._cond.notify_all()
+
+    def format_stats(self) -> str:
+        """Summarize the state of all jobs for humans."""
+        now = self.clock()
+        with self._cond:
+            jobs = sorted(self.jobs.values(), key=lambda job: job.name)
+            if not jobs:
+                return "There are no periodic jobs."
+            lines = [job.format_stats(now) for job in jobs]
+        as_of = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%H:%M:%S UTC")
+        return f"*Periodic jobs* (as of {as_of})\n" + "\n".join(lines)
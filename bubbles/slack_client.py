@@ -0,0 +1,139 @@
+"""A Slack client that stays within Slack's rate limits.
+
+Slack assigns every Web API method to a tier with a per-minute limit, and
+`chat.postMessage` may only be called about once per second and channel. A burst
+of rule-change or welcome-ping messages used to get the whole bot rate limited.
+`RateLimitedWebClient` gives every method (and channel, for posting) its own
+token bucket, backs off for as long as Slack asks when it answers with a 429 and
+lets interactive replies go ahead of the output of periodic jobs, see
+`bubbles.rate_limit`.
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from bubbles.rate_limit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+# Calls per minute of each tier, see https://api.slack.com/docs/rate-limits
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+DEFAULT_TIER = 3
+
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.delete": 3,
+    "chat.getPermalink": 4,
+    "chat.update": 3,
+    "conversations.history": 3,
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "conversations.replies": 3,
+    "files.completeUploadExternal": 4,
+    "files.getUploadURLExternal": 4,
+    "files.upload": 2,
+    "reactions.add": 3,
+    "reactions.get": 3,
+    "reactions.list": 2,
+    "users.info": 4,
+    "users.list": 2,
+}
+
+# These are limited per channel instead of per workspace
+PER_CHANNEL_METHODS = {"chat.postMessage", "chat.postEphemeral"}
+PER_CHANNEL_RATE = 1.0
+PER_CHANNEL_BURST = 3
+
+# How many times a call is retried after Slack answered with a 429
+MAX_RETRIES = 3
+
+
+def _get_retry_after(error: SlackApiError) -> float:
+    headers = {key.lower(): value for key, value in (error.response.headers or {}).items()}
+    value = headers.get("retry-after", 1)
+    if isinstance(value, list):
+        value = value[0]
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
+
+
+def _get_channel(kwargs: Dict[str, Any]) -> Optional[str]:
+    for key in ("json", "data", "params"):
+        if isinstance(kwargs.get(key), dict) and kwargs[key].get("channel"):
+            return kwargs[key]["channel"]
+    return None
+
+
+class RateLimitedWebClient(WebClient):
+    """A `WebClient` that queues its calls to stay within the rate limits."""
+
+    def __init__(self, *args: Any, max_retries: int = MAX_RETRIES, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_retries = max_retries
+        # Per method: the number of calls, how many had to wait and for how long,
+        # and how often Slack rate limited us anyway
+        self.rate_limit_stats: Dict[str, Counter] = defaultdict(Counter)
+
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+
+    def api_call(self, api_method: str, **kwargs: Any) -> SlackResponse:  # type: ignore
+        bucket = self._get_bucket(api_method, kwargs)
+        stats = self.rate_limit_stats[api_method]
+
+        for attempt in range(self.max_retries + 1):
+            waited = bucket.acquire()
+            stats["calls"] += 1
+            if waited > 0:
+                stats["queued"] += 1
+                stats["wait_ms"] += int(waited * 1000)
+
+            try:
+                return super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = _get_retry_after(e)
+                stats["throttled"] += 1
+                log.warning(f"Slack rate limited {api_method}, retrying in {retry_after}s.")
+                # Everyone else calling this method has to wait as well
+                bucket.penalize(retry_after)
+
+        raise AssertionError("unreachable")
+
+    def _get_bucket(self, api_method: str, kwargs: Dict[str, Any]) -> TokenBucket:
+        channel = _get_channel(kwargs) if api_method in PER_CHANNEL_METHODS else None
+        key = (api_method, channel)
+
+        with self._buckets_lock:
+            if key not in self._buckets:
+                if api_method in PER_CHANNEL_METHODS:
+                    self._buckets[key] = TokenBucket(PER_CHANNEL_RATE, PER_CHANNEL_BURST)
+                else:
+                    per_minute = TIER_LIMITS[METHOD_TIERS.get(api_method, DEFAULT_TIER)]
+                    # Allow a short burst of a tenth of the limit
+                    self._buckets[key] = TokenBucket(per_minute / 60, max(per_minute / 10, 1))
+            return self._buckets[key]
+
+    @property
+    def waiting(self) -> int:
+        """The number of calls that are currently waiting for their turn."""
+        with self._buckets_lock:
+            return sum(bucket.waiting for bucket in self._buckets.values())
+
+    def format_stats(self) -> str:
+        """Summarize the rate limit statistics for humans."""
+        lines = [f"*Calls waiting right now:* {self.waiting}"]
+        for method, stats in sorted(self.rate_limit_stats.items()):
+            lines.append(
+                f"`{method}`: {stats['calls']} calls, {stats['queued']} queued"
+                f" ({stats['wait_ms'] / 1000:.1f}s total), {stats['throttled']} throttled"
+            )
+        return "\n".join(lines)
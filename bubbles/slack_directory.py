@@ -0,0 +1,256 @@
+"""A disk-backed cache of the users and channels in the Slack workspace.
+
+Downloading the whole member and channel list on every start is slow and, without
+cursor pagination, silently incomplete for larger workspaces. The directory loads
+the last snapshot from disk immediately, refreshes itself in the background once
+the snapshot is older than the TTL and applies Slack events in between so that
+`users_list` and `rooms_list` stay correct without re-downloading everything.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from bubbles.watchdog import check_cancelled
+
+log = logging.getLogger(__name__)
+
+# The maximum page size that Slack recommends for users.list and conversations.list
+PAGE_SIZE = 200
+DEFAULT_TTL = timedelta(hours=6)
+
+
+def paginate(method: Callable, key: str, page_size: int = PAGE_SIZE, **kwargs: Any) -> Iterator:
+    """Iterate over all items of a cursor-paginated Slack API method.
+
+    :param method: The client method to call, e.g. `client.users_list`.
+    :param key: The key of the response that holds the items, e.g. "members".
+    """
+    cursor = None
+    while True:
+        # Long scans stop between pages if the command takes too long
+        check_cancelled()
+        if cursor:
+            kwargs["cursor"] = cursor
+        response = method(limit=page_size, **kwargs)
+        yield from response[key]
+
+        cursor = (response.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            return
+
+
+def _get_display_name(member: Dict) -> str:
+    """Extract the display name of a member, if available."""
+    return member.get("profile", {}).get("display_name") or member.get("real_name") or member["id"]
+
+
+class SlackDirectory:
+    """The users and channels of the workspace, kept in sync with Slack.
+
+    `users` and `rooms` are plain dicts that are updated in place, so it is safe
+    to hand them out once and keep the reference around. Without a `snapshot_path`
+    nothing is persisted.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        snapshot_path: Optional[Path],
+        ttl: timedelta = DEFAULT_TTL,
+        team_id: Optional[str] = None,
+    ) -> None:
+        self.client = client
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.ttl = ttl
+        self.team_id = team_id
+
+        # Conversion between user ID <-> username, plus the list of all IDs.
+        # 'Any' here is either a list or a str; mypy can't handle that.
+        self.users: Dict[str, Any] = {"ids_only": []}
+        # Conversion between room ID <-> room name
+        self.rooms: Dict[str, str] = {}
+        # When the directory was last fetched from Slack (epoch seconds)
+        self.last_refresh: Optional[float] = None
+
+        self._members: Dict[str, str] = {}
+        self._channels: Dict[str, str] = {}
+        # The keys that we generated ourselves; anything else has been added by
+        # someone else (e.g. the interactive mode) and must survive a refresh.
+        self._user_keys: set = set()
+        self._room_keys: set = set()
+        self._lock = threading.RLock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Load the directory and keep it up to date in the background.
+
+        If there is no usable snapshot on disk we have no choice but to wait for
+        the first download, otherwise the snapshot is used right away.
+        """
+        if not self.load_snapshot():
+            self.refresh()
+        self._start_refresh_thread()
+
+    def load_snapshot(self) -> bool:
+        """Load the directory from disk.
+
+        :returns: True if a snapshot for this workspace was found, else False.
+        """
+        if self.snapshot_path is None:
+            return False
+
+        try:
+            with open(self.snapshot_path, "r") as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable Slack directory snapshot: {e}")
+            return False
+
+        if snapshot.get("team_id") != self.team_id:
+            # This is the snapshot of a different workspace, it's worthless for us
+            return False
+
+        with self._lock:
+            self._members = snapshot.get("members", {})
+            self._channels = snapshot.get("channels", {})
+            self.last_refresh = snapshot.get("saved_at")
+            self._rebuild()
+
+        log.info(
+            f"Loaded Slack directory snapshot with {len(self._members)} users"
+            f" and {len(self._channels)} channels."
+        )
+        return True
+
+    def save_snapshot(self) -> None:
+        """Atomically write the directory to disk."""
+        if self.snapshot_path is None:
+            return
+
+        with self._lock:
+            snapshot = {
+                "team_id": self.team_id,
+                "saved_at": self.last_refresh,
+                "members": dict(self._members),
+                "channels": dict(self._channels),
+            }
+
+        directory = self.snapshot_path.parent
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{self.snapshot_path.name}")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(snapshot, file)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            log.warning(f"Failed to save the Slack directory snapshot: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def is_stale(self) -> bool:
+        """Determine if the directory should be fetched from Slack again."""
+        if self.last_refresh is None:
+            return True
+        return time.time() - self.last_refresh >= self.ttl.total_seconds()
+
+    def refresh(self) -> None:
+        """Download the full directory from Slack, following all pages."""
+        members = {
+            member["id"]: _get_display_name(member)
+            for member in paginate(self.client.users_list, "members")
+            if not member.get("deleted")
+        }
+        channels = {
+            channel["id"]: channel["name"]
+            for channel in paginate(self.client.conversations_list, "channels")
+        }
+
+        with self._lock:
+            self._members = members
+            self._channels = channels
+            self.last_refresh = time.time()
+            self._rebuild()
+
+        log.info(f"Refreshed Slack directory: {len(members)} users, {len(channels)} channels.")
+        self.save_snapshot()
+
+    def handle_event(self, event: Dict) -> None:
+        """Apply a `user_change`, `team_join`, `channel_created` or `channel_rename` event."""
+        event_type = event.get("type")
+
+        with self._lock:
+            if event_type in ("user_change", "team_join"):
+                member = event["user"]
+                if member.get("deleted"):
+                    self._members.pop(member["id"], None)
+                else:
+                    self._members[member["id"]] = _get_display_name(member)
+            elif event_type in ("channel_created", "channel_rename"):
+                channel = event["channel"]
+                self._channels[channel["id"]] = channel["name"]
+            else:
+                return
+
+            self._rebuild()
+
+        self.save_snapshot()
+
+    def _rebuild(self) -> None:
+        """Regenerate the public lookup dicts from the raw directory data.
+
+        New keys are written before stale ones are removed, so a concurrent
+        reader never misses an entry that exists both before and after.
+        """
+        users: Dict[str, Any] = {}
+        ids_only: List[str] = []
+        for user_id, name in self._members.items():
+            users[user_id] = name
+            users[name] = user_id
+            ids_only.append(user_id)
+        users["ids_only"] = ids_only
+
+        rooms: Dict[str, str] = {}
+        for room_id, name in self._channels.items():
+            rooms[room_id] = name
+            rooms[name] = room_id
+
+        self._user_keys = self._replace_contents(self.users, users, self._user_keys)
+        self._room_keys = self._replace_contents(self.rooms, rooms, self._room_keys)
+
+    @staticmethod
+    def _replace_contents(target: Dict, new: Dict, previous_keys: set) -> set:
+        target.update(new)
+        for key in previous_keys - new.keys():
+            target.pop(key, None)
+        return set(new.keys())
+
+    def _start_refresh_thread(self) -> None:
+        if self._refresh_thread is not None:
+            return
+
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="slack-directory-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            if self.is_stale():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the data we have, we'll try again later
+                    log.error(f"Failed to refresh the Slack directory: {e}")
+                    time.sleep(60)
+                    continue
+
+            remaining = self.ttl.total_seconds() - (time.time() - (self.last_refresh or 0))
+            time.sleep(max(remaining, 1))
@@ -0,0 +1,65 @@
+"""Read the message history of Slack channels.
+
+`conversations.history` returns at most one page of messages per call, and
+anything beyond that has to be requested with the cursor of the previous page.
+`iter_channel_history` follows the cursor for as long as the caller keeps
+asking for messages, so only one page is ever held in memory and a caller that
+stops early doesn't download the rest of the channel.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Union
+
+from bubbles.slack_directory import paginate
+
+# Slack recommends no more than 200 messages per page
+PAGE_SIZE = 200
+
+Timestamp = Union[datetime, float, int, str]
+
+
+def _format_ts(value: Timestamp) -> str:
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    return str(value)
+
+
+def iter_channel_history(
+    client: Any,
+    channel: str,
+    oldest: Optional[Timestamp] = None,
+    latest: Optional[Timestamp] = None,
+    limit: Optional[int] = None,
+    inclusive: bool = False,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[Dict]:
+    """Yield the messages of the channel, newest first.
+
+    :param client: The Slack client to use.
+    :param channel: The ID of the channel.
+    :param oldest: Only messages after this time; a datetime or a Slack timestamp.
+    :param latest: Only messages before this time; a datetime or a Slack timestamp.
+    :param limit: The maximum number of messages to yield.
+    :param inclusive: Whether messages exactly at `oldest` or `latest` are included.
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    kwargs: Dict[str, Any] = {"channel": channel}
+    if oldest is not None:
+        kwargs["oldest"] = _format_ts(oldest)
+    if latest is not None:
+        kwargs["latest"] = _format_ts(latest)
+    if inclusive:
+        kwargs["inclusive"] = True
+
+    if limit is not None:
+        # Don't download a full page just for a handful of messages
+        page_size = min(page_size, limit)
+
+    remaining = limit
+    for message in paginate(client.conversations_history, "messages", page_size, **kwargs):
+        yield message
+        if remaining is not None:
+            remaining -= 1
+            if remaining == 0:
+                return
@@ -0,0 +1,30 @@
+from bubbles.commands.periodic.banbot_check import find_banbot_changes, get_banbots
+
+
+def test_get_banbots_respects_exceptions() -> None:
+    assert get_banbots("pics", ["safestbot", "someone"]) == {"safestbot"}
+    assert get_banbots("feminism", ["safestbot", "someone"]) == set()
+    assert get_banbots("pics", None) == set()
+
+
+def test_only_changes_are_reported() -> None:
+    previous = {
+        "pics": ["saferbot", "someone"],
+        "aww": ["someone"],
+        "cats": ["safestbot"],
+    }
+    current = {
+        # Still there, already reported
+        "pics": ["saferbot", "someone"],
+        # Joined since the last run
+        "aww": ["misandrybot", "someone"],
+        # Left since the last run
+        "cats": ["someone"],
+        # A new partner
+        "dogs": ["saferbot"],
+    }
+
+    changes = find_banbot_changes(previous, current)
+
+    assert changes["added"] == {"saferbot": ["dogs"], "misandrybot": ["aww"], "safestbot": []}
+    assert changes["removed"] == {"saferbot": [], "misandrybot": [], "safestbot": ["cats"]}
@@ -1,13 +1,21 @@
+from contextlib import ExitStack
 from datetime import datetime
+from pathlib import Path
 from typing import List
+from unittest.mock import MagicMock, patch
 
 import pytest
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
 
+from bubbles.commands.periodic import rule_monitoring
 from bubbles.commands.periodic.rule_monitoring import (
     RuleChanges,
     SubredditRule,
     _compare_rules,
 )
+from bubbles.commands.periodic.rule_store import RuleStore
+from bubbles.job_state import JobState
 
 EXAMPLE_RULE = {
     "index": 0,
@@ -110,3 +118,54 @@ def test_compare_rules(
 ) -> None:
     actual = _compare_rules(old_rules, new_rules)
     assert actual == expected
+
+
+def test_callback_checks_a_batch_and_records_the_pass(tmp_path: Path) -> None:
+    store = RuleStore(tmp_path)
+    for checked_at, sub_name in enumerate(["oldest", "older", "newest"]):
+        store.save_rules(sub_name, [], checked_at=checked_at)
+    new_rule = {**EXAMPLE_RULE, "created_time": "2022-08-17T00:00:00+00:00"}
+    current_rules = {"oldest": [new_rule], "older": [], "newest": []}
+    notifications: List[str] = []
+
+    with ExitStack() as stack:
+        for name, value in {
+            "rule_store": store,
+            "job_state": JobState(TinyDB(storage=MemoryStorage)),
+            "new_subreddits": [],
+            "subreddit_stack": [],
+            "pass_stats": {},
+            "_state_loaded": False,
+            "RULE_MONITORING_DATA_DIR": str(tmp_path),
+            "RULE_MONITORING_CHECKS_PER_RUN": 2,
+            "partner_subreddits": MagicMock(),
+            "_get_subreddit_names": lambda: ["newest", "oldest", "older"],
+            "_get_subreddit_rules": current_rules.get,
+            "_notify_mods": notifications.append,
+        }.items():
+            stack.enter_context(patch.object(rule_monitoring, name, value))
+
+        rule_monitoring.rule_monitoring_callback()
+        assert rule_monitoring.get_subreddit_stack() == ([], ["newest"])
+        assert "last_duration" not in rule_monitoring.pass_stats
+
+        rule_monitoring.rule_monitoring_callback()
+        assert rule_monitoring.get_subreddit_stack() == ([], [])
+        assert rule_monitoring.pass_stats["last_subreddits"] == 3
+
+    assert len(notifications) == 1
+    assert "Rule changes in r/oldest" in notifications[0]
+
+
+def test_check_rule_changes_initializes_cleared_subs(tmp_path: Path) -> None:
+    store = RuleStore(tmp_path)
+    rules = [{**EXAMPLE_RULE, "created_time": "2022-08-17T00:00:00+00:00"}]
+
+    with patch.object(rule_monitoring, "rule_store", store), patch.object(
+        rule_monitoring, "_get_subreddit_rules", lambda sub_name: rules
+    ):
+        # The saved rules are gone, e.g. because of !clear_saved_rules
+        changes = rule_monitoring._check_rule_changes("pics")
+
+    assert changes == {"added": [], "removed": [], "edited": []}
+    assert store.load_rules("pics") == rules
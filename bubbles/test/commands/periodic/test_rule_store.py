@@ -0,0 +1,58 @@
+import json
+import os
+from pathlib import Path
+
+from bubbles.commands.periodic.rule_store import RuleStore
+
+RULES = [{"index": 1, "name": "Be nice", "description": "", "created_time": "2022-08-17"}]
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    store = RuleStore(tmp_path / "rules.d")
+
+    assert store.load_rules("pics") is None
+    assert store.save_rules("Pics", RULES)
+
+    assert store.load_rules("pics") == RULES
+    assert list(store.get_last_checked()) == ["pics"]
+    # No temporary files are left behind
+    assert os.listdir(tmp_path / "rules.d") == ["pics.json"]
+
+
+def test_unchanged_rules_are_only_touched(tmp_path: Path) -> None:
+    store = RuleStore(tmp_path)
+    store.save_rules("pics", RULES, checked_at=1000)
+
+    assert not store.save_rules("pics", RULES, checked_at=2000)
+    assert store.get_last_checked() == {"pics": 2000}
+
+    assert store.save_rules("pics", [], checked_at=3000)
+    assert store.load_rules("pics") == []
+
+
+def test_migrates_the_legacy_file(tmp_path: Path) -> None:
+    legacy_path = tmp_path / "rules.json"
+    legacy_path.write_text(
+        json.dumps(
+            {
+                "pics": {"last_updated": "1970-01-01T00:16:40+00:00", "rules": RULES},
+                "CatsStandingUp": {"last_updated": "1970-01-01T00:33:20+00:00", "rules": []},
+            }
+        )
+    )
+
+    store = RuleStore(tmp_path / "rules.d", legacy_path=legacy_path)
+
+    assert store.get_last_checked() == {"pics": 1000, "catsstandingup": 2000}
+    assert store.load_rules("pics") == RULES
+    assert not legacy_path.exists()
+    assert (tmp_path / "rules.json.migrated").exists()
+
+
+def test_clear(tmp_path: Path) -> None:
+    store = RuleStore(tmp_path)
+    store.save_rules("pics", RULES)
+    store.save_rules("aww", RULES)
+
+    assert store.clear() == 2
+    assert store.get_last_checked() == {}
@@ -0,0 +1,41 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from bubbles import config
+from bubbles.channel_mirror import normalize_ts
+from bubbles.commands.helper_functions_history import fetch_messages
+from bubbles.commands.helper_functions_history.fetch_messages import HISTORY_CHANNEL
+
+ROOMS = {
+    HISTORY_CHANNEL: "C1",
+    "qa_new_volunteers": "C2",
+    "qa_transcription_check": "C3",
+}
+
+
+def test_history_commands_read_from_the_mirror() -> None:
+    client = MagicMock()
+    client.conversations_history.return_value = {
+        "messages": [{"ts": normalize_ts(time.time() - 60), "text": "welcome"}],
+        "response_metadata": {"next_cursor": ""},
+    }
+
+    with patch.object(config, "rooms_list", ROOMS), patch.object(
+        config, "app", MagicMock(client=client)
+    ), patch.object(config, "CHANNEL_MIRROR_PATH", ":memory:"):
+        mirror = config._build_channel_mirror()
+    mirror.sync_all()
+    client.conversations_history.reset_mock()
+
+    with patch.object(fetch_messages, "channel_mirror", mirror), patch.object(
+        fetch_messages, "rooms_list", ROOMS
+    ):
+        # Both by number of messages and by the time of the oldest one; more messages
+        # than the mirror has would have to come from Slack
+        by_count = list(fetch_messages.fetch_messages(MagicMock(), 1, HISTORY_CHANNEL))
+        since = int(time.time() - 24 * 60 * 60)
+        by_time = list(fetch_messages.fetch_messages(MagicMock(), since, HISTORY_CHANNEL))
+
+    assert [message["text"] for message in by_count] == ["welcome"]
+    assert by_time == by_count
+    client.conversations_history.assert_not_called()
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from bubbles.commands import modmail
+from bubbles.commands.modmail import (
+    MAX_RELAYED_PER_CONVERSATION,
+    PollInterval,
+    RenderCache,
+    RenderedMessage,
+    build_and_send_message,
+    get_unrelayed_messages,
+)
+
+LONG_MESSAGE: RenderedMessage = {
+    "convo_id": "abc",
+    "message_id": "def",
+    "sender": "u/someone",
+    "recipient": "r/TranscribersOfReddit",
+    "subject": "Ban appeal",
+    "body": "Please " * 100,
+}
+
+
+def _messages(*ids: str) -> list:
+    return [SimpleNamespace(id=message_id) for message_id in ids]
+
+
+def test_get_unrelayed_messages() -> None:
+    messages = _messages("a", "b", "c")
+
+    assert get_unrelayed_messages(messages, "a") == messages[1:]
+    assert get_unrelayed_messages(messages, "c") == []
+    # Unknown conversations only relay the latest message
+    assert get_unrelayed_messages(messages, None) == messages[-1:]
+    assert get_unrelayed_messages(messages, "deleted") == messages[-1:]
+
+
+def test_get_unrelayed_messages_limits_bursts() -> None:
+    messages = _messages(*"abcdefghij")
+
+    unrelayed = get_unrelayed_messages(messages, "a")
+
+    assert len(unrelayed) == MAX_RELAYED_PER_CONVERSATION
+    assert unrelayed[-1].id == "j"
+
+
+def test_poll_interval_backs_off_and_resets() -> None:
+    now = [0.0]
+    interval = PollInterval(
+        minimum=timedelta(seconds=10),
+        maximum=timedelta(seconds=40),
+        factor=2,
+        clock=lambda: now[0],
+    )
+
+    assert interval.is_due()
+    interval.record(busy=False)
+    assert interval.current == 20
+    assert not interval.is_due()
+    now[0] = 20
+    assert interval.is_due()
+
+    interval.record(busy=False)
+    interval.record(busy=False)
+    assert interval.current == 40
+
+    interval.record(busy=True)
+    assert interval.current == 10
+
+
+def test_render_cache_evicts_the_least_recently_used() -> None:
+    cache = RenderCache(max_size=2)
+    cache.put({**LONG_MESSAGE, "message_id": "1"})
+    cache.put({**LONG_MESSAGE, "message_id": "2"})
+    cache.get("abc", "1")
+    cache.put({**LONG_MESSAGE, "message_id": "3"})
+
+    assert cache.get("abc", "1") is not None
+    assert cache.get("abc", "2") is None
+    assert cache.get("abc", "3") is not None
+
+
+def test_expanding_a_cached_message_skips_reddit() -> None:
+    cache = RenderCache()
+    cache.put(LONG_MESSAGE)
+    app = MagicMock()
+    sub = MagicMock()
+
+    with patch.object(modmail, "render_cache", cache), patch.object(
+        modmail, "app", app
+    ), patch.object(modmail, "sub", sub):
+        build_and_send_message(
+            convo_id="abc",
+            message_id="def",
+            expand_message=True,
+            update_message_data={"channel": "C1", "ts": "1.2"},
+        )
+
+    sub.modmail.assert_not_called()
+    kwargs = app.client.chat_update.call_args.kwargs
+    assert kwargs["ts"] == "1.2"
+    assert kwargs["text"].endswith(LONG_MESSAGE["body"])
@@ -0,0 +1,109 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from bubbles.commands import suggest_upvote_filter_val
+from bubbles.commands.suggest_upvote_filter_val import (
+    estimate_filter_value,
+    get_new_posts_from_sub,
+    get_outlier_mask,
+    get_total_count_of_posts_in_24_hours,
+    get_total_count_of_posts_per_day,
+)
+
+
+def _reddit(posts: list) -> MagicMock:
+    reddit = MagicMock()
+    reddit.subreddit.return_value.new.return_value = posts
+    return reddit
+
+
+def test_get_outlier_mask() -> None:
+    mask = get_outlier_mask(np.array([10.0, 11, 12, 10, 500]))
+    assert mask.tolist() == [True, True, True, True, False]
+
+
+def test_estimate_filter_value_same_votes() -> None:
+    # Every value is an "outlier" when the standard deviation is zero
+    assert estimate_filter_value(np.array([5.0] * 10), 10) > 0
+    assert estimate_filter_value(np.zeros(10), 10) == 0
+
+
+def test_posts_per_day() -> None:
+    now = time.time()
+    listing = suggest_upvote_filter_val.Listing(
+        ups=np.array([1.0, 2, 3]),
+        created_utc=np.array([now - 60, now - 120, now - 3 * 86400]),
+        fetched=now,
+    )
+    assert get_total_count_of_posts_in_24_hours(listing) == 2
+    assert get_total_count_of_posts_per_day(listing) in (1, 1.5)
+
+
+def test_get_new_posts_from_sub_fetches_once() -> None:
+    posts = [SimpleNamespace(ups=i, created_utc=1000.0 - i) for i in range(20)]
+    reddit = _reddit(posts)
+
+    with patch.object(suggest_upvote_filter_val, "reddit", reddit), patch.object(
+        suggest_upvote_filter_val, "reddit_budget", MagicMock()
+    ), patch.object(suggest_upvote_filter_val, "_listings", {}):
+        listing = get_new_posts_from_sub("Pics")
+        # The same sub is served from the cache, whatever its case
+        assert get_new_posts_from_sub("pics") is listing
+
+    reddit.subreddit.return_value.new.assert_called_once_with(limit=1000)
+    assert listing.ups.tolist() == list(range(20))
+    assert listing.window.ups.tolist() == list(range(10))
+
+
+def test_get_new_posts_from_sub_takes_a_token_per_page() -> None:
+    posts = [SimpleNamespace(ups=1, created_utc=1000.0) for _ in range(250)]
+    budget = MagicMock()
+
+    with patch.object(suggest_upvote_filter_val, "reddit", _reddit(posts)), patch.object(
+        suggest_upvote_filter_val, "reddit_budget", budget
+    ), patch.object(suggest_upvote_filter_val, "_listings", {}):
+        assert len(get_new_posts_from_sub("pics").ups) == 250
+
+    assert budget.acquire.call_count == 3
+
+
+def test_suggest_filter_all() -> None:
+    now = time.time()
+    posts = [SimpleNamespace(ups=10 + i % 3, created_utc=now - i * 3600) for i in range(50)]
+    reddit = MagicMock()
+    reddit.subreddit.side_effect = lambda name: MagicMock(
+        **{"new.return_value": [] if name == "empty" else posts}
+    )
+    partners = MagicMock()
+    partners.get.return_value = frozenset({"pics", "empty"})
+    payload = MagicMock(cleaned_text="suggest filter all")
+
+    with patch.object(suggest_upvote_filter_val, "reddit", reddit), patch.object(
+        suggest_upvote_filter_val, "reddit_budget", MagicMock()
+    ), patch.object(suggest_upvote_filter_val, "_listings", {}), patch.object(
+        suggest_upvote_filter_val, "partner_subreddits", partners
+    ), patch.object(
+        suggest_upvote_filter_val, "upload_files"
+    ) as upload_files:
+        suggest_upvote_filter_val.suggest_filter(payload)
+
+    _, _, files = upload_files.call_args.args
+    rows = files[0]["content"].splitlines()
+    assert rows[0].split(",") == suggest_upvote_filter_val.CSV_COLUMNS
+    assert len(rows) == 2 and rows[1].startswith("pics,")
+    assert "No posts in: empty" in upload_files.call_args.kwargs["initial_comment"]
+
+
+def test_get_new_posts_from_sub_drops_expired_listings() -> None:
+    expired = suggest_upvote_filter_val.Listing(np.array([]), np.array([]), fetched=0.0)
+    listings = {"old": expired}
+
+    with patch.object(suggest_upvote_filter_val, "reddit", _reddit([])), patch.object(
+        suggest_upvote_filter_val, "reddit_budget", MagicMock()
+    ), patch.object(suggest_upvote_filter_val, "_listings", listings):
+        get_new_posts_from_sub("pics")
+
+    assert list(listings) == ["pics"]
@@ -0,0 +1,17 @@
+import pytest
+
+from bubbles import config
+from bubbles.channel_mirror import ChannelMirror
+from bubbles.lazy import LazyProxy
+
+
+@pytest.fixture(autouse=True, scope="session")
+def keep_slack_data_in_memory() -> None:
+    """Keep the Slack directory and the channel mirror from writing files into the repo.
+
+    Both are still only built when a test uses them.
+    """
+    config.directory._lazy_set(LazyProxy(lambda: config._build_directory(snapshot_path=None)))
+    config.channel_mirror._lazy_set(
+        LazyProxy(lambda: ChannelMirror(config.app.client, ":memory:", []))
+    )
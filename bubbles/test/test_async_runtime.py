@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict
+from unittest.mock import MagicMock
+
+from bubbles import async_runtime
+from bubbles.async_runtime import SyncListenerAdapter, async_plugin, run_coroutine
+
+
+async def _double(value: int) -> int:
+    await asyncio.sleep(0)
+    return value * 2
+
+
+def test_run_coroutine_without_runtime() -> None:
+    assert run_coroutine(_double(21)) == 42
+
+
+def test_async_plugin_runs_on_the_runtime_loop() -> None:
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    async_runtime._loop = loop
+    done = threading.Event()
+
+    async def command(payload: Any) -> None:
+        assert asyncio.get_running_loop() is loop
+        payload.say("hi")
+        done.set()
+
+    try:
+        payload = MagicMock()
+        async_plugin(command)(payload)
+
+        assert done.wait(timeout=5)
+        payload.say.assert_called_once_with("hi")
+        assert run_coroutine(_double(2)) == 4
+    finally:
+        async_runtime._loop = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+
+def test_async_plugin_keeps_name_and_doc() -> None:
+    async def cute(payload: Any) -> None:
+        """!cute - pictures."""
+
+    wrapped = async_plugin(cute)
+
+    assert wrapped.__name__ == "cute"
+    assert wrapped.__doc__ == "!cute - pictures."
+
+
+def test_sync_listener_adapter() -> None:
+    registered: Dict[str, Callable] = {}
+
+    class FakeAsyncApp:
+        def event(self, name: str) -> Callable:
+            return lambda func: registered.setdefault(name, func)
+
+    calls = []
+
+    def handle_message(ack: Callable, payload: Any, client: Any, say: Callable) -> None:
+        ack()
+        calls.append((payload, client, say.channel, threading.current_thread()))
+
+    sync_client = MagicMock()
+    SyncListenerAdapter(FakeAsyncApp(), sync_client).event("message")(handle_message)
+
+    acked = []
+
+    async def ack() -> None:
+        acked.append(True)
+
+    context = MagicMock(channel_id="C1")
+    asyncio.run(
+        registered["message"](
+            ack=ack, body={}, payload={"text": "!ping"}, context=context, event=None, request=None
+        )
+    )
+
+    assert acked == [True]
+    assert calls[0][:3] == ({"text": "!ping"}, sync_client, "C1")
+    # The listener may block, so it doesn't run on the thread of the event loop
+    assert calls[0][3] is not threading.current_thread()
@@ -0,0 +1,158 @@
+import time
+from typing import Dict, List
+
+from bubbles.channel_mirror import ChannelMirror, normalize_ts
+
+NOW = time.time()
+
+
+def _ts(minutes_ago: float) -> str:
+    return normalize_ts(NOW - minutes_ago * 60)
+
+
+def _after(ts: str, other: str, inclusive: bool) -> bool:
+    return float(ts) >= float(other) if inclusive else float(ts) > float(other)
+
+
+class HistoryClient:
+    """Serve the history of a channel like Slack does, with `oldest` and `latest`."""
+
+    def __init__(self, messages: List[Dict]) -> None:
+        # Newest first, like Slack
+        self.messages = sorted(messages, key=lambda message: message["ts"], reverse=True)
+        self.calls: List[Dict] = []
+
+    def conversations_history(
+        self,
+        channel: str,
+        limit: int,
+        cursor: str = None,
+        oldest: str = None,
+        latest: str = None,
+        inclusive: bool = False,
+    ) -> Dict:
+        self.calls.append({"oldest": oldest, "latest": latest})
+        matching = [
+            message
+            for message in self.messages
+            if (oldest is None or _after(message["ts"], oldest, inclusive))
+            and (latest is None or _after(latest, message["ts"], inclusive))
+        ]
+        start = int(cursor or 0)
+        end = start + limit
+        next_cursor = str(end) if end < len(matching) else ""
+        return {"messages": matching[start:end], "response_metadata": {"next_cursor": next_cursor}}
+
+
+def _build_mirror(messages: List[Dict]) -> ChannelMirror:
+    return ChannelMirror(HistoryClient(messages), ":memory:", ["C1"])
+
+
+def test_sync_and_read_locally() -> None:
+    messages = [
+        {"ts": _ts(30), "text": "welcome", "reactions": [{"name": "watch", "users": ["U1"]}]},
+        {"ts": _ts(20), "text": "hello"},
+        {"ts": _ts(10), "text": "there"},
+    ]
+    mirror = _build_mirror(messages)
+    assert not mirror.is_synced("C1")
+
+    mirror.sync("C1")
+    calls = len(mirror.client.calls)
+    history = list(mirror.iter_history("C1", limit=3))
+
+    assert [message["text"] for message in history] == ["there", "hello", "welcome"]
+    assert history[2]["reactions"] == [{"name": "watch", "users": ["U1"], "count": 1}]
+    assert len(mirror.client.calls) == calls
+
+
+def test_events_keep_the_mirror_current() -> None:
+    mirror = _build_mirror([{"ts": _ts(30), "text": "welcome"}])
+    mirror.sync("C1")
+    ts = _ts(30)
+    new_ts = _ts(1)
+
+    mirror.handle_event({"type": "message", "channel": "C1", "ts": new_ts, "text": "new"})
+    mirror.handle_event(
+        {
+            "type": "message",
+            "subtype": "message_changed",
+            "channel": "C1",
+            "message": {"ts": ts, "text": "welcome!", "edited": {"ts": new_ts}},
+        }
+    )
+    reaction = {"type": "reaction_added", "user": "U1", "item": {"channel": "C1", "ts": ts}}
+    mirror.handle_event({**reaction, "reaction": "watch"})
+    mirror.handle_event({**reaction, "reaction": "heavy_check_mark"})
+    mirror.handle_event({**reaction, "type": "reaction_removed", "reaction": "watch"})
+    # Thread replies and other channels are not part of the history
+    mirror.handle_event(
+        {"type": "message", "channel": "C1", "ts": _ts(0), "thread_ts": ts, "text": "reply"}
+    )
+    mirror.handle_event({"type": "message", "channel": "C2", "ts": _ts(0), "text": "other"})
+
+    history = list(mirror.iter_history("C1", oldest=_ts(60)))
+
+    assert [message["text"] for message in history] == ["new", "welcome!"]
+    assert history[1]["reactions"] == [{"name": "heavy_check_mark", "users": ["U1"], "count": 1}]
+
+    mirror.handle_event(
+        {"type": "message", "subtype": "message_deleted", "channel": "C1", "deleted_ts": new_ts}
+    )
+    assert [message["ts"] for message in mirror.iter_history("C1")] == [ts]
+
+
+def test_time_window() -> None:
+    mirror = _build_mirror([{"ts": _ts(minutes), "text": str(minutes)} for minutes in range(10)])
+    mirror.sync("C1")
+
+    history = mirror.iter_history("C1", oldest=_ts(6), latest=_ts(2))
+    assert [message["text"] for message in history] == ["3", "4", "5"]
+
+    history = mirror.iter_history("C1", oldest=_ts(6), latest=_ts(2), inclusive=True)
+    assert [message["text"] for message in history] == ["2", "3", "4", "5", "6"]
+
+
+def test_catch_up_removes_deleted_messages() -> None:
+    mirror = _build_mirror([{"ts": _ts(20), "text": "kept"}, {"ts": _ts(10), "text": "gone"}])
+    mirror.sync("C1")
+
+    mirror.client.messages = mirror.client.messages[1:]
+    mirror.sync("C1")
+
+    assert [message["text"] for message in mirror.iter_history("C1")] == ["kept"]
+
+
+def test_falls_back_to_slack() -> None:
+    old_ts = normalize_ts(NOW - 200 * 24 * 60 * 60)
+    mirror = _build_mirror([{"ts": old_ts, "text": "old"}, {"ts": _ts(10), "text": "recent"}])
+
+    # Not synced yet
+    assert [message["text"] for message in mirror.iter_history("C1")] == ["recent", "old"]
+
+    mirror.sync("C1")
+    mirror.client.calls.clear()
+
+    # Older than the backfill
+    assert [message["text"] for message in mirror.iter_history("C1", limit=2)] == [
+        "recent",
+        "old",
+    ]
+    assert len(mirror.client.calls) == 1
+    # Unknown channel
+    assert list(mirror.iter_history("C2", limit=1)) == [mirror.client.messages[0]]
+
+
+def test_falls_back_to_slack_without_repeating_the_boundary() -> None:
+    mirror = _build_mirror([{"ts": _ts(10), "text": "recent"}])
+    mirror.sync("C1")
+    # A message right at the start of the mirror, which Slack knows as well
+    boundary = {"ts": mirror._covered_from["C1"], "text": "boundary"}
+    mirror.client.messages.append(boundary)
+    mirror.handle_event({"type": "message", "channel": "C1", **boundary})
+    old_ts = normalize_ts(NOW - 400 * 24 * 60 * 60)
+
+    history = mirror.iter_history("C1", oldest=old_ts, inclusive=True)
+    assert [message["text"] for message in history] == ["recent", "boundary"]
+    history = mirror.iter_history("C1", oldest=old_ts, limit=2, inclusive=True)
+    assert [message["text"] for message in history] == ["recent", "boundary"]
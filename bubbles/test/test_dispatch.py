@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+from bubbles.dispatch import DispatchExecutor, get_command
+from bubbles.exceptions import DispatchOverloaded
+
+PREFIXES = ("!", "bubbles", "@bubbles", "<@U123>")
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("!deploy tor", "deploy"),
+        ("!PING", "ping"),
+        ("bubbles: history 100", "history"),
+        ("@bubbles ping", "ping"),
+        ("<@U123> ctqstats", "ctqstats"),
+        ("!", None),
+        ("just chatting", None),
+    ],
+)
+def test_get_command(text: str, expected: str) -> None:
+    assert get_command(text, PREFIXES) == expected
+
+
+def test_channel_order_is_kept() -> None:
+    executor = DispatchExecutor(max_workers=4)
+    results: List[int] = []
+
+    def work(i: int) -> None:
+        # Give later tasks every chance to overtake the earlier ones
+        time.sleep(0.01 if i % 2 == 0 else 0)
+        results.append(i)
+
+    for i in range(10):
+        executor.submit(work, i, channel="C1")
+    executor.shutdown()
+
+    assert results == list(range(10))
+
+
+def test_limited_command_is_rejected_while_running() -> None:
+    executor = DispatchExecutor(max_workers=4, command_limits={"deploy": 1})
+    release = threading.Event()
+
+    executor.submit(release.wait, channel="C1", command="deploy")
+    with pytest.raises(DispatchOverloaded):
+        executor.submit(release.wait, channel="C2", command="deploy")
+
+    # The channel isn't blocked by the running deploy
+    done = threading.Event()
+    executor.submit(done.set, channel="C1", command="ping")
+    assert done.wait(timeout=5)
+
+    release.set()
+    while executor.pending:
+        time.sleep(0.01)
+
+    # Once the deploy is done, the next one can start
+    executor.submit(lambda: None, command="deploy")
+    executor.shutdown()
+
+
+def test_overload_is_reported() -> None:
+    executor = DispatchExecutor(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    executor.submit(release.wait, channel="C1")
+    executor.submit(release.wait, channel="C2")
+    with pytest.raises(DispatchOverloaded):
+        executor.submit(release.wait, channel="C3")
+
+    release.set()
+    executor.shutdown()
+    assert executor.pending == 0
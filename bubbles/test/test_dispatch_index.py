@@ -0,0 +1,154 @@
+import re
+from contextlib import ExitStack
+from typing import Any, Dict, List, Tuple
+from unittest.mock import MagicMock, patch
+
+from utonium import Plugin
+
+from bubbles import main
+from bubbles.dispatch_index import DispatchIndex, PluginViews, Route, _get_keyword
+from bubbles.plugin_manifest import build_manifest, import_plugin
+
+PREFIXES = ("!", "bubbles", "@bubbles", "<@U123>")
+
+# Every plugin that can be imported here, as it would be in production
+ENTRIES = build_manifest()["plugins"]
+
+
+def _build_index(entries: List[Dict[str, Any]] = ENTRIES) -> DispatchIndex:
+    return DispatchIndex(entries, PREFIXES, bot_user_id="U123")
+
+
+def test_get_keyword() -> None:
+    assert _get_keyword(r"^deploy ?(.+)", 0) == "deploy"
+    assert _get_keyword(r"^history([0-9 ]+)?", 0) == "history"
+    assert _get_keyword(r"^stops?", 0) == "stop"
+    assert _get_keyword(r"^vote([ \S]+)?|poll([ \S]+)?", 0) is None
+    assert _get_keyword(r"^[fF]$", 0) is None
+
+
+def test_route_message() -> None:
+    index = _build_index()
+
+    assert index.route_message({"text": "!ping"}) == (Route.DISPATCH, "ping", "ping")
+    assert index.route_message({"text": '!historywho 10 "me"'}) == (
+        Route.DISPATCH,
+        "historywho",
+        "plot_comments_historywho",
+    )
+    # Plugins that don't need a prefix
+    assert index.route_message({"text": "f"}) == (Route.DISPATCH, None, "f")
+    assert index.route_message({"text": "what?"}) == (Route.DISPATCH, None, "yell")
+    # The callback of !yell wants to see everything else, including unknown commands
+    assert index.route_message({"text": "hello"}) == (Route.OBSERVE, None, None)
+    assert index.route_message({"text": "!nope"}) == (Route.OBSERVE, None, None)
+
+    assert index.route_message({"text": "!ping", "bot_id": "B1"})[0] is Route.REJECT
+    assert index.route_message({"text": "!ping", "user": "U123"})[0] is Route.REJECT
+    assert index.route_message({"subtype": "message_changed"})[0] is Route.REJECT
+    assert index.stats["plugin:plot_comments_historywho"] == 1
+
+
+def test_route_message_without_callbacks() -> None:
+    index = _build_index([entry for entry in ENTRIES if not entry["has_callback"]])
+
+    assert index.route_message({"text": "hello"}) == (Route.REJECT, None, None)
+    assert index.route_message({"text": "!nope"}) == (Route.REJECT, None, None)
+
+
+def test_route_reaction_and_action() -> None:
+    index = _build_index()
+
+    assert index.route_reaction({"reaction": "robot_face"}) is Route.DISPATCH
+    assert index.route_reaction({"reaction": "thumbsup"}) is Route.REJECT
+    # The modmail buttons only have a value, Slack makes up their action_id
+    button = {"action_id": "Xy3+a", "value": "modmail_embiggen_abc_def"}
+    assert index.route_action({"actions": [button]}) is Route.DISPATCH
+    assert index.route_action({"actions": [{"action_id": "Xy3+a", "value": "other"}]}) is (
+        Route.REJECT
+    )
+
+
+class RecordingManager:
+    """Stands in for the utonium plugin manager, remembering who got which message."""
+
+    def __init__(self, plugins: List[Plugin]) -> None:
+        self.plugins = plugins
+        self.received: List[Tuple[str, List[Plugin]]] = []
+
+    def message_received(self, payload: Dict, *args: Any) -> None:
+        # The copies share `received` with the original
+        self.received.append((payload["text"], self.plugins))
+
+
+def _handle_messages(plugins: List[Plugin], texts: List[str]) -> RecordingManager:
+    manager = RecordingManager(plugins)
+    dispatcher = MagicMock()
+    dispatcher.submit.side_effect = lambda func, *args, **kwargs: func(*args)
+    deduplicator = MagicMock()
+    deduplicator.is_duplicate.return_value = False
+
+    with ExitStack() as stack:
+        for name, value in {
+            "dispatch_index": DispatchIndex.from_plugins(plugins, PREFIXES, bot_user_id="U123"),
+            "plugin_views": PluginViews(manager),  # type: ignore
+            "dispatcher": dispatcher,
+            "deduplicator": deduplicator,
+            "channel_mirror": MagicMock(),
+        }.items():
+            # Most of these are only set once the bot starts
+            stack.enter_context(patch.object(main, name, value, create=True))
+
+        for text in texts:
+            event = {"text": text, "user": "U1", "channel": "C1"}
+            main.handle_message(
+                ack=lambda: None,
+                payload=event,
+                client=None,
+                context=None,
+                say=MagicMock(),
+                body={"event": event},
+                request=MagicMock(),
+            )
+    return manager
+
+
+def test_handle_message_only_hands_over_the_matched_plugin() -> None:
+    plugins = [import_plugin(entry["module"]) for entry in ENTRIES]
+    yell = import_plugin("yell")
+
+    manager = _handle_messages(plugins, ["!ping", "what?", "hello", "!nope"])
+    received = dict(manager.received)
+
+    # The command itself, and !yell only with its callback
+    assert import_plugin("ping") in received["!ping"]
+    for text in ["!ping", "hello", "!nope"]:
+        assert yell not in received[text]
+        assert [plugin.callback for plugin in received[text] if plugin.regex is None] == [
+            yell.callback
+        ]
+    assert len(received["!ping"]) == 2
+    assert received["what?"] == [yell]
+    # Nobody but the callbacks sees unknown commands
+    assert len(received["hello"]) == len(received["!nope"]) == 1
+
+
+def test_handle_message_with_many_plugins() -> None:
+    plugins = [import_plugin(entry["module"]) for entry in ENTRIES]
+
+    def make_extra(i: int) -> Plugin:
+        def func(payload: Any) -> None:
+            pass
+
+        func.__module__ = f"bubbles.commands.extra{i}"
+        return Plugin(func=func, regex=rf"^extra{i}\b", flags=re.IGNORECASE)
+
+    # Another hundred commands don't change what a message is matched against
+    manager = _handle_messages(
+        plugins + [make_extra(i) for i in range(100)], ["!ping", "!extra42 now"]
+    )
+    received = dict(manager.received)
+    assert len(received["!ping"]) == 2
+    assert [plugin.func.__module__ for plugin in received["!extra42 now"] if plugin.func] == [
+        "bubbles.commands.extra42"
+    ]
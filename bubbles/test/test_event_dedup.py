@@ -0,0 +1,48 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from bubbles.event_dedup import EventDeduplicator, get_retry_attempt
+
+MESSAGE = {"type": "message", "channel": "C1", "ts": "1.0", "client_msg_id": "abc"}
+
+
+def test_get_retry_attempt() -> None:
+    assert get_retry_attempt(None) == 0
+    assert get_retry_attempt({"x-slack-retry-num": ["2"]}) == 2
+    assert get_retry_attempt({"x-slack-retry-num": "1"}) == 1
+
+
+def test_retry_is_dropped() -> None:
+    dedup = EventDeduplicator()
+
+    assert not dedup.is_duplicate({"event_id": "Ev1"}, MESSAGE)
+    assert dedup.is_duplicate({"event_id": "Ev1"}, MESSAGE, {"x-slack-retry-num": ["1"]})
+    # Same message, but delivered with a new event ID
+    assert dedup.is_duplicate({"event_id": "Ev2"}, {**MESSAGE, "client_msg_id": None})
+    assert not dedup.is_duplicate(
+        {"event_id": "Ev3"}, {**MESSAGE, "ts": "2.0", "client_msg_id": "x"}
+    )
+
+    assert dedup.stats["duplicates"] == 2
+    assert dedup.stats["hit:event_id"] == 1
+    assert dedup.stats["hit:message"] == 1
+    assert dedup.stats["retries"] == 1
+
+
+def test_events_expire() -> None:
+    dedup = EventDeduplicator(ttl=timedelta(seconds=10))
+
+    with patch("bubbles.event_dedup.time.monotonic", return_value=100.0):
+        assert not dedup.is_duplicate({"event_id": "Ev1"}, MESSAGE)
+    with patch("bubbles.event_dedup.time.monotonic", return_value=111.0):
+        assert not dedup.is_duplicate({"event_id": "Ev1"}, MESSAGE)
+
+
+def test_size_is_bounded() -> None:
+    dedup = EventDeduplicator(max_size=10)
+
+    for i in range(100):
+        dedup.is_duplicate({"event_id": f"Ev{i}"})
+
+    assert len(dedup) == 10
+    assert not dedup.is_duplicate({"event_id": "Ev0"})
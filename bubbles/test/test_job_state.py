@@ -0,0 +1,26 @@
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from bubbles.job_state import JobState
+
+
+def test_get_and_set() -> None:
+    state = JobState(TinyDB(storage=MemoryStorage))
+
+    assert state.get("stack") is None
+    assert state.get("stack", []) == []
+
+    state.set("stack", ["a", "b"])
+    state.set("stack", ["a"])
+
+    assert state.get("stack") == ["a"]
+
+
+def test_last_run() -> None:
+    db = TinyDB(storage=MemoryStorage)
+    JobState(db).set_last_run("tick", 123.5)
+
+    # Another instance, as after a restart
+    state = JobState(db)
+    assert state.get_last_run("tick") == 123.5
+    assert state.get_last_run("tock") is None
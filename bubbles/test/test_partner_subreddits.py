@@ -0,0 +1,66 @@
+from datetime import timedelta
+from typing import List, Set, Tuple
+from unittest.mock import MagicMock
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from bubbles.job_state import JobState
+from bubbles.partner_subreddits import PartnerSubreddits, parse_subreddit_names
+
+
+class FakeWiki:
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.revision = "rev1"
+
+    def get_page(self) -> MagicMock:
+        page = MagicMock()
+        page.revisions.return_value = iter([{"id": self.revision}])
+        page.content_md = self.content
+        return page
+
+
+def test_parse_subreddit_names() -> None:
+    content = "Pics\n/r/aww\n  r/PICS \n\nCatsStandingUp\n# comment\n"
+
+    assert parse_subreddit_names(content) == {"pics", "aww", "catsstandingup"}
+
+
+def test_only_downloads_new_revisions() -> None:
+    now = [0.0]
+    wiki = FakeWiki("pics\naww")
+    partners = PartnerSubreddits(
+        wiki.get_page, check_interval=timedelta(minutes=5), clock=lambda: now[0]
+    )
+    changes: List[Tuple[Set[str], Set[str]]] = []
+    partners.subscribe(lambda added, removed: changes.append((added, removed)))
+
+    assert partners.get() == {"pics", "aww"}
+    # Within the check interval, Reddit isn't asked at all
+    wiki.content = "pics\ncats"
+    assert partners.get() == {"pics", "aww"}
+
+    # The revision is the same, so the page isn't downloaded again
+    now[0] = 600
+    assert partners.get() == {"pics", "aww"}
+    assert partners.fetches == 1
+
+    wiki.revision = "rev2"
+    now[0] = 1200
+    assert partners.get() == {"pics", "cats"}
+    assert partners.fetches == 2
+    assert changes == [({"cats"}, {"aww"})]
+
+
+def test_reports_changes_made_before_a_restart() -> None:
+    state = JobState(TinyDB(storage=MemoryStorage))
+    PartnerSubreddits(FakeWiki("pics").get_page, state=state).get()
+
+    partners = PartnerSubreddits(FakeWiki("pics\naww").get_page, state=state)
+    changes: List[Tuple[Set[str], Set[str]]] = []
+    partners.subscribe(lambda added, removed: changes.append((added, removed)))
+    # Same revision ID, but a different page; the saved list is what counts
+    partners.refresh(force=True)
+
+    assert changes == [({"aww"}, set())]
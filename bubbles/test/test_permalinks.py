@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock
+
+from bubbles.permalinks import PermalinkService, build_permalink
+
+
+def test_build_permalink() -> None:
+    assert (
+        build_permalink("https://grafeas.slack.com/", "C0123", "1623456789.000200")
+        == "https://grafeas.slack.com/archives/C0123/p1623456789000200"
+    )
+
+
+def test_build_permalink_in_thread() -> None:
+    assert (
+        build_permalink(
+            "https://grafeas.slack.com", "C0123", "1623456790.000100", "1623456789.000200"
+        )
+        == "https://grafeas.slack.com/archives/C0123/p1623456790000100"
+        "?thread_ts=1623456789.000200&cid=C0123"
+    )
+
+
+def test_service_does_not_call_slack() -> None:
+    client = MagicMock()
+    service = PermalinkService(client, "https://grafeas.slack.com/")
+
+    assert service.get("C0123", "1.000001") == "https://grafeas.slack.com/archives/C0123/p1000001"
+    client.chat_getPermalink.assert_not_called()
+
+
+def test_service_falls_back_to_cached_api_call() -> None:
+    client = MagicMock()
+    client.chat_getPermalink.return_value.data = {"permalink": "https://example.com"}
+    service = PermalinkService(client)
+
+    assert service.get("C0123", "1.000001") == "https://example.com"
+    assert service.get("C0123", "1.000001") == "https://example.com"
+    client.chat_getPermalink.assert_called_once_with(channel="C0123", message_ts="1.000001")
@@ -0,0 +1,46 @@
+import re
+import sys
+from unittest.mock import MagicMock
+
+from utonium import Plugin
+
+from bubbles.plugin_manifest import build_stand_in, describe_plugin
+
+
+def test_describe_plugin() -> None:
+    from bubbles.commands.yell import PLUGIN
+
+    entry = describe_plugin("yell", PLUGIN)
+
+    assert entry["module"] == "yell"
+    assert entry["flags"] == re.IGNORECASE | re.MULTILINE | re.VERBOSE
+    assert entry["ignore_prefix"]
+    assert entry["has_callback"]
+    assert entry["reaction_regex"] is None
+
+
+def test_stand_in_imports_module_on_first_use() -> None:
+    sys.modules.pop("bubbles.commands.ping", None)
+    entry = {
+        "module": "ping",
+        "regex": r"^ping$",
+        "flags": 0,
+        "ignore_prefix": False,
+        "interactive_friendly": True,
+        "reaction_regex": None,
+        "block_kit_action_regex": None,
+        "func_name": "ping",
+        "doc": "!ping - PONG",
+    }
+
+    stand_in = build_stand_in(entry)
+
+    assert isinstance(stand_in, Plugin)
+    assert stand_in.func.__doc__ == "!ping - PONG"
+    assert "bubbles.commands.ping" not in sys.modules
+
+    payload = MagicMock()
+    stand_in.func(payload)
+
+    assert "bubbles.commands.ping" in sys.modules
+    payload.say.assert_called_once_with("PONG!")
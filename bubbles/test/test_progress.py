@@ -0,0 +1,81 @@
+from typing import Dict, List
+from unittest.mock import MagicMock, patch
+
+from bubbles.progress import ProgressReporter, format_duration
+
+
+class FakeSlack:
+    def __init__(self) -> None:
+        self.posted: List[str] = []
+        self.updates: List[Dict] = []
+        self.client = MagicMock()
+        self.client.chat_update.side_effect = lambda **kwargs: self.updates.append(kwargs)
+
+    def say(self, text: str) -> Dict:
+        self.posted.append(text)
+        return {"ok": True, "channel": "C1", "ts": "123.456"}
+
+
+def test_format_duration() -> None:
+    assert format_duration(4.6) == "5s"
+    assert format_duration(185) == "3m 05s"
+    assert format_duration(7300) == "2h 01m"
+
+
+def test_posts_once_and_edits() -> None:
+    slack = FakeSlack()
+    progress = ProgressReporter(slack.say, slack.client, "Stats", min_interval=0)
+
+    progress.start_stage("Fetching", total=4)
+    progress.advance(2)
+    progress.end_stage("Fetched 4 things")
+    progress.finish()
+
+    assert slack.posted == ["*Stats*\nFetching... 0% (0/4), 0s elapsed"]
+    assert "Fetching... 50% (2/4)" in slack.updates[0]["text"]
+    assert slack.updates[0]["channel"] == "C1"
+    assert slack.updates[0]["ts"] == "123.456"
+    assert slack.updates[-1]["text"].splitlines() == [
+        "*Stats*",
+        ":heavy_check_mark: Fetched 4 things (0s)",
+        "Done! (0s total)",
+    ]
+
+
+def test_throttles_progress_but_not_stages() -> None:
+    slack = FakeSlack()
+    progress = ProgressReporter(slack.say, slack.client, "Stats", min_interval=60)
+
+    progress.start_stage("Fetching", total=100)
+    for _ in range(100):
+        progress.advance()
+    progress.end_stage()
+
+    # Only the start and the end of the stage
+    assert len(slack.posted) == 1
+    assert len(slack.updates) == 1
+
+
+def test_eta() -> None:
+    slack = FakeSlack()
+    progress = ProgressReporter(slack.say, slack.client, "Stats", min_interval=0)
+
+    with patch("bubbles.progress.time.monotonic", return_value=0):
+        progress.start_stage("Fetching", total=4)
+    with patch("bubbles.progress.time.monotonic", return_value=30):
+        progress.advance()
+
+    assert slack.updates[-1]["text"].endswith("25% (1/4), 30s elapsed, about 1m 30s left")
+
+
+def test_failure_and_unknown_message() -> None:
+    posted = []
+    progress = ProgressReporter(posted.append, MagicMock(), "Stats", min_interval=0)
+
+    progress.start_stage("Fetching", total=4)
+    progress.advance()
+    progress.fail("Blossom is down")
+
+    # Without the ts of the message, only the milestones are posted again
+    assert len(posted) == 2
+    assert posted[-1].splitlines() == ["*Stats*", ":x: Fetching", "Blossom is down"]
@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import List
+
+from bubbles.rate_limit import INTERACTIVE, PERIODIC, TokenBucket, current_priority, prioritized
+
+
+def test_prioritized() -> None:
+    with prioritized(PERIODIC):
+        assert current_priority() == PERIODIC
+        with prioritized(INTERACTIVE):
+            assert current_priority() == INTERACTIVE
+        assert current_priority() == PERIODIC
+
+
+def test_bucket_limits_the_rate() -> None:
+    bucket = TokenBucket(rate=50, capacity=2)
+
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two from the burst, then five at 50 per second
+    assert time.monotonic() - start >= 0.09
+
+    assert not bucket.try_acquire()
+
+
+def test_penalize() -> None:
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.penalize(0.1)
+
+    assert not bucket.try_acquire()
+    assert bucket.acquire() >= 0.09
+
+
+def test_waiters_are_served_by_priority() -> None:
+    bucket = TokenBucket(rate=20, capacity=1)
+    bucket.acquire()
+    served: List[str] = []
+
+    def take(name: str, priority: int) -> None:
+        bucket.acquire(priority)
+        served.append(name)
+
+    threads = [threading.Thread(target=take, args=("periodic", PERIODIC))]
+    threads[0].start()
+    while not bucket.waiting:
+        time.sleep(0.001)
+    # The bucket is empty, so the periodic call is still waiting when this arrives
+    threads.append(threading.Thread(target=take, args=("interactive", INTERACTIVE)))
+    threads[1].start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert served == ["interactive", "periodic"]
@@ -0,0 +1,22 @@
+import matplotlib
+
+from bubbles.rendering import BACKGROUND_COLOR, get_pyplot, setup_matplotlib, warm_up
+
+
+def test_setup_matplotlib() -> None:
+    setup_matplotlib()
+    setup_matplotlib()
+
+    assert matplotlib.get_backend().lower() == "agg"
+    assert matplotlib.rcParams["figure.facecolor"] == BACKGROUND_COLOR
+
+
+def test_get_pyplot() -> None:
+    plt = get_pyplot()
+
+    assert plt.rcParams["axes.facecolor"] == BACKGROUND_COLOR
+
+
+def test_warm_up() -> None:
+    # This must not need a display or anything else from the outside
+    warm_up()
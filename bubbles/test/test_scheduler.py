@@ -0,0 +1,174 @@
+import threading
+from datetime import timedelta
+from typing import List
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from bubbles.job_state import JobState
+from bubbles.scheduler import QUEUE, STAGGER, Scheduler, next_aligned
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_next_aligned() -> None:
+    assert next_aligned(3599, 3600) == 3600
+    assert next_aligned(3600, 3600) == 7200
+    assert next_aligned(14_400 + 5, 4 * 3600) == 28_800
+
+
+def test_runs_on_schedule_and_records_stats() -> None:
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    runs: List[float] = []
+    job = scheduler.add_job("tick", lambda: runs.append(clock()), timedelta(seconds=10))
+    scheduler.start()
+    try:
+        assert scheduler.run_pending() == 10
+        assert scheduler.wait_idle(timeout=5)
+
+        clock.now += 12
+        scheduler.run_pending()
+        assert scheduler.wait_idle(timeout=5)
+    finally:
+        scheduler.stop()
+
+    assert runs == [1_000_000.0, 1_000_012.0]
+    assert job.runs == 2
+    assert job.last_lateness == 2
+    # The next run stays on the original schedule instead of drifting
+    assert job.next_run == 1_000_020.0
+
+
+def test_missed_slots_are_dropped() -> None:
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    job = scheduler.add_job("tick", lambda: None, timedelta(seconds=10))
+    scheduler.start()
+    try:
+        scheduler.run_pending()
+        assert scheduler.wait_idle(timeout=5)
+        clock.now += 55
+        scheduler.run_pending()
+        assert scheduler.wait_idle(timeout=5)
+    finally:
+        scheduler.stop()
+
+    assert job.runs == 2
+    assert job.next_run == 1_000_060.0
+
+
+def test_overlapping_runs_are_skipped_or_queued() -> None:
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    release = threading.Event()
+    skipping = scheduler.add_job("skipping", release.wait, timedelta(seconds=10))
+    queueing = scheduler.add_job(
+        "queueing", release.wait, timedelta(seconds=10), start_after=-STAGGER, overlap=QUEUE
+    )
+    scheduler.start()
+    try:
+        scheduler.run_pending()
+        for _ in range(2):
+            clock.now += 10
+            scheduler.run_pending()
+        assert skipping.running and queueing.running
+        release.set()
+        assert scheduler.wait_idle(timeout=5)
+    finally:
+        scheduler.stop()
+
+    assert (skipping.runs, skipping.skipped) == (1, 2)
+    # One run waits for the current one, anything beyond that is skipped
+    assert (queueing.runs, queueing.skipped) == (2, 1)
+
+
+def test_failures_are_recorded() -> None:
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+
+    def fail() -> None:
+        raise ValueError("Reddit is down")
+
+    job = scheduler.add_job("failing", fail, timedelta(minutes=1))
+    scheduler.start()
+    try:
+        scheduler.run_pending()
+        assert scheduler.wait_idle(timeout=5)
+    finally:
+        scheduler.stop()
+
+    assert job.failures == 1
+    assert job.last_error == "ValueError: Reddit is down"
+    assert "1 failed" in scheduler.format_stats()
+
+
+def test_immediate_jobs_are_staggered_and_aligned_jobs_aligned() -> None:
+    clock = FakeClock(4 * 3600 + 5)
+    scheduler = Scheduler(clock=clock)
+
+    first = scheduler.add_job("first", lambda: None, timedelta(minutes=1))
+    second = scheduler.add_job("second", lambda: None, timedelta(minutes=1))
+    aligned = scheduler.add_job("aligned", lambda: None, timedelta(hours=4), align=True)
+    jittered = scheduler.add_job(
+        "jittered",
+        lambda: None,
+        timedelta(hours=1),
+        start_after=timedelta(hours=1),
+        jitter=timedelta(minutes=5),
+    )
+
+    assert second.next_run - first.next_run == STAGGER.total_seconds()
+    assert aligned.next_run == 8 * 3600
+    assert clock.now + 3600 <= jittered.next_run <= clock.now + 3600 + 300
+
+
+def test_resumes_from_the_last_run() -> None:
+    clock = FakeClock()
+    state = JobState(TinyDB(storage=MemoryStorage))
+    state.set_last_run("recent", clock.now - 4)
+    state.set_last_run("overdue", clock.now - 100)
+    scheduler = Scheduler(clock=clock, state=state)
+
+    recent = scheduler.add_job("recent", lambda: None, timedelta(seconds=10))
+    overdue = scheduler.add_job("overdue", lambda: None, timedelta(seconds=10))
+
+    # Waits for the rest of the interval instead of running right away
+    assert recent.next_slot == clock.now + 6
+    assert overdue.next_slot == clock.now
+
+
+def test_aligned_job_catches_up_once() -> None:
+    clock = FakeClock(4 * 3600 + 60)
+    state = JobState(TinyDB(storage=MemoryStorage))
+    # The slot at 04:00 was missed while we were down
+    state.set_last_run("missed", 3 * 3600)
+    state.set_last_run("done", 4 * 3600 + 5)
+    scheduler = Scheduler(clock=clock, state=state)
+
+    missed = scheduler.add_job("missed", lambda: None, timedelta(hours=1), align=True)
+    done = scheduler.add_job("done", lambda: None, timedelta(hours=1), align=True)
+
+    assert missed.next_slot == clock.now
+    assert done.next_slot == 5 * 3600
+
+
+def test_records_the_last_run() -> None:
+    clock = FakeClock()
+    state = JobState(TinyDB(storage=MemoryStorage))
+    scheduler = Scheduler(clock=clock, state=state)
+    scheduler.add_job("tick", lambda: None, timedelta(seconds=10))
+    scheduler.start()
+    try:
+        scheduler.run_pending()
+        assert scheduler.wait_idle(timeout=5)
+    finally:
+        scheduler.stop()
+
+    assert state.get_last_run("tick") == clock.now
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from bubbles.slack_client import RateLimitedWebClient
+
+
+def _rate_limited(retry_after: str) -> SlackApiError:
+    response = MagicMock(status_code=429, headers={"Retry-After": retry_after})
+    return SlackApiError("ratelimited", response)
+
+
+def test_retries_after_429() -> None:
+    client = RateLimitedWebClient(token="xoxb-test")
+
+    with patch.object(
+        WebClient, "api_call", side_effect=[_rate_limited("0.05"), {"ok": True}]
+    ) as api_call:
+        assert client.chat_postMessage(channel="C1", text="hi") == {"ok": True}
+
+    assert api_call.call_count == 2
+    stats = client.rate_limit_stats["chat.postMessage"]
+    assert stats["calls"] == 2
+    assert stats["throttled"] == 1
+    assert stats["queued"] == 1
+
+
+def test_gives_up_eventually() -> None:
+    client = RateLimitedWebClient(token="xoxb-test", max_retries=1)
+
+    with patch.object(WebClient, "api_call", side_effect=_rate_limited("0")):
+        with pytest.raises(SlackApiError):
+            client.conversations_history(channel="C1")
+
+
+def test_buckets_per_channel() -> None:
+    client = RateLimitedWebClient(token="xoxb-test")
+
+    first = client._get_bucket("chat.postMessage", {"json": {"channel": "C1"}})
+    second = client._get_bucket("chat.postMessage", {"json": {"channel": "C2"}})
+
+    assert first is not second
+    assert client._get_bucket("users.list", {}) is client._get_bucket("users.list", {"params": {}})
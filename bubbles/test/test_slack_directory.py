@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from bubbles.slack_directory import SlackDirectory
+
+
+class PagedClient:
+    """Serve users and channels over multiple pages, like Slack does."""
+
+    def __init__(self, members: List[Dict], channels: List[Dict], page_size: int = 2) -> None:
+        self.members = members
+        self.channels = channels
+        self.page_size = page_size
+        self.calls = 0
+
+    def _page(self, items: List[Dict], key: str, cursor: str = None) -> Dict:
+        self.calls += 1
+        start = int(cursor or 0)
+        end = start + self.page_size
+        next_cursor = str(end) if end < len(items) else ""
+        return {key: items[start:end], "response_metadata": {"next_cursor": next_cursor}}
+
+    def users_list(self, limit: int, cursor: str = None) -> Dict:
+        return self._page(self.members, "members", cursor)
+
+    def conversations_list(self, limit: int, cursor: str = None) -> Dict:
+        return self._page(self.channels, "channels", cursor)
+
+
+MEMBERS = [
+    {"id": "U1", "deleted": False, "profile": {"display_name": "alice"}},
+    {"id": "U2", "deleted": False, "real_name": "Bob"},
+    {"id": "U3", "deleted": True, "real_name": "Gone"},
+    {"id": "U4", "deleted": False},
+    {"id": "U5", "deleted": False, "profile": {"display_name": "eve"}},
+]
+CHANNELS = [
+    {"id": "C1", "name": "general"},
+    {"id": "C2", "name": "dev_test"},
+    {"id": "C3", "name": "mod_messages"},
+]
+
+
+def test_refresh_follows_all_pages(tmp_path: Path) -> None:
+    client = PagedClient(MEMBERS, CHANNELS)
+    directory = SlackDirectory(client, tmp_path / "directory.json")
+
+    directory.refresh()
+
+    assert directory.users["U1"] == "alice"
+    assert directory.users["Bob"] == "U2"
+    assert directory.users["U4"] == "U4"
+    assert directory.users["eve"] == "U5"
+    assert "U3" not in directory.users
+    assert directory.users["ids_only"] == ["U1", "U2", "U4", "U5"]
+    assert directory.rooms["mod_messages"] == "C3"
+    assert directory.rooms["C1"] == "general"
+    # 3 pages of users, 2 pages of channels
+    assert client.calls == 5
+
+
+def test_snapshot_is_loaded_without_network(tmp_path: Path) -> None:
+    path = tmp_path / "directory.json"
+    SlackDirectory(PagedClient(MEMBERS, CHANNELS), path, team_id="T1").refresh()
+
+    client = PagedClient([], [])
+    directory = SlackDirectory(client, path, team_id="T1")
+
+    assert directory.load_snapshot()
+    assert directory.users["alice"] == "U1"
+    assert directory.rooms["dev_test"] == "C2"
+    assert not directory.is_stale()
+    assert client.calls == 0
+
+
+def test_snapshot_of_other_workspace_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "directory.json"
+    SlackDirectory(PagedClient(MEMBERS, CHANNELS), path, team_id="T1").refresh()
+
+    directory = SlackDirectory(PagedClient([], []), path, team_id="T2")
+
+    assert not directory.load_snapshot()
+
+
+def test_events_are_applied_incrementally(tmp_path: Path) -> None:
+    path = tmp_path / "directory.json"
+    directory = SlackDirectory(PagedClient(MEMBERS, CHANNELS), path)
+    directory.refresh()
+    users = directory.users
+    users["console"] = "console"
+
+    directory.handle_event(
+        {"type": "user_change", "user": {"id": "U1", "profile": {"display_name": "alicia"}}}
+    )
+    directory.handle_event({"type": "team_join", "user": {"id": "U6", "real_name": "Newbie"}})
+    directory.handle_event({"type": "channel_rename", "channel": {"id": "C2", "name": "bottest"}})
+    directory.handle_event({"type": "channel_created", "channel": {"id": "C4", "name": "new"}})
+
+    # The dict is updated in place, so old references see the changes
+    assert users["U1"] == "alicia"
+    assert users["alicia"] == "U1"
+    assert "alice" not in users
+    assert users["Newbie"] == "U6"
+    assert "U6" in users["ids_only"]
+    # Keys added by someone else survive
+    assert users["console"] == "console"
+    assert directory.rooms["bottest"] == "C2"
+    assert "dev_test" not in directory.rooms
+    assert directory.rooms["new"] == "C4"
+
+    # ...and the changes are persisted
+    with open(path) as file:
+        snapshot = json.load(file)
+    assert snapshot["members"]["U6"] == "Newbie"
+    assert snapshot["channels"]["C2"] == "bottest"
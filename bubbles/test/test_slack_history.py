@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from bubbles.slack_history import iter_channel_history
+
+
+class HistoryClient:
+    """Serve the history of a channel over multiple pages, like Slack does."""
+
+    def __init__(self, count: int) -> None:
+        self.messages = [{"ts": f"{1000 - i}.000100", "text": str(i)} for i in range(count)]
+        self.calls: List[Dict] = []
+
+    def conversations_history(self, limit: int, cursor: str = None, **kwargs: str) -> Dict:
+        self.calls.append({"limit": limit, "cursor": cursor, **kwargs})
+        start = int(cursor or 0)
+        end = start + limit
+        next_cursor = str(end) if end < len(self.messages) else ""
+        return {
+            "messages": self.messages[start:end],
+            "has_more": bool(next_cursor),
+            "response_metadata": {"next_cursor": next_cursor},
+        }
+
+
+def test_follows_the_cursor() -> None:
+    client = HistoryClient(450)
+
+    messages = list(iter_channel_history(client, "C1"))
+
+    assert messages == client.messages
+    assert [call["cursor"] for call in client.calls] == [None, "200", "400"]
+
+
+def test_stops_at_the_limit() -> None:
+    client = HistoryClient(450)
+
+    messages = list(iter_channel_history(client, "C1", limit=250))
+
+    assert messages == client.messages[:250]
+    assert len(client.calls) == 2
+
+
+def test_small_limit_fetches_a_small_page() -> None:
+    client = HistoryClient(450)
+
+    assert len(list(iter_channel_history(client, "C1", limit=5))) == 5
+    assert client.calls == [{"limit": 5, "cursor": None, "channel": "C1"}]
+
+
+def test_is_lazy() -> None:
+    client = HistoryClient(450)
+    messages = iter_channel_history(client, "C1")
+
+    assert client.calls == []
+    next(messages)
+    assert len(client.calls) == 1
+
+
+def test_time_window() -> None:
+    client = HistoryClient(1)
+    oldest = datetime(2021, 6, 1, tzinfo=timezone.utc)
+
+    list(iter_channel_history(client, "C1", oldest=oldest, latest="1622600000.5", inclusive=True))
+
+    call = client.calls[0]
+    assert call["oldest"] == str(oldest.timestamp())
+    assert call["latest"] == "1622600000.5"
+    assert call["inclusive"] is True
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import time
+
+# `commands/deploy.py` calls `<service>.pyz --version` to find out what is running,
+# so answering it must stay well clear of any network access.
+VERSION_BUDGET_SECONDS = 1.0
+
+CHECK_NOTHING_BUILT = """
+import sys
+
+import bubbles.main
+from bubbles import config
+from bubbles.lazy import is_resolved
+
+clients = ["app", "reddit", "blossom", "ME", "COMMAND_PREFIXES", "users_list", "rooms_list"]
+resolved = [name for name in clients if is_resolved(getattr(config, name))]
+assert not resolved, f"Built on import: {resolved}"
+
+for module in ["praw", "slack_bolt.adapter.socket_mode", "blossom_wrapper", "matplotlib"]:
+    assert module not in sys.modules, f"{module} imported on startup"
+"""
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, timeout=30, check=False
+    )
+
+
+def test_importing_main_does_not_build_clients() -> None:
+    result = _run("-c", CHECK_NOTHING_BUILT)
+    assert result.returncode == 0, result.stderr
+
+
+def test_version_is_fast() -> None:
+    start = time.perf_counter()
+    result = _run("-c", "from bubbles.main import main; main()", "--version")
+    duration = time.perf_counter() - start
+
+    assert result.returncode == 0, result.stderr
+    assert "BubblesV2, version" in result.stdout
+    assert duration < VERSION_BUDGET_SECONDS
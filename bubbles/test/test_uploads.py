@@ -0,0 +1,65 @@
+from unittest.mock import MagicMock
+
+from matplotlib.figure import Figure
+
+from bubbles.uploads import MAX_FILES_PER_MESSAGE, encode_figures, upload_figures
+
+PNG_SIGNATURE = b"\x89PNG"
+
+
+def _build_figure(title: str = "") -> Figure:
+    fig = Figure(figsize=(2, 1))
+    ax = fig.gca()
+    ax.plot([0, 1], [1, 0])
+    ax.set_title(title)
+    return fig
+
+
+def test_encode_figures_keeps_the_order() -> None:
+    figures = [Figure(figsize=(4, 4)), Figure(figsize=(1, 1)), Figure(figsize=(4, 4))]
+
+    images = encode_figures(figures)
+
+    assert all(image.startswith(PNG_SIGNATURE) for image in images)
+    assert images[0] == images[2]
+    assert len(images[0]) > len(images[1])
+
+
+def test_upload_figures_in_one_message() -> None:
+    client = MagicMock()
+
+    upload_figures(
+        client,
+        "C1",
+        [_build_figure("Transcriptions"), _build_figure()],
+        name="stats",
+        initial_comment="Here you go",
+        extra_files=[{"content": "text", "filename": "stats.md"}],
+    )
+
+    client.files_upload_v2.assert_called_once()
+    kwargs = client.files_upload_v2.call_args.kwargs
+    assert kwargs["channel"] == "C1"
+    assert kwargs["initial_comment"] == "Here you go"
+    assert [(f["filename"], f.get("title")) for f in kwargs["file_uploads"]] == [
+        ("stats_1.png", "Transcriptions"),
+        ("stats_2.png", "stats_2.png"),
+        ("stats.md", None),
+    ]
+
+
+def test_upload_many_figures() -> None:
+    client = MagicMock()
+
+    upload_figures(
+        client,
+        "C1",
+        [_build_figure() for _ in range(MAX_FILES_PER_MESSAGE + 2)],
+        initial_comment="Hi",
+    )
+
+    first, second = client.files_upload_v2.call_args_list
+    assert len(first.kwargs["file_uploads"]) == MAX_FILES_PER_MESSAGE
+    assert len(second.kwargs["file_uploads"]) == 2
+    # The comment is only posted once
+    assert "initial_comment" not in second.kwargs
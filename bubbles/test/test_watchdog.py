@@ -0,0 +1,79 @@
+import threading
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from bubbles.exceptions import TaskCancelled
+from bubbles.watchdog import Watchdog, check_cancelled, current_task
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_reports_stuck_task_with_its_stack() -> None:
+    clock = FakeClock()
+    reports: List[str] = []
+    watchdog = Watchdog(clock=clock, report=reports.append)
+    started = threading.Event()
+    release = threading.Event()
+
+    def stuck_in_here() -> None:
+        with watchdog.track("command deploy", timedelta(seconds=10)):
+            started.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=stuck_in_here)
+    thread.start()
+    started.wait(5)
+    try:
+        clock.now = 5
+        assert watchdog.check() == []
+        clock.now = 11
+        (task,) = watchdog.check()
+        # Only reported once
+        assert watchdog.check() == []
+    finally:
+        release.set()
+        thread.join()
+
+    assert task.cancelled.is_set()
+    assert watchdog.stuck == 1
+    assert "`command deploy` has been running for 11s" in reports[0]
+    assert "stuck_in_here" in reports[0]
+    # And again once it finally finished
+    assert watchdog.slow == 1
+    assert "finished after 11s" in reports[1]
+
+
+def test_check_cancelled() -> None:
+    clock = FakeClock()
+    watchdog = Watchdog(clock=clock)
+
+    # Outside of a task, there's nothing to cancel
+    check_cancelled()
+
+    with watchdog.track("job rule_monitoring", timedelta(seconds=10)) as task:
+        assert current_task() is task
+        check_cancelled()
+        clock.now = 20
+        watchdog.check()
+        with pytest.raises(TaskCancelled):
+            check_cancelled()
+
+    assert current_task() is None
+
+
+def test_format_stats() -> None:
+    watchdog = Watchdog(clock=FakeClock())
+
+    with watchdog.track("command ping", timedelta(seconds=10)):
+        stats = watchdog.format_stats()
+
+    assert "0 stuck, 0 finished late" in stats
+    assert "`command ping` running for 0s of 10s" in stats
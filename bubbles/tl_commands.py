@@ -1,8 +1,6 @@
 import inspect
-import logging
 import sys
-import traceback
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
 # from bubbles.commands.periodic.activity_checkin import (
 #     check_in_with_people,
@@ -19,11 +17,6 @@ from bubbles.commands.periodic.welcome_ping import (
     periodic_ping_in_progress_callback,
     welcome_ping_callback,
 )
-from bubbles.time_constants import (
-    TRIGGER_4_HOURS_AGO,
-    TRIGGER_12_HOURS_AGO,
-    TRIGGER_YESTERDAY,
-)
 from bubbles.tl_utils import TLJob
 
 # class PeriodicCheck(TLJob):
@@ -40,7 +33,7 @@ from bubbles.tl_utils import TLJob
 #         welcome_ping_callback()
 #
 #     class Meta:
-#         start_interval = TRIGGER_4_HOURS_AGO - datetime.now(tz=timezone.utc)
+#         align = True
 #         regular_interval = timedelta(hours=4)
 
 
@@ -49,7 +42,7 @@ from bubbles.tl_utils import TLJob
 #         get_in_progress_callback()
 #
 #     class Meta:
-#         start_interval = TRIGGER_4_HOURS_AGO - datetime.now(tz=timezone.utc)
+#         align = True
 #         regular_interval = timedelta(hours=4)
 
 
@@ -58,7 +51,7 @@ from bubbles.tl_utils import TLJob
 #         banbot_check_callback()
 #
 #     class Meta:
-#         start_interval = TRIGGER_12_HOURS_AGO - datetime.now(tz=timezone.utc)
+#         align = True
 #         regular_interval = timedelta(hours=12)
 
 
@@ -67,7 +60,7 @@ from bubbles.tl_utils import TLJob
 #         periodic_ping_in_progress_callback()
 #
 #     class Meta:
-#         start_interval = TRIGGER_YESTERDAY - datetime.now(tz=timezone.utc)
+#         align = True
 #         regular_interval = timedelta(days=1)
 
 
@@ -76,36 +69,32 @@ from bubbles.tl_utils import TLJob
 #         transcription_check_ping_callback()
 #
 #     class Meta:
-#         start_interval = TRIGGER_12_HOURS_AGO - datetime.now(tz=timezone.utc)
+#         align = True
 #         regular_interval = timedelta(hours=12)
 
 
 class CheckModmail(TLJob):
     def job(self) -> None:
-        try:
-            modmail_callback()
-        except Exception as e:
-            tb_str = "".join(traceback.format_exception(None, e, e.__traceback__))
-            logging.error(f"Failed to check for modmail: {e}\n{tb_str}")
+        modmail_callback()
 
     class Meta:
         start_interval = timedelta(seconds=0)  # start now
-        regular_interval = timedelta(seconds=30)
+        # Most runs are skipped, modmail_callback decides when to actually poll
+        regular_interval = timedelta(seconds=15)
+        jitter = timedelta(0)
+        # Relaying a busy conversation takes a couple of Reddit calls
+        timeout = timedelta(minutes=5)
 
 
 class RuleMonitoring(TLJob):
     def job(self) -> None:
-        try:
-            rule_monitoring_callback()
-        except Exception as e:
-            # Catch all errors to make sure the bot doesn't crash
-            # See <https://stackoverflow.com/a/62952274>
-            tb_str = "".join(traceback.format_exception(None, e, e.__traceback__))
-            logging.error(f"Failed to check for rule changes: {e}\n{tb_str}")
+        rule_monitoring_callback()
 
     class Meta:
         start_interval = timedelta(seconds=0)  # start now
         regular_interval = timedelta(minutes=1)
+        # Initializing the rules of new subs takes a while
+        timeout = timedelta(minutes=15)
 
 
 # TODO: This will require major surgery because the events API doesn't support
@@ -116,7 +105,7 @@ class RuleMonitoring(TLJob):
 #         check_in_with_people()
 #
 #     class Meta:
-#         start_interval = TRIGGER_LAST_WEEK - datetime.now()
+#         align = True
 #         regular_interval = timedelta(days=7)
 
 # TODO: same here as with the above
@@ -125,7 +114,7 @@ class RuleMonitoring(TLJob):
 #         force_presence_update(rtm_client)
 #
 #     class Meta:
-#         start_interval = NEXT_TRIGGER_DAY - datetime.now()
+#         align = True
 #         regular_interval = timedelta(days=3)
 
 
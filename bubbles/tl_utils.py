@@ -1,9 +1,15 @@
 from datetime import timedelta
 from typing import Any
 
-import timeloop  # type: ignore
+from bubbles.config import job_state
+from bubbles.rate_limit import PERIODIC, prioritized
+from bubbles.scheduler import SKIP, Scheduler
 
-tl = timeloop.Timeloop()
+# The jobs pick up where they left off before the restart
+tl = Scheduler(state=job_state)
+
+# Unless a job says otherwise, it's delayed by up to a tenth of its interval
+MAX_DEFAULT_JITTER = timedelta(minutes=1)
 
 
 class TLConfigException(Exception):
@@ -11,33 +17,50 @@ class TLConfigException(Exception):
 
 
 class TLJob:
+    """A periodic job, configured by its inner `Meta` class.
+
+    - `regular_interval`: The time between two runs.
+    - `start_interval`: The time until the first run.
+    - `align` (optional): Run on multiples of `regular_interval`, e.g. every
+      4 hours at 00:00, 04:00, ... UTC. Replaces `start_interval`.
+    - `jitter` (optional): Delay every run by a random time up to this.
+    - `overlap` (optional): `SKIP` (the default) or `QUEUE` the runs that are due
+      while the previous one is still going, see `bubbles.scheduler`.
+    - `timeout` (optional): How long a run may take before the watchdog reports
+      it as stuck. Defaults to `regular_interval`.
+
+    The scheduler logs and counts the errors of `job`, so it doesn't need to catch them.
+    """
+
     def __init__(self) -> None:
-        self.first_run = True
         # assumes one-word class name
         self.name = [z.strip(" <") for z in self.__str__().split(" ")][0].split(".")[-1]
+        align = getattr(self.Meta, "align", False)
 
-        for attr in ["start_interval", "regular_interval"]:
+        required = ["regular_interval"] if align else ["start_interval", "regular_interval"]
+        for attr in required + [attr for attr in ["jitter", "timeout"] if hasattr(self.Meta, attr)]:
             if not hasattr(self.Meta, attr):
                 raise TLConfigException(f"Missing {attr} for {self.name}!")
 
             if not isinstance(getattr(self.Meta, attr), timedelta):
                 raise TLConfigException(f"{self.name} - {attr} must be a timedelta object!")
 
-        tl.job(interval=self.Meta.start_interval)(self._job_wrapper)
-        tl.jobs[-1].name = self.name
-
-    def _get_tl_job(self) -> Any:
-        for job in tl.jobs:
-            if job.name == self.name:
-                return job
+        interval = self.Meta.regular_interval
+        tl.add_job(
+            self.name,
+            self._job_wrapper,
+            interval,
+            start_after=getattr(self.Meta, "start_interval", timedelta(0)),
+            align=align,
+            jitter=getattr(self.Meta, "jitter", min(interval / 10, MAX_DEFAULT_JITTER)),
+            overlap=getattr(self.Meta, "overlap", SKIP),
+            timeout=getattr(self.Meta, "timeout", None),
+        )
 
     def _job_wrapper(self) -> Any:
-        result = self.job()
-        if self.first_run:
-            job = self._get_tl_job()
-            job.interval = self.Meta.regular_interval
-            self.first_run = False
-        return result
+        # Nobody is waiting for the output of the jobs, let the commands go first
+        with prioritized(PERIODIC):
+            return self.job()
 
     def job(self) -> None:
         raise TLConfigException("No job configured!")
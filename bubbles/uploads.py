@@ -0,0 +1,96 @@
+"""Upload charts to Slack in as few messages as possible.
+
+Uploading figures one by one through `payload.upload_file` means writing each of
+them to disk and paying a full round trip per file, and the twelve charts of
+`!ctqstats` ended up spread over as many messages. `upload_figures` renders the
+figures in parallel into memory and shares them with `files_upload_v2`, which
+puts several files into a single message.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence
+
+# Slack doesn't show more files than this in a single message
+MAX_FILES_PER_MESSAGE = 10
+# Rendering is mostly done in C++, so a few threads get through the figures faster
+ENCODE_WORKERS = 4
+
+
+def encode_figure(figure: Any, image_format: str = "png") -> bytes:
+    """Render the figure into an in-memory image."""
+    buffer = BytesIO()
+    figure.savefig(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def encode_figures(figures: Sequence[Any], image_format: str = "png") -> List[bytes]:
+    """Render all figures at the same time, keeping their order."""
+    if len(figures) <= 1:
+        return [encode_figure(figure, image_format) for figure in figures]
+
+    with ThreadPoolExecutor(max_workers=min(len(figures), ENCODE_WORKERS)) as executor:
+        return list(executor.map(lambda figure: encode_figure(figure, image_format), figures))
+
+
+def get_figure_title(figure: Any) -> Optional[str]:
+    """Get the title of the figure, or of its first plot."""
+    if getattr(figure, "_suptitle", None) is not None and figure._suptitle.get_text():
+        return figure._suptitle.get_text()
+    for ax in figure.axes:
+        if ax.get_title():
+            return ax.get_title()
+    return None
+
+
+def upload_files(
+    client: Any,
+    channel: str,
+    files: List[Dict],
+    initial_comment: Optional[str] = None,
+    thread_ts: Optional[str] = None,
+) -> None:
+    """Share the files in as few messages as possible.
+
+    :param files: The `file_uploads` of `files_upload_v2`, i.e. dicts with the
+    `content` and the `filename` and optionally a `title`.
+    :param initial_comment: The text of the (first) message.
+    """
+    for start in range(0, len(files), MAX_FILES_PER_MESSAGE):
+        kwargs: Dict[str, Any] = {}
+        if initial_comment and start == 0:
+            kwargs["initial_comment"] = initial_comment
+        if thread_ts:
+            kwargs["thread_ts"] = thread_ts
+        client.files_upload_v2(
+            channel=channel,
+            file_uploads=files[start : start + MAX_FILES_PER_MESSAGE],
+            **kwargs,
+        )
+
+
+def upload_figures(
+    client: Any,
+    channel: str,
+    figures: Sequence[Any],
+    name: str = "figure",
+    initial_comment: Optional[str] = None,
+    extra_files: Optional[List[Dict]] = None,
+    thread_ts: Optional[str] = None,
+) -> None:
+    """Render the figures and share them together, followed by the `extra_files`.
+
+    :param name: The base of the file names, e.g. `ctq_stats` for `ctq_stats_1.png`.
+    """
+    files = []
+    for number, (figure, content) in enumerate(zip(figures, encode_figures(figures)), start=1):
+        filename = f"{name}_{number}.png" if len(figures) > 1 else f"{name}.png"
+        files.append(
+            {
+                "content": content,
+                "filename": filename,
+                "title": get_figure_title(figure) or filename,
+            }
+        )
+    files += extra_files or []
+
+    upload_files(client, channel, files, initial_comment=initial_comment, thread_ts=thread_ts)
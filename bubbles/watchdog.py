@@ -0,0 +1,200 @@
+"""Keep an eye on the commands and periodic jobs that take too long.
+
+Almost everything Bubbles does ends in a network call -- Reddit, Blossom,
+GitHub, Slack -- and a single one of them hanging used to freeze its thread
+forever without anyone noticing. Every command and periodic job now runs in
+`watchdog.track` with a deadline:
+
+- A background thread checks the running tasks. When one goes past its
+  deadline, the stack of its thread is logged and reported to the diagnostics
+  channel, so we can see where it's stuck.
+- Python can't kill a thread, so the task is asked to stop instead: long loops
+  call `check_cancelled`, which raises `TaskCancelled` once the deadline passed.
+- Tasks that finish late are reported as well, see `!debug watchdog`.
+"""
+import itertools
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from bubbles.exceptions import TaskCancelled
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = timedelta(minutes=5)
+CHECK_INTERVAL = timedelta(seconds=15)
+# The innermost frames of a stuck thread that are reported
+STACK_DEPTH = 12
+MAX_INCIDENTS = 20
+
+_local = threading.local()
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    return str(timedelta(seconds=int(seconds)))
+
+
+class Task:
+    """A command or job that is running under the watchdog."""
+
+    def __init__(self, name: str, deadline: float, started: float) -> None:
+        self.name = name
+        self.deadline = deadline
+        self.started = started
+        self.thread_id = threading.get_ident()
+        # Set once the deadline passed, see `check_cancelled`
+        self.cancelled = threading.Event()
+        self.reported = False
+
+
+def current_task() -> Optional[Task]:
+    """Get the task that the current thread is working on, if any."""
+    return getattr(_local, "task", None)
+
+
+def check_cancelled() -> None:
+    """Stop the current task if it's past its deadline.
+
+    :raises TaskCancelled: If the watchdog asked the task to stop.
+    """
+    task = current_task()
+    if task is not None and task.cancelled.is_set():
+        raise TaskCancelled(
+            f"{task.name} ran past its deadline of {_format_seconds(task.deadline)}"
+        )
+
+
+class Watchdog:
+    """Tracks the running tasks and reports the ones that are stuck or slow.
+
+    :param report: Called with the text of every incident, e.g. to post it to Slack.
+    """
+
+    def __init__(
+        self,
+        check_interval: timedelta = CHECK_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        report: Optional[Callable[[str], object]] = None,
+    ) -> None:
+        self.check_interval = check_interval
+        self.clock = clock
+        self.report = report
+
+        self.stuck = 0
+        self.slow = 0
+        self.incidents: Deque[Tuple[datetime, str]] = deque(maxlen=MAX_INCIDENTS)
+
+        self._tasks: Dict[int, Task] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def track(self, name: str, deadline: timedelta = DEFAULT_DEADLINE) -> Iterator[Task]:
+        """Run the block as a task that should be done within the deadline."""
+        task = Task(name, deadline.total_seconds(), self.clock())
+        task_id = next(self._ids)
+        previous = current_task()
+        _local.task = task
+        with self._lock:
+            self._tasks[task_id] = task
+        try:
+            yield task
+        finally:
+            _local.task = previous
+            with self._lock:
+                del self._tasks[task_id]
+            duration = self.clock() - task.started
+            if duration > task.deadline:
+                self.slow += 1
+                self._notify(
+                    f"`{name}` finished after {_format_seconds(duration)},"
+                    f" its deadline was {_format_seconds(task.deadline)}."
+                )
+
+    def check(self) -> List[Task]:
+        """Report the tasks that went past their deadline and ask them to stop.
+
+        Every task is only reported once.
+        """
+        now = self.clock()
+        with self._lock:
+            overdue = [
+                task
+                for task in self._tasks.values()
+                if not task.reported and now - task.started > task.deadline
+            ]
+            for task in overdue:
+                task.reported = True
+                task.cancelled.set()
+        if not overdue:
+            return overdue
+
+        frames = sys._current_frames()
+        for task in overdue:
+            self.stuck += 1
+            frame = frames.get(task.thread_id)
+            stack = (
+                "".join(traceback.format_stack(frame, limit=STACK_DEPTH)).rstrip()
+                if frame is not None
+                else "The thread is gone."
+            )
+            self._notify(
+                f"`{task.name}` has been running for {_format_seconds(now - task.started)},"
+                f" its deadline was {_format_seconds(task.deadline)}."
+                " I asked it to stop, it is currently at:",
+                details=stack,
+            )
+        return overdue
+
+    def start(self) -> None:
+        """Check the tasks in the background."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.check_interval.total_seconds())
+            try:
+                self.check()
+            except Exception:
+                log.exception("The watchdog check failed")
+
+    def _notify(self, summary: str, details: Optional[str] = None) -> None:
+        self.incidents.append((datetime.now(tz=timezone.utc), summary))
+        log.warning(summary + (f"\n{details}" if details else ""))
+        if self.report is None:
+            return
+        try:
+            self.report(f"{summary}\n```{details}```" if details else summary)
+        except Exception:
+            log.exception("Couldn't report to the diagnostics channel")
+
+    def format_stats(self) -> str:
+        """Summarize the running tasks and recent incidents for humans."""
+        now = self.clock()
+        with self._lock:
+            running = sorted(self._tasks.values(), key=lambda task: task.started)
+        lines = [f"*Watchdog*: {self.stuck} stuck, {self.slow} finished late"]
+        for task in running:
+            state = " (asked to stop)" if task.cancelled.is_set() else ""
+            lines.append(
+                f"• `{task.name}` running for {_format_seconds(now - task.started)}"
+                f" of {_format_seconds(task.deadline)}{state}"
+            )
+        for when, summary in self.incidents:
+            lines.append(f"{when:%Y-%m-%d %H:%M} UTC: {summary}")
+        return "\n".join(lines)
+
+
+watchdog = Watchdog()